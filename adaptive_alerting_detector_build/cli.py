@@ -4,10 +4,15 @@ Creates, re-trains, and disables Adaptive Alerting detectors, based on the provi
 JSON metrics configuration file.
 
 Usage:
-    adaptive-alerting build <json_config_file>...
-    adaptive-alerting disable <json_config_file>...
-    adaptive-alerting train <json_config_file>...
+    adaptive-alerting build [--shard=<index/count>] [--rendezvous] [--queue=<db> [--workers=<n>] [--reset-queue]] [--journal=<file> [--resume]] [--pipeline=<processes> [--io-threads=<n>] | --memory-budget=<size> | --create-concurrency=<n>] <json_config_file>...
+    adaptive-alerting disable [--shard=<index/count>] [--rendezvous] [--queue=<db> [--workers=<n>] [--reset-queue]] [--journal=<file> [--resume]] [--memory-budget=<size>] <json_config_file>...
+    adaptive-alerting train [--shard=<index/count>] [--rendezvous] [--queue=<db> [--workers=<n>] [--reset-queue]] [--journal=<file> [--resume]] [--pipeline=<processes> [--io-threads=<n>] | --memory-budget=<size> | --deadline=<duration>] [--verify-writes] <json_config_file>...
     adaptive-alerting diff <json_config_file_previous> <json_config_file_current> <output_file>
+    adaptive-alerting apply <json_config_file_previous> <json_config_file_current>
+    adaptive-alerting apply --diff=<diff_file>
+    adaptive-alerting profile [--output=<ndjson_file>] [--workers=<n>] [--resume] [--downsample=<method>] [--shard=<index/count>] [--rendezvous] <json_config_file>...
+    adaptive-alerting serve-scheduler [--reload-interval=<seconds>] [--jitter=<seconds>] <json_config_file>...
+    adaptive-alerting serve [--socket=<path>] [--no-warm-up]
     adaptive-alerting -h | --help
 
 Commands:
@@ -15,12 +20,52 @@ Commands:
     train       trains existing detectors for each metric
     disable     disables detectors for each metric
     diff        show changes between config files versions
+    apply       builds, re-trains or disables detectors for the metrics changed between config files versions
+    profile     profiles the stationarity and seasonality of each metric
+    serve-scheduler
+                runs until stopped, training each detector when its training interval is due
+    serve       runs until stopped, serving the commands sent by adaptive-alerting-client from a warm process
 
 Options:
     json_config_file                One or more configuration files containing the metric configuration
     json_config_file_previous       Previous version of config file
     json_config_file_current        Current versoin of config file
     output_file                    Diff output file location
+    --diff=<diff_file>              Diff file written by the diff command
+    --output=<ndjson_file>          Profile output file, one JSON line per metric [default: -]. Errors of the
+                                    profiling tests are recorded in the profile and do not change the exit code
+    --workers=<n>                   Number of profiling processes, 0 profiles in the main process. Defaults to the
+                                    number of CPUs. With --queue, number of local worker processes, defaults to 1
+    --resume                        Skip metrics already profiled in the output file, or already completed with the
+                                    same config in the journal
+    --downsample=<method>           Downsample the series to the coarsest resolution each profiling test supports,
+                                    with the mean or lttb method. By default the tests run at full resolution
+    --shard=<index/count>           Only process the metrics assigned to shard INDEX (0 based) of COUNT shards. Can
+                                    also be set with the SHARD_INDEX and SHARD_COUNT environment variables
+    --rendezvous                    Assign metrics to shards with rendezvous hashing, so changing COUNT moves fewer
+                                    metrics. Can also be set with SHARD_RENDEZVOUS=true
+    --queue=<db>                    Distribute the metrics through a SQLite job queue, which can be on a shared
+                                    filesystem: every host running the same command claims metrics until all are done
+    --reset-queue                   Start a new run of the queue, replacing the jobs of the previous run. Only reset
+                                    from one host, before the other hosts join the run
+    --journal=<file>                Append the outcome of each metric to a journal file
+    --pipeline=<processes>          Fetch series and publish detectors in I/O threads while a pool of processes
+                                    trains the detectors, 0 trains in the I/O threads
+    --io-threads=<n>                Number of fetch and of publish threads of the pipeline [default: 8]
+    --memory-budget=<size>          Process the metrics in chunks, keeping the resident memory under SIZE bytes (e.g.
+                                    2G) where possible. Metric configs are spilled to ADAPTIVE_ALERTING_SPILL_DIR
+                                    and the peak resident memory is logged at the end of the run
+    --deadline=<duration>           Train the most overdue detectors first and stop after DURATION (e.g. 45m or
+                                    1h30m), deferring the remaining metrics to the next run
+    --verify-writes                 Read back the trained detectors in batches and fail if the model service does
+                                    not return them as updated. By default updates are not read back
+    --create-concurrency=<n>        Build the detectors of N metrics at once, new detectors being polled together
+                                    until the model service returns them
+    --reload-interval=<seconds>     Seconds between checks for config file changes [default: 60]
+    --jitter=<seconds>              Maximum random delay added to training due times [default: 300]
+    --socket=<path>                 Unix socket of the serve command. Defaults to ADAPTIVE_ALERTING_SOCKET, or a
+                                    socket in XDG_RUNTIME_DIR or in a per-user directory of the temporary directory
+    --no-warm-up                    Do not import the dependencies and compile the detectors before serving
     -h --help                     Show this screen
 
 Examples:
@@ -32,54 +77,71 @@ Examples:
 
     adaptive-alerting diff metrics_v1.json metrics_v2.json 
 
+    adaptive-alerting apply metrics_v1.json metrics_v2.json
+
+    adaptive-alerting profile --output=profiles.ndjson --resume metrics.json
+
+    adaptive-alerting train --shard=0/4 metrics.json
+
+    adaptive-alerting train --queue=/shared/train.db --workers=4 --reset-queue metrics.json
+
+    adaptive-alerting train --journal=train.journal --resume metrics.json
+
+    adaptive-alerting train --pipeline=4 metrics.json
+
+    adaptive-alerting train --memory-budget=2G metrics.json
+
+    adaptive-alerting train --deadline=45m metrics.json
+
+    adaptive-alerting train --verify-writes metrics.json
+
+    adaptive-alerting build --create-concurrency=16 metrics.json
+
+    adaptive-alerting serve-scheduler metrics.json
+
+    adaptive-alerting serve & adaptive-alerting-client train metrics.json
+
 """
 
 from docopt import docopt
 import logging
-import json
-import related
+import signal
 import sys
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 
+from .detectors import WriteVerifier
 from .exceptions import AdaptiveAlertingDetectorBuildError
-from .metrics import Metric, MetricConfig
-from . import __version__
+from .metrics import MetricConfig, MetricConfigReader, MetricFactory, MetricWorkSet, iter_unique_metric_configs
+from .metrics.chunked import ChunkedCommand, SpilledMetricConfigs, log_peak_rss
+from .metrics.jobqueue import run_job_queue
+from .metrics.journal import JournaledCommand, read_completed
+from .metrics.pipeline import BUILD, IO_THREADS, TRAIN, run_pipeline
+from .metrics.sharding import Shard
+from .metrics.diff import MetricConfigDiffWriter, diff_metric_configs, iter_metric_config_diff, read_diff_file
+from .utils import fast_model
+from .utils.jit import warm_up_kernels
+from .utils.deadline import Deadline, parse_duration
+from .utils.memory import parse_size
+from .utils.ratelimit import log_limiter_stats
+from . import __version__, config
 
 
 LOGGER = logging.getLogger(__name__)
 
 
 def read_config_file(json_config_file_path):
-    metric_configs = list()
-    exit_code = 0
-    try:
-        logging.info(f"Reading configuration file: {json_config_file_path}")
-        with open(json_config_file_path) as json_config_file:
-            raw_metric_configs = json.loads(json_config_file.read())
-            if not isinstance(raw_metric_configs, list):
-                raise ValueError()
-            for raw_metric_config in raw_metric_configs:
-                try:
-                    metric_config = related.to_model(MetricConfig, raw_metric_config)
-                    metric_configs.append(metric_config)
-                except Exception as e:
-                    logging.exception(
-                        f"Exception {e.__class__.__name__} while reading config file '{e}'! Skipping!"
-                    )
-    except Exception as e:
-        logging.exception(
-            f"Exception {e.__class__.__name__} while reading config file '{json_config_file_path}'! Skipping!"
-        )
-        trace = traceback.format_exc()
-        logging.debug(f"Traceback: {trace}")
-        exit_code = 1
-    return (metric_configs, exit_code)
+    metric_config_reader = MetricConfigReader(json_config_file_path)
+    metric_configs = list(metric_config_reader)
+    return (metric_configs, metric_config_reader.exit_code)
 
 
-def build_detectors_for_metric_configs(metric_configs):
+def build_detectors_for_metric_configs(metric_configs, metric_factory=None):
+    metric_factory = metric_factory or MetricFactory()
     exit_code = 0
     for metric_config in metric_configs:
-        metric = Metric(related.to_dict(metric_config), metric_config.datasource)
+        metric = metric_factory.metric(metric_config)
         try:
             new_detectors = metric.build_detectors()
             for detector in new_detectors:
@@ -102,17 +164,71 @@ def build_detectors_for_metric_configs(metric_configs):
     return exit_code
 
 
-def train_detectors_for_metric_configs(metric_configs):
+def build_detectors_concurrently(metric_configs, concurrency, metric_factory=None):
+    """
+    Same as build_detectors_for_metric_configs(), building the detectors of up to `concurrency` metrics at once.
+    The detectors created by all the threads are polled together until the model service returns them (see
+    detectors/readiness.py), and each one is mapped to its metric as soon as it is returned.
+    """
+    metric_factory = metric_factory or MetricFactory()
+    exit_code = 0
+    futures = []
+    slots = threading.BoundedSemaphore(concurrency)
+
+    def build(metric_config):
+        try:
+            return build_detectors_for_metric_configs([metric_config], metric_factory=metric_factory)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="build") as executor:
+        for metric_config in metric_configs:
+            # Metric configs are only read as threads become available
+            slots.acquire()
+            futures.append((metric_config, executor.submit(build, metric_config)))
+    for metric_config, future in futures:
+        try:
+            exit_code = max(exit_code, future.result())
+        except Exception as e:
+            # Raised outside the per-metric handling, e.g. while querying the detectors of the metric
+            logging.error(
+                f"Exception {e.__class__.__name__} while creating detector for metric {metric_config.name}! Skipping!",
+                exc_info=e,
+            )
+            exit_code = 1
+    return exit_code
+
+
+def log_write_verification(write_verifier):
+    """
+    Verifies the remaining updates of write_verifier.
+    :return: exit code, 1 if any update doesn't match the detector read back
+    """
+    write_verifier.flush()
+    logging.info(
+        f"Verified {write_verifier.verified} detector update(s), {len(write_verifier.mismatched)} mismatch(es)"
+    )
+    if write_verifier.unverified:
+        logging.warning(f"{len(write_verifier.unverified)} detector update(s) not verified before the deadline")
+    return 1 if write_verifier.mismatched else 0
+
+
+def train_detectors_for_metric_configs(metric_configs, force=False, metric_factory=None, verify_writes=False):
+    """
+    Updated detectors are not read back, unless verify_writes is set, see WriteVerifier.
+    """
+    metric_factory = metric_factory or MetricFactory()
+    write_verifier = WriteVerifier() if verify_writes else None
     exit_code = 0
     for metric_config in metric_configs:
-        metric = Metric(related.to_dict(metric_config), metric_config.datasource)
+        metric = metric_factory.metric(metric_config)
         try:
-            updated_detectors = []
             for detector in metric.detectors:
-                if detector.needs_training:
+                if force or detector.needs_training:
                     detector.train(data=metric.query(), metric_type=metric.config["type"])
-                    updated_detector = metric._detector_client.update_detector(detector)
-                    updated_detectors.append(updated_detector)
+                    metric._detector_client.update_detector(detector, read_after_write=False)
+                    if write_verifier:
+                        write_verifier.add(metric._detector_client, detector)
                     logging.info(
                         f"Trained '{detector.type}' detector with UUID: {detector.uuid}"
                     )
@@ -132,13 +248,95 @@ def train_detectors_for_metric_configs(metric_configs):
             trace = traceback.format_exc()
             logging.debug(f"Traceback: {trace}")
             exit_code = 1
+    if write_verifier:
+        exit_code = max(exit_code, log_write_verification(write_verifier))
     return exit_code
 
 
-def disable_detectors_for_metric_configs(metric_configs):
+def train_detectors_by_staleness(metric_configs, deadline, force=False, metric_factory=None, verify_writes=False):
+    """
+    Trains the detectors that need training before the deadline, most overdue first (see Detector.overdue_ratio).
+    The detectors of all the metrics are listed first, so the order does not depend on the config files. Metrics
+    that can't be trained before the deadline are deferred to the next run and reported, a request in flight when
+    the deadline is reached times out (see utils/deadline.py).
+    :param deadline: Deadline
+    :param verify_writes: Reads back the updated detectors in batches, see WriteVerifier
+    """
+    metric_factory = metric_factory or MetricFactory()
+    write_verifier = WriteVerifier() if verify_writes else None
+    exit_code = 0
+    pending = []
+    deferred = []
+    with deadline.activate():
+        for metric_config in metric_configs:
+            if deadline.expired:
+                deferred.append(metric_config.name)
+                continue
+            metric = metric_factory.metric(metric_config)
+            try:
+                detectors = []
+                for detector in metric.detectors:
+                    if force or detector.needs_training:
+                        detectors.append(detector)
+                    else:
+                        logging.info(
+                            f"Training not required for '{detector.type}' detector with UUID: {detector.uuid}"
+                        )
+            except Exception as e:
+                if deadline.expired:
+                    deferred.append(metric_config.name)
+                    continue
+                logging.exception(
+                    f"Exception {e.__class__.__name__} while listing detector(s) for metric {metric_config.name}! Skipping!"
+                )
+                exit_code = 1
+                continue
+            if detectors:
+                overdue_ratio = max(detector.overdue_ratio for detector in detectors)
+                pending.append((overdue_ratio, metric_config, metric, detectors))
+        pending.sort(key=lambda item: item[0], reverse=True)
+        for overdue_ratio, metric_config, metric, detectors in pending:
+            if deadline.expired:
+                deferred.append(metric_config.name)
+                continue
+            try:
+                for detector in detectors:
+                    detector.train(data=metric.query(), metric_type=metric.config["type"])
+                    metric._detector_client.update_detector(detector, read_after_write=False)
+                    if write_verifier:
+                        write_verifier.add(metric._detector_client, detector)
+                    logging.info(
+                        f"Trained '{detector.type}' detector with UUID: {detector.uuid}"
+                    )
+            except AdaptiveAlertingDetectorBuildError as e:
+                logging.error(
+                    f"Unable to train detector for metric '{metric_config.name}',  {e.msg}! Skipping!"
+                )
+            except Exception as e:
+                if deadline.expired:
+                    logging.warning(f"Deadline reached while training detector(s) for metric {metric_config.name}")
+                    deferred.append(metric_config.name)
+                    continue
+                logging.exception(
+                    f"Exception {e.__class__.__name__} while training detector(s) for metric {metric_config.name}! Skipping!"
+                )
+                trace = traceback.format_exc()
+                logging.debug(f"Traceback: {trace}")
+                exit_code = 1
+    if deferred:
+        logging.warning(f"Deadline of {deadline.seconds:g} seconds reached, {len(deferred)} metric(s) deferred")
+        for metric_name in deferred:
+            logging.info(f"Deferred metric '{metric_name}'")
+    if write_verifier:
+        exit_code = max(exit_code, log_write_verification(write_verifier))
+    return exit_code
+
+
+def disable_detectors_for_metric_configs(metric_configs, metric_factory=None):
+    metric_factory = metric_factory or MetricFactory()
     exit_code = 0
     for metric_config in metric_configs:
-        metric = Metric(related.to_dict(metric_config), metric_config.datasource)
+        metric = metric_factory.metric(metric_config)
         try:
             disabled_detectors = metric.disable_detectors()
             for detector in disabled_detectors:
@@ -159,70 +357,398 @@ def disable_detectors_for_metric_configs(metric_configs):
     return exit_code
 
 
-def diff_metric_configs(previous_metric_configs, current_metric_configs):
-    diff = {
-        "added": [],
-        "modified":[],
-        "deleted":[]
-    }
-    previous_metric_config_keys = [i.tag_key for i in previous_metric_configs]
-    previous_metric_json_configs = [related.to_json(i) for i in previous_metric_configs]
-    current_metric_config_keys = [i.tag_key for i in current_metric_configs]
-    for current_metric_config in current_metric_configs:
-        if current_metric_config.tag_key not in previous_metric_config_keys:
-            diff["added"].append(related.to_dict(current_metric_config))
-        elif related.to_json(current_metric_config) not in previous_metric_json_configs:
-            diff["modified"].append(related.to_dict(current_metric_config))
-    for previous_metric_config in previous_metric_configs:
-        if previous_metric_config.tag_key not in current_metric_config_keys:
-            diff["deleted"].append(related.to_dict(previous_metric_config))
-    return diff
-        
+PIPELINE_COMMANDS = {
+    build_detectors_for_metric_configs: BUILD,
+    train_detectors_for_metric_configs: TRAIN,
+}
 
-def console_script_entrypoint():
-    logging.basicConfig(level=logging.INFO)
-    args = docopt(__doc__, version=__version__)
+
+def run_for_config_files(
+    command,
+    json_config_files,
+    shard=None,
+    queue=None,
+    workers=None,
+    reset_queue=False,
+    journal=None,
+    resume=False,
+    pipeline=None,
+    io_threads=None,
+    memory_budget=None,
+    deadline=None,
+    create_concurrency=None,
+    verify_writes=False,
+):
+    """
+    Runs a build, train or disable command once over the metrics of all the config files, merged into one work set.
+    If shard is set, only the metrics assigned to it are processed. If queue is set, the metrics are distributed
+    between workers through the job queue database, see metrics/jobqueue.py, reset_queue starting a new run of the
+    queue. If journal is set, the outcome of each
+    metric is recorded in it, and with resume the metrics it lists as completed with the same config are skipped.
+    If pipeline is set, build and train run in a staged pipeline with that many training processes, see
+    metrics/pipeline.py. If memory_budget is set, the metrics are processed in chunks under that resident memory
+    budget (in bytes), see metrics/chunked.py. If deadline is set, train works on the most overdue detectors first
+    and stops when the deadline is reached, see train_detectors_by_staleness(). If create_concurrency is set, build
+    creates the detectors of that many metrics at once, see build_detectors_concurrently(). If verify_writes is set,
+    train reads back the updated detectors in batches, see WriteVerifier.
+    """
+    if pipeline is not None and (queue or journal or command not in PIPELINE_COMMANDS):
+        logging.error("--pipeline can only be used with build and train, without --queue or --journal")
+        return 1
+    if memory_budget is not None and (queue or pipeline is not None):
+        logging.error("--memory-budget can not be used with --queue or --pipeline")
+        return 1
+    if deadline is not None and (
+        queue or journal or pipeline is not None or memory_budget is not None
+        or command is not train_detectors_for_metric_configs
+    ):
+        logging.error(
+            "--deadline can only be used with train, without --queue, --journal, --pipeline or --memory-budget"
+        )
+        return 1
+    if create_concurrency is not None and (
+        queue or journal or pipeline is not None or memory_budget is not None
+        or command is not build_detectors_for_metric_configs
+    ):
+        logging.error(
+            "--create-concurrency can only be used with build, without --queue, --journal, --pipeline or "
+            "--memory-budget"
+        )
+        return 1
+    if verify_writes and (
+        queue or journal or pipeline is not None or memory_budget is not None
+        or command is not train_detectors_for_metric_configs
+    ):
+        logging.error(
+            "--verify-writes can only be used with train, without --queue, --journal, --pipeline or --memory-budget"
+        )
+        return 1
+    logging.info("")
+    metric_config_readers = [MetricConfigReader(json_config_file) for json_config_file in json_config_files]
+    if memory_budget is not None:
+        # Streamed from the config files to the spill file, only the tag keys are kept in memory
+        metric_configs = iter_unique_metric_configs(metric_config_readers)
+        if shard:
+            metric_configs = shard.filter(metric_configs)
+        metric_configs = SpilledMetricConfigs(metric_configs)
+        logging.info(f"{len(metric_configs)} metric(s) spilled to '{metric_configs.path}'")
+        metric_work_set = None
+    else:
+        # Read while the command runs, see log_work_set_summary() for the metrics of each file
+        metric_work_set = MetricWorkSet(metric_config_readers)
+        metric_configs = metric_work_set
+        if shard:
+            metric_configs = shard.filter(metric_work_set)
+    if journal:
+        completed = read_completed(journal, command.__name__) if resume else None
+        command = JournaledCommand(command, journal, completed)
+    if memory_budget is not None:
+        command = ChunkedCommand(command, memory_budget)
+    if pipeline is not None:
+        command_exit_code = run_pipeline(
+            PIPELINE_COMMANDS[command], metric_configs, processes=pipeline, io_threads=io_threads or IO_THREADS
+        )
+    elif queue:
+        command_exit_code = run_job_queue(queue, command, metric_configs, workers=workers or 1, reset=reset_queue)
+    elif create_concurrency is not None:
+        command_exit_code = build_detectors_concurrently(
+            metric_configs, create_concurrency, metric_factory=MetricFactory()
+        )
+    elif deadline is not None:
+        command_exit_code = train_detectors_by_staleness(
+            metric_configs, deadline, metric_factory=MetricFactory(), verify_writes=verify_writes
+        )
+    elif verify_writes:
+        command_exit_code = command(metric_configs, metric_factory=MetricFactory(), verify_writes=True)
+    elif memory_budget is not None:
+        with metric_configs:
+            command_exit_code = command(metric_configs, metric_factory=MetricFactory())
+        log_peak_rss()
+    else:
+        command_exit_code = command(metric_configs, metric_factory=MetricFactory())
+    if metric_work_set is not None:
+        log_work_set_summary(metric_work_set, shard)
+    log_limiter_stats()
+    logging.info("Done")
+    return max([command_exit_code] + [reader.exit_code for reader in metric_config_readers])
+
+
+def log_work_set_summary(metric_work_set, shard=None):
+    for json_config_file, file_summary in metric_work_set.file_summary().items():
+        logging.info(
+            f"'{json_config_file}': {file_summary['metrics']} metric(s), "
+            f"{file_summary['shared']} also listed in other files"
+        )
+    if shard:
+        shard_metrics = sum(1 for tag_key in metric_work_set.tag_keys() if shard.owns(tag_key))
+        logging.info(f"Shard {shard}: {shard_metrics} of {len(metric_work_set)} metric(s)")
+
+
+def iter_diff_metric_configs(previous_metric_configs, current_metric_configs):
+    """
+    Streams the diff between two config file versions as (section, MetricConfig) tuples.
+    """
+    for diff_entry in iter_metric_config_diff(previous_metric_configs, current_metric_configs):
+        yield diff_entry.section, fast_model.to_model(MetricConfig, diff_entry.metric_config)
+
+
+def apply_metric_config_diff(diff_entries, metric_config_readers=()):
+    """
+    Builds detectors for added metrics, re-trains the detectors of modified metrics (building any detector the new
+    config selects) and disables the detectors of deleted metrics. Metrics that are not in the diff are not queried.
+    Deleted metrics are only disabled if all metric_config_readers read their file without errors or invalid
+    entries, so an unreadable config file or a metric failing validation never disables detectors.
+    :param diff_entries: iterable of (section, MetricConfig)
+    :param metric_config_readers: MetricConfigReader the diff is computed from, if any
+    """
     exit_code = 0
+    metric_factory = MetricFactory()
+    for section, metric_config in diff_entries:
+        if section == "added":
+            build_exit_code = build_detectors_for_metric_configs([metric_config], metric_factory=metric_factory)
+            exit_code = max(exit_code, build_exit_code)
+        elif section == "modified":
+            train_exit_code = train_detectors_for_metric_configs(
+                [metric_config], force=True, metric_factory=metric_factory
+            )
+            build_exit_code = build_detectors_for_metric_configs([metric_config], metric_factory=metric_factory)
+            exit_code = max(exit_code, train_exit_code, build_exit_code)
+        elif section == "deleted":
+            if any(reader.exit_code for reader in metric_config_readers):
+                logging.error("Config files could not be read, deleted metrics are not disabled!")
+                return 1
+            if any(reader.invalid_entries for reader in metric_config_readers):
+                logging.error("Config files have invalid entries, deleted metrics are not disabled!")
+                return 1
+            disable_exit_code = disable_detectors_for_metric_configs([metric_config], metric_factory=metric_factory)
+            exit_code = max(exit_code, disable_exit_code)
+    return exit_code
+
+
+def profile_metric_configs(metric_configs, output_file=None, workers=None, resume=False, downsample=None):
+    """
+    Profiles each metric, writing one JSON line per metric to output_file (stdout if not set). If downsample is set,
+    the series are downsampled with that method before each test, see profile/downsampler.py.
+    """
+    from .profile.fleet_profiler import profile_metric_configs as profile_fleet
+    from .profile.fleet_profiler import read_completed_tag_keys
+
+    if not output_file or output_file == "-":
+        if resume:
+            raise ValueError("--resume requires an --output file")
+        return profile_fleet(metric_configs, sys.stdout, workers=workers, downsample=downsample)
+    completed = read_completed_tag_keys(output_file) if resume else frozenset()
+    with open(output_file, "a" if resume else "w") as output_file_handle:
+        return profile_fleet(
+            metric_configs, output_file_handle, workers=workers, completed=completed, downsample=downsample
+        )
+
+
+def parse_count_option(args, option, minimum):
+    """
+    :return: the integer value of the option, or None if it is not set
+    :raises ValueError: if the value is not an integer of at least minimum
+    """
+    value = args[option]
+    if value is None:
+        return None
+    if not value.isdigit() or int(value) < minimum:
+        raise ValueError(f"Invalid {option} '{value}', expecting at least {minimum}")
+    return int(value)
+
+
+def parse_option(args, option, parse):
+    """
+    :return: the value of the option converted with parse, or None if it is not set
+    :raises ValueError: if parse does not accept the value
+    """
+    if args[option] is None:
+        return None
+    try:
+        return parse(args[option])
+    except ValueError as e:
+        raise ValueError(f"{option}: {e}") from e
+
+
+def main(argv=None):
+    """
+    Runs a command.
+    :param argv: command line arguments, without the program name. Defaults to sys.argv[1:].
+    :return: exit code
+    """
+    args = docopt(__doc__, argv=argv, version=__version__)
+    exit_code = 0
+    shard = None
+    if args["build"] or args["train"] or args["disable"] or args["profile"]:
+        try:
+            shard = Shard.from_settings(args["--shard"], args["--rendezvous"])
+        except ValueError as e:
+            logging.error(f"{e}, set with --shard or SHARD_INDEX and SHARD_COUNT")
+            return 1
+    try:
+        workers = parse_count_option(args, "--workers", minimum=0)
+        pipeline = parse_count_option(args, "--pipeline", minimum=0)
+        io_threads = parse_count_option(args, "--io-threads", minimum=1)
+        create_concurrency = parse_count_option(args, "--create-concurrency", minimum=1)
+        memory_budget = parse_option(args, "--memory-budget", parse_size)
+        deadline_seconds = parse_option(args, "--deadline", parse_duration)
+    except ValueError as e:
+        logging.error(str(e))
+        return 1
+    # Started before the config files are read, so reading them counts towards the deadline
+    deadline = Deadline(deadline_seconds) if deadline_seconds is not None else None
+    if config.WARM_UP_KERNELS and (args["build"] or args["train"] or args["apply"] or args["serve-scheduler"]):
+        warm_up_kernels()
 
     if args["disable"]:
-        for json_config_file in args["<json_config_file>"]:
-            logging.info("")
-            metric_configs, exit_code = read_config_file(json_config_file)
-            disable_exit_code = disable_detectors_for_metric_configs(metric_configs)
-            if disable_exit_code > exit_code:
-                exit_code = disable_exit_code
-            logging.info("Done")
+        exit_code = run_for_config_files(
+            disable_detectors_for_metric_configs,
+            args["<json_config_file>"],
+            shard,
+            queue=args["--queue"],
+            workers=workers,
+            reset_queue=args["--reset-queue"],
+            journal=args["--journal"],
+            resume=args["--resume"],
+            memory_budget=memory_budget,
+        )
 
     elif args["build"]:
-        for json_config_file in args["<json_config_file>"]:
-            logging.info("")
-            metric_configs, exit_code = read_config_file(json_config_file)
-            build_exit_code = build_detectors_for_metric_configs(metric_configs)
-            if build_exit_code > exit_code:
-                exit_code = build_exit_code
-            logging.info("Done")
+        exit_code = run_for_config_files(
+            build_detectors_for_metric_configs,
+            args["<json_config_file>"],
+            shard,
+            queue=args["--queue"],
+            workers=workers,
+            reset_queue=args["--reset-queue"],
+            journal=args["--journal"],
+            resume=args["--resume"],
+            pipeline=pipeline,
+            io_threads=io_threads,
+            memory_budget=memory_budget,
+            create_concurrency=create_concurrency,
+        )
 
     elif args["train"]:
-        for json_config_file in args["<json_config_file>"]:
-            logging.info("")
-            metric_configs, exit_code = read_config_file(json_config_file)
-            train_exit_code = train_detectors_for_metric_configs(metric_configs)
-            if train_exit_code > exit_code:
-                exit_code = train_exit_code
-            logging.info("Done")
+        exit_code = run_for_config_files(
+            train_detectors_for_metric_configs,
+            args["<json_config_file>"],
+            shard,
+            queue=args["--queue"],
+            workers=workers,
+            reset_queue=args["--reset-queue"],
+            journal=args["--journal"],
+            resume=args["--resume"],
+            pipeline=pipeline,
+            io_threads=io_threads,
+            memory_budget=memory_budget,
+            deadline=deadline,
+            verify_writes=args["--verify-writes"],
+        )
 
     elif args["diff"]:
         json_config_file_previous = args["<json_config_file_previous>"]
         json_config_file_current = args["<json_config_file_current>"]
         output_file = args["<output_file>"]
         logging.info(f"Comparing {json_config_file_previous} to {json_config_file_current}")
-        previous_metric_configs, p_exit_code = read_config_file(json_config_file_previous)
-        current_metric_configs, c_exit_code = read_config_file(json_config_file_current)
-        exit_code = max(c_exit_code, p_exit_code)
-        if exit_code == 0:
-            diff = diff_metric_configs(previous_metric_configs, current_metric_configs)
-            with open(output_file, "w") as output_file_handle:
-                output_file_handle.write(json.dumps(diff, indent=4))
+        previous_metric_configs = MetricConfigReader(json_config_file_previous)
+        current_metric_configs = MetricConfigReader(json_config_file_current)
+        with MetricConfigDiffWriter() as diff_writer:
+            for diff_entry in iter_metric_config_diff(previous_metric_configs, current_metric_configs):
+                diff_writer.add(diff_entry)
+            exit_code = max(current_metric_configs.exit_code, previous_metric_configs.exit_code)
+            if current_metric_configs.invalid_entries or previous_metric_configs.invalid_entries:
+                # A metric failing validation would be written as deleted, and disabled by apply --diff
+                logging.error(f"Config files have invalid entries, not writing {output_file}!")
+                exit_code = 1
+            if exit_code == 0:
+                with open(output_file, "w") as output_file_handle:
+                    diff_writer.write(output_file_handle)
+        logging.info("Done")
+
+    elif args["apply"]:
+        if args["--diff"]:
+            logging.info(f"Applying {args['--diff']}")
+            try:
+                apply_exit_code = apply_metric_config_diff(read_diff_file(args["--diff"]))
+            except Exception as e:
+                logging.exception(
+                    f"Exception {e.__class__.__name__} while reading diff file '{args['--diff']}'! Skipping!"
+                )
+                apply_exit_code = 1
+            exit_code = max(exit_code, apply_exit_code)
+        else:
+            json_config_file_previous = args["<json_config_file_previous>"]
+            json_config_file_current = args["<json_config_file_current>"]
+            logging.info(f"Applying changes from {json_config_file_previous} to {json_config_file_current}")
+            metric_config_readers = (
+                MetricConfigReader(json_config_file_previous),
+                MetricConfigReader(json_config_file_current),
+            )
+            apply_exit_code = apply_metric_config_diff(
+                iter_diff_metric_configs(*metric_config_readers), metric_config_readers
+            )
+            exit_code = max(
+                [exit_code, apply_exit_code]
+                + [max(reader.exit_code, min(reader.invalid_entries, 1)) for reader in metric_config_readers]
+            )
         logging.info("Done")
 
-    sys.exit(exit_code)
+    elif args["serve-scheduler"]:
+        from .scheduler import TrainingScheduler
+
+        stop_event = threading.Event()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signal_number, lambda *_: stop_event.set())
+        scheduler = TrainingScheduler(
+            args["<json_config_file>"],
+            reload_seconds=float(args["--reload-interval"]),
+            jitter_seconds=float(args["--jitter"]),
+        )
+        exit_code = scheduler.run(stop_event)
+        logging.info("Done")
+
+    elif args["profile"]:
+        if args["--resume"] and args["--output"] == "-":
+            logging.error("--resume requires an --output file")
+            return 1
+        from .profile.downsampler import DOWNSAMPLE_METHODS
+
+        if args["--downsample"] and args["--downsample"] not in DOWNSAMPLE_METHODS:
+            logging.error(
+                f"Invalid --downsample '{args['--downsample']}', expecting one of {', '.join(DOWNSAMPLE_METHODS)}"
+            )
+            return 1
+        metric_config_readers = [
+            MetricConfigReader(json_config_file)
+            for json_config_file in args["<json_config_file>"]
+        ]
+        # A metric listed in several files is only profiled once
+        metric_configs = iter_unique_metric_configs(metric_config_readers)
+        if shard:
+            logging.info(f"Profiling shard {shard}")
+            metric_configs = shard.filter(metric_configs)
+        profile_exit_code = profile_metric_configs(
+            metric_configs,
+            output_file=args["--output"],
+            workers=workers,
+            resume=args["--resume"],
+            downsample=args["--downsample"],
+        )
+        exit_code = max(
+            [exit_code, profile_exit_code]
+            + [reader.exit_code for reader in metric_config_readers]
+        )
+        logging.info("Done")
+
+    elif args["serve"]:
+        from .server import serve
+
+        exit_code = serve(args["--socket"], warm_up=not args["--no-warm-up"])
+
+    return exit_code
+
+
+def console_script_entrypoint():
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Thin client of the serve command, see server.py.
+
+Only imports the standard library, so it starts in milliseconds. It sends its command
+line, working directory and the settings of its environment (see
+config.CLIENT_ENVIRONMENT) to the server, writes the output of the command to its own
+stdout and stderr, and exits with the command exit code. If no server is listening, the
+command runs in this process instead.
+
+The settings may include credentials, so they are only sent to a socket owned by the
+user, in a directory that other users can not write to.
+"""
+import json
+import os
+import socket
+import stat
+import sys
+
+from . import config
+
+
+def check_owned_by_user(path, directory=False):
+    """
+    :raises PermissionError: if the path is not owned by the user, or can be written to
+                             by other users
+    :raises FileNotFoundError: if the path does not exist
+    """
+    path_stat = os.stat(path)
+    if path_stat.st_uid != os.getuid():
+        raise PermissionError(f"{path} is not owned by the user")
+    if directory and path_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(f"{path} can be written to by other users")
+
+
+def check_socket_path(socket_path):
+    """
+    Checks that the socket and its directory belong to the user, so no other user can be
+    listening on the socket.
+    """
+    check_owned_by_user(os.path.dirname(os.path.abspath(socket_path)), directory=True)
+    check_owned_by_user(socket_path)
+
+
+def client_environment():
+    return {
+        name: value
+        for name, value in os.environ.items()
+        if config.is_client_environment(name)
+    }
+
+
+def run_remote(argv, socket_path=None):
+    """
+    :return: exit code of the command
+    :raises OSError: if no server is listening on the socket, or the socket does not
+                     belong to the user
+    """
+    socket_path = socket_path or config.SERVER_SOCKET
+    check_socket_path(socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client_socket:
+        client_socket.connect(socket_path)
+        request = {"argv": list(argv), "cwd": os.getcwd(), "env": client_environment()}
+        client_socket.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        with client_socket.makefile("rb") as responses:
+            for line in responses:
+                message = json.loads(line)
+                if "exit_code" in message:
+                    return message["exit_code"]
+                stream = sys.stdout if message["stream"] == "stdout" else sys.stderr
+                stream.write(message["data"])
+                stream.flush()
+    sys.stderr.write("Connection to the server closed before the command completed\n")
+    return 1
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    try:
+        return run_remote(argv)
+    except (FileNotFoundError, ConnectionRefusedError):
+        sys.stderr.write(
+            f"No server listening on {config.SERVER_SOCKET}, running the command "
+            "locally\n"
+        )
+    except PermissionError as e:
+        sys.stderr.write(f"Not using the server, {e}, running the command locally\n")
+    import logging
+    from .cli import main as cli_main
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        return cli_main(argv)
+    except SystemExit as e:
+        return e.code
+
+
+def console_script_entrypoint():
+    sys.exit(main())
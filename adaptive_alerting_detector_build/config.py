@@ -1,17 +1,77 @@
 import os
-import uuid
+import tempfile
 from .exceptions import AdaptiveAlertingDetectorBuildError
 
-LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+# Settings are read from the environment when they are accessed, e.g. config.GRAPHITE_URL, not when the module is
+# imported, so importing the package has no side effect and tests can set the environment after importing it.
+_SETTINGS = {
+    "LOG_LEVEL": lambda: os.environ.get("LOG_LEVEL", "INFO"),
+    "MODEL_SERVICE_USER": lambda: os.environ.get("MODEL_SERVICE_USER"),
+    "MODEL_SERVICE_URL": lambda: os.environ.get("MODEL_SERVICE_URL"),
+    "GRAPHITE_URL": lambda: os.environ.get("GRAPHITE_URL"),
+    "GRAPHITE_HEADERS": lambda: os.environ.get("GRAPHITE_HEADERS"),
+    # Shard processed by this node, see metrics/sharding.py
+    "SHARD_INDEX": lambda: os.environ.get("SHARD_INDEX"),
+    "SHARD_COUNT": lambda: os.environ.get("SHARD_COUNT"),
+    "SHARD_RENDEZVOUS": lambda: os.environ.get("SHARD_RENDEZVOUS", "").lower() in ("1", "true", "yes"),
+    # Unix socket of the serve command, see server.py and client.py. The default is in a directory only accessible
+    # to the user, XDG_RUNTIME_DIR or a per-user directory created by the server in the temporary directory
+    "SERVER_SOCKET": lambda: os.environ.get(
+        "ADAPTIVE_ALERTING_SOCKET",
+        os.path.join(
+            os.environ.get("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(), f"adaptive-alerting-{os.getuid()}"),
+            "adaptive-alerting.sock",
+        ),
+    ),
+    # Compiled numba kernels, shared by all processes, see utils/jit.py
+    "NUMBA_CACHE_DIR": lambda: os.environ.get(
+        "NUMBA_CACHE_DIR",
+        os.path.join(
+            os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "adaptive-alerting-detector-build", "numba"
+        ),
+    ),
+    # Temporary files of the memory-bounded mode, see metrics/chunked.py
+    "SPILL_DIR": lambda: os.environ.get("ADAPTIVE_ALERTING_SPILL_DIR", tempfile.gettempdir()),
+    # Upper bounds of the adaptive request limits of each backend, see utils/ratelimit.py
+    "RATE_LIMIT_MAX_RATE": lambda: float(os.environ.get("RATE_LIMIT_MAX_RATE", "1000")),
+    "RATE_LIMIT_MAX_CONCURRENCY": lambda: int(os.environ.get("RATE_LIMIT_MAX_CONCURRENCY", "64")),
+    # Compile the numba kernels in a background thread when build, train or apply starts
+    "WARM_UP_KERNELS": lambda: os.environ.get("WARM_UP_KERNELS", "").lower() in ("1", "true", "yes"),
+}
 
-MODEL_SERVICE_USER = os.environ.get("MODEL_SERVICE_USER")
+# Environment variables read by the commands, the only ones sent by adaptive-alerting-client to the serve command
+CLIENT_ENVIRONMENT = (
+    "LOG_LEVEL",
+    "MODEL_SERVICE_USER",
+    "MODEL_SERVICE_URL",
+    "GRAPHITE_URL",
+    "GRAPHITE_HEADERS",
+    "SHARD_INDEX",
+    "SHARD_COUNT",
+    "SHARD_RENDEZVOUS",
+    "NUMBA_CACHE_DIR",
+    "XDG_CACHE_HOME",
+    "ADAPTIVE_ALERTING_SPILL_DIR",
+    "RATE_LIMIT_MAX_RATE",
+    "RATE_LIMIT_MAX_CONCURRENCY",
+    "WARM_UP_KERNELS",
+)
+CLIENT_ENVIRONMENT_PREFIXES = ("GRAPHITE_HEADER_",)
 
-MODEL_SERVICE_URL = os.environ.get("MODEL_SERVICE_URL")
 
-GRAPHITE_URL = os.environ.get("GRAPHITE_URL")
+def is_client_environment(name):
+    return name in CLIENT_ENVIRONMENT or name.startswith(CLIENT_ENVIRONMENT_PREFIXES)
 
-GRAPHITE_HEADERS = os.environ.get("GRAPHITE_HEADERS")
 
+def __getattr__(name):
+    try:
+        return _SETTINGS[name]()
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_SETTINGS))
 
 def get_datasource_config():
     """
@@ -29,9 +89,10 @@ def get_datasource_config():
         "x-org-id: 1"
 
     """
-    if not GRAPHITE_URL:
+    graphite_url = __getattr__("GRAPHITE_URL")
+    if not graphite_url:
         raise ValueError("GRAPHITE_URL not set.")
-    graphite_config = {"url": GRAPHITE_URL, "headers": {}}
+    graphite_config = {"url": graphite_url, "headers": {}}
     for k, v in os.environ.items():
         if not k.startswith("GRAPHITE_HEADER_") or k.endswith("_VALUE"):
             continue
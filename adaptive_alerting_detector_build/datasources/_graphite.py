@@ -1,9 +1,11 @@
 import requests
-import pandas as pd
 from adaptive_alerting_detector_build.datasources import (
     base_datasource,
     DatasourceQueryException,
 )
+from adaptive_alerting_detector_build.timeseries import TimeSeries
+from adaptive_alerting_detector_build.utils.deadline import request_timeout
+from adaptive_alerting_detector_build.utils.ratelimit import limiter_for
 
 
 class graphite(base_datasource):
@@ -11,10 +13,17 @@ class graphite(base_datasource):
         self._url = url
         self._headers = headers
         self._render_url = f"{url}/render"
+        # Reuses connections for the metrics sharing this datasource
+        self._session = requests.Session()
         super(graphite, self).__init__(**kwargs)
 
     # how should nulls be treated?
     def query(self, tags, start="-168hours", end="now", interval=None, fn="sum", maxDataPoints=None):
+        return self.query_series(
+            tags, start=start, end=end, interval=interval, fn=fn, maxDataPoints=maxDataPoints
+        ).to_frame()
+
+    def query_series(self, tags, start="-168hours", end="now", interval=None, fn="sum", maxDataPoints=None):
         try:
             tag_query = ",".join([f"'{k}={v}'" for k, v in sorted(tags.items())])
             query = f"seriesByTag({tag_query})"
@@ -27,18 +36,14 @@ class graphite(base_datasource):
             params = {"target": query, "from": start, "until": end, "format": "json"}
             if maxDataPoints:
                 params["maxDataPoints"] = maxDataPoints
-            response = requests.get(self._render_url, params=params, headers=self._headers, timeout=60)
+            response = limiter_for(self._url).call(
+                lambda: self._session.get(
+                    self._render_url, params=params, headers=self._headers, timeout=request_timeout(60)
+                )
+            )
             response.raise_for_status()
             response_list = response.json()
-            data = list()
-            if response_list:
-                for datapoint in response.json()[0]["datapoints"]:
-                    data.append({"time": datapoint[1], "value": datapoint[0]})
-            df = pd.DataFrame(data, columns=["time", "value"])
-            datetime_series = pd.to_datetime(df["time"], unit="s")
-            datetime_index = pd.DatetimeIndex(datetime_series.values)
-            df2 = df.set_index(datetime_index)
-            df2.drop("time", axis=1, inplace=True)
-            return df2
+            datapoints = response_list[0]["datapoints"] if response_list else []
+            return TimeSeries.from_datapoints(datapoints)
         except Exception as e:
             raise DatasourceQueryException(f"Error querying graphite. {e}")
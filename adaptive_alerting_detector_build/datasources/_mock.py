@@ -1,9 +1,10 @@
 import requests
-import pandas as pd
+import numpy as np
 from adaptive_alerting_detector_build.datasources import (
     base_datasource,
     DatasourceQueryException,
 )
+from adaptive_alerting_detector_build.timeseries import TimeSeries
 import time
 
 
@@ -14,17 +15,13 @@ class mock(base_datasource):
 
     # how should nulls be treated?
     def query(self, tags):
+        return self.query_series(tags).to_frame()
+
+    def query_series(self, tags):
         try:
             current_time = int(time.time())
-            data = [
-                {"time": current_time + (i * 60), "value": d}
-                for i, d in enumerate(self._data)
-            ]
-            df = pd.DataFrame(data, columns=["time", "value"])
-            datetime_series = pd.to_datetime(df["time"], unit="s")
-            datetime_index = pd.DatetimeIndex(datetime_series.values)
-            df2 = df.set_index(datetime_index)
-            df2.drop("time", axis=1, inplace=True)
-            return df2
+            timestamps = current_time + np.arange(len(self._data), dtype=np.int64) * 60
+            # None values become NaN
+            return TimeSeries.from_epoch_seconds(timestamps, np.array(self._data, dtype=np.float64))
         except Exception as e:
             raise DatasourceQueryException(f"Error generating mock data. {e}")
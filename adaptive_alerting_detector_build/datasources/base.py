@@ -11,5 +11,14 @@ class base_datasource:
     def __init__(self, **kwargs):
         pass
 
-    def query(self):
+    def query(self, **kwargs):
+        """
+        :return: DataFrame with a DatetimeIndex and a 'value' column
+        """
+        return self.query_series(**kwargs).to_frame()
+
+    def query_series(self, **kwargs):
+        """
+        :return: TimeSeries, see timeseries.py
+        """
         raise NotImplementedError
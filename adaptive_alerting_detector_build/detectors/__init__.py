@@ -1,4 +1,4 @@
 from .base import Detector, DetectorUUID
 from .factory import build_detector, from_json
-from .client import DetectorClient
+from .client import DetectorClient, WriteVerifier
 from .constant_threshold import ConstantThresholdDetector
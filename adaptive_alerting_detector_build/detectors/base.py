@@ -1,6 +1,8 @@
 import datetime
+import pandas as pd
 import related
 from related import to_dict
+from adaptive_alerting_detector_build.utils import fast_model
 from adaptive_alerting_detector_build.utils.fields import TimeDelta
 
 @related.immutable
@@ -56,4 +58,44 @@ class Detector:
             _needs_training = True
         elif self.minutes_since_trained and self.minutes_since_trained > training_interval_minutes:
             _needs_training = True
-        return _needs_training
\ No newline at end of file
+        return _needs_training
+
+    @property
+    def overdue_ratio(self):
+        """
+        Time since the detector was last trained, relative to its training interval. As with needs_training,
+        detectors without a UUID are infinitely overdue, and detectors without a training interval or a last update
+        time are not overdue.
+        """
+        training_interval_minutes = self.training_interval.total_seconds() / 60
+        if training_interval_minutes == 0:
+            return 0.0
+        if not self.uuid:
+            return float("inf")
+        if not self.last_updated:
+            return 0.0
+        return self.minutes_since_trained / training_interval_minutes
+
+
+def _last_update_timestamp(value):
+    return datetime.datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+
+
+def _detector_meta(value):
+    return related.to_model(DetectorMeta, value)
+
+
+fast_model.register(
+    Detector,
+    dict(
+        type=str,
+        config=dict,
+        enabled=bool,
+        trusted=bool,
+        training_interval=pd.to_timedelta,
+        last_updated=_last_update_timestamp,
+        uuid=str,
+        created_by=str,
+        meta=_detector_meta,
+    ),
+)
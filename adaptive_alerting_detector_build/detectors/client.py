@@ -1,27 +1,30 @@
 import json
 import logging
 import requests
-import time
-import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import related
 from .factory import build_detector
 from .exceptions import DetectorBuilderError
+from .readiness import ReadinessPoller
 
-from adaptive_alerting_detector_build.config import (
-    MODEL_SERVICE_URL,
-    MODEL_SERVICE_USER,
-)
+from adaptive_alerting_detector_build import config
 from adaptive_alerting_detector_build import detectors
 from adaptive_alerting_detector_build.detectors.mapping import (
     DetectorMapping,
     build_metric_detector_mapping,
 )
+from adaptive_alerting_detector_build.utils.deadline import DeadlineExceeded, request_timeout
+from adaptive_alerting_detector_build.utils.ratelimit import limiter_for
 
 
 LOGGER = logging.getLogger(__name__)
 
 
 CREATE_DETECTOR_TIMEOUT = 60
+# Number of detectors read back at once by verify_detectors(), and written between two verifications by WriteVerifier
+VERIFY_THREADS = 8
+VERIFY_BATCH_SIZE = 100
 
 
 class DetectorBuilderClientError(DetectorBuilderError):
@@ -38,29 +41,42 @@ class DetectorClient:
     def __init__(self, model_service_url=None, model_service_user=None, **kwargs):
         if model_service_url:
             self._url = model_service_url
-        elif MODEL_SERVICE_URL:
-            self._url = MODEL_SERVICE_URL
+        elif config.MODEL_SERVICE_URL:
+            self._url = config.MODEL_SERVICE_URL
         else:
             raise ValueError("model_service_url not found.")
 
         if model_service_user:
             self._user = model_service_user
-        elif MODEL_SERVICE_USER:
-            self._user = MODEL_SERVICE_USER
+        elif config.MODEL_SERVICE_USER:
+            self._user = config.MODEL_SERVICE_USER
         else:
             raise ValueError("model_service_user not found.")
+        self._lock = threading.Lock()
+        self._readiness_poller = None
+
+    def _request(self, method, url, **kwargs):
+        """
+        Sends a request to the model service, within the limits shared by the process (see utils/ratelimit.py).
+        The timeout is set when the request is sent, so it is bounded by the time left before an active deadline.
+        """
+        return limiter_for(self._url).call(
+            lambda: requests.request(method, url, timeout=request_timeout(30), **kwargs)
+        )
 
     def get_detector(self, detector_uuid):
-        response = requests.get(
-            f"{self._url}/api/v2/detectors/findByUuid?uuid={detector_uuid}",
-            timeout=30
+        response = self._request(
+            "get",
+            f"{self._url}/api/v2/detectors/findByUuid?uuid={detector_uuid}"
         )
         response.raise_for_status()
         return detectors.from_json(response.text)
 
     def list_detectors_for_metric(self, metric_tags):
-        response = requests.post(
-            f"{self._url}/api/detectorMappings/findMatchingByTags", json=[metric_tags],
+        response = self._request(
+            "post",
+            f"{self._url}/api/detectorMappings/findMatchingByTags",
+            json=[metric_tags]
         )
         response.raise_for_status()
         detectors = list()
@@ -78,10 +94,10 @@ class DetectorClient:
         return detectors
 
     def list_detector_mappings(self, detector_uuid):
-        response = requests.post(
+        response = self._request(
+            "post",
             f"{self._url}/api/detectorMappings/search",
-            json={"detectorUuid": detector_uuid},
-            timeout=30
+            json={"detectorUuid": detector_uuid}
         )
         response.raise_for_status()
         detector_mappings = list()
@@ -93,77 +109,121 @@ class DetectorClient:
 
     def save_metric_detector_mapping(self, detector_uuid, metric):
         metric_detector_mapping = build_metric_detector_mapping(detector_uuid, metric)
-        create_metric_detector_mapping = requests.post(
+        create_metric_detector_mapping = self._request(
+            "post",
             f"{self._url}/api/detectorMappings",
-            json=related.to_dict(metric_detector_mapping),
-            timeout=30,
+            json=related.to_dict(metric_detector_mapping)
         )
         create_metric_detector_mapping.raise_for_status()
 
     def delete_metric_detector_mapping(self, detector_mapping_id):
-        response = requests.delete(
-            f"{self._url}/api/detectorMappings?id={detector_mapping_id}", timeout=30
+        response = self._request(
+            "delete",
+            f"{self._url}/api/detectorMappings?id={detector_mapping_id}"
         )
         response.raise_for_status()
 
     def disable_metric_detector_mapping(self, detector_mapping_id):
-        response = requests.put(
-            f"{self._url}/api/detectorMappings/disable?id={detector_mapping_id}", timeout=30
+        response = self._request(
+            "put",
+            f"{self._url}/api/detectorMappings/disable?id={detector_mapping_id}"
         )
         response.raise_for_status()
 
-    def create_detector(self, detector):
+    def post_detector(self, detector):
+        """
+        Creates a detector, without waiting for it to be readable from the model service.
+        :return: UUID of the new detector
+        """
         detector.created_by = self._user
         create_detector_request = related.to_dict(detector, suppress_empty_values=True)
-        create_detector_response = requests.post(
-            f"{self._url}/api/v2/detectors", json=create_detector_request, timeout=30
+        create_detector_response = self._request(
+            "post",
+            f"{self._url}/api/v2/detectors", json=create_detector_request
         )
         create_detector_response.raise_for_status()
-        detector_uuid = create_detector_response.text
-        create_detector_start = datetime.datetime.now()
-        create_detector_elapsed = create_detector_start - datetime.datetime.now()
-        detector = None
-        while (
-            not detector
-            and create_detector_elapsed.total_seconds() < CREATE_DETECTOR_TIMEOUT
-        ):
-            time.sleep(1.0)
-            detector = self.get_detector(detector_uuid)
-            create_detector_elapsed = datetime.datetime.now() - create_detector_start
-        if detector:
-            return detector
-        else:
-            raise DetectorBuilderClientError(
-                f"Timeout waiting for detector uuid '{detector_uuid}' to be available from model service."
-            )
+        return create_detector_response.text
+
+    def wait_for_detector(self, detector_uuid):
+        """
+        :return: Future resolved with the detector once the model service returns it, see detectors/readiness.py
+        """
+        with self._lock:
+            if self._readiness_poller is None:
+                self._readiness_poller = ReadinessPoller(self.get_detector, timeout=CREATE_DETECTOR_TIMEOUT)
+        return self._readiness_poller.wait_for(detector_uuid)
+
+    def create_detector(self, detector):
+        """
+        Creates a detector and waits until the model service returns it. Detectors created by several threads of the
+        same client are polled together.
+        """
+        return self.wait_for_detector(self.post_detector(detector)).result()
 
-    def update_detector(self, detector):
+    def update_detector(self, detector, read_after_write=True):
         """
         * The service requires 'type' on update, but we treat it as immutable.
         * If values for 'detector_config', 'enabled', or 'trusted' are not passed, the
           current value is used.
+
+        :param read_after_write: Returns the detector read back from the service. If False, the given detector is
+                                 returned without reading it back, see WriteVerifier to verify updates in batches.
         """
         update_request = related.to_dict(detector)
         del update_request["training_interval"]
         del update_request["lastUpdateTimestamp"]
         del update_request["createdBy"]
         del update_request["meta"]
-        response = requests.put(
+        response = self._request(
+            "put",
             f"{self._url}/api/v2/detectors?uuid={detector.uuid}",
-            json=update_request,
-            timeout=30,
+            json=update_request
         )
         response.raise_for_status()
+        if not read_after_write:
+            return detector
         return self.get_detector(detector.uuid)
 
+    def verify_detectors(self, updated_detectors):
+        """
+        Reads back updated detectors, several at once.
+        :return: tuple of (list of the detectors the service returns with a different config, or can't return,
+                 list of the detectors not read back because the active deadline was reached)
+        """
+
+        def differs(detector):
+            """
+            :return: True if the detector differs, None if it was not read back
+            """
+            try:
+                stored_detector = self.get_detector(detector.uuid)
+            except DeadlineExceeded:
+                return None
+            except requests.exceptions.RequestException as e:
+                LOGGER.warning(f"Unable to read back detector with UUID '{detector.uuid}': {e}")
+                return True
+            return (
+                related.to_dict(stored_detector.config) != related.to_dict(detector.config)
+                or stored_detector.enabled != detector.enabled
+                or stored_detector.trusted != detector.trusted
+            )
+
+        if not updated_detectors:
+            return [], []
+        with ThreadPoolExecutor(max_workers=min(VERIFY_THREADS, len(updated_detectors))) as executor:
+            results = list(zip(updated_detectors, executor.map(differs, updated_detectors)))
+        mismatched = [detector for detector, mismatch in results if mismatch]
+        unverified = [detector for detector, mismatch in results if mismatch is None]
+        return mismatched, unverified
+
     def disable_detector(self, detector_uuid):
         """
         
         """
-        response = requests.post(
+        response = self._request(
+            "post",
             f"{self._url}/api/v2/detectors/toggleDetector?enabled=false&uuid={detector_uuid}",
-            json={},
-            timeout=30
+            json={}
         )
         response.raise_for_status()
 
@@ -171,10 +231,10 @@ class DetectorClient:
         """
         
         """
-        response = requests.get(
+        response = self._request(
+            "get",
             f"{self._url}/api/v2/detectors/toggleDetector?enabled=true&uuid={detector_uuid}",
-            json={},
-            timeout=30
+            json={}
         )
         response.raise_for_status()
 
@@ -182,7 +242,42 @@ class DetectorClient:
         """
 
         """
-        response = requests.delete(
-            f"{self._url}/api/v2/detectors?uuid={detector_uuid}", timeout=30
+        response = self._request(
+            "delete",
+            f"{self._url}/api/v2/detectors?uuid={detector_uuid}"
         )
-        response.raise_for_status()
\ No newline at end of file
+        response.raise_for_status()
+
+
+class WriteVerifier:
+    """
+    Verifies the detectors updated with update_detector(read_after_write=False), one batch at a time. Detectors that
+    can't be read back before the active deadline (see utils/deadline.py) are listed in unverified.
+    """
+
+    def __init__(self, batch_size=VERIFY_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.verified = 0
+        self.mismatched = []
+        self.unverified = []
+        self._pending = []
+
+    def add(self, detector_client, detector):
+        self._pending.append((detector_client, detector))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        detectors_by_client = dict()
+        for detector_client, detector in pending:
+            detectors_by_client.setdefault(id(detector_client), (detector_client, []))[1].append(detector)
+        for detector_client, client_detectors in detectors_by_client.values():
+            mismatched, unverified = detector_client.verify_detectors(client_detectors)
+            for detector in mismatched:
+                LOGGER.error(
+                    f"Detector with UUID '{detector.uuid}' read back from the model service does not match its update"
+                )
+                self.mismatched.append(detector.uuid)
+            self.unverified.extend(detector.uuid for detector in unverified)
+            self.verified += len(client_detectors) - len(unverified)
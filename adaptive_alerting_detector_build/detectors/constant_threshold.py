@@ -11,14 +11,13 @@ from enum import unique, Enum
 import logging
 import numpy as np
 import pandas as pd
-import numba
 
-from numba import jit
 # from adaptive_alerting_detector_build.detectors import exceptions
-from . import Detector
+from adaptive_alerting_detector_build.timeseries import TimeSeries
+from adaptive_alerting_detector_build.utils import fast_model
+from . import Detector, kernels
 from .exceptions import DetectorBuilderError
 
-logging.basicConfig(level=logging.INFO)
 LOGGER = logging.getLogger(__name__)
 
 
@@ -81,6 +80,42 @@ class ConstantThresholdConfig:
     params = related.ChildField(ConstantThresholdParams, required=False)
 
 
+fast_model.register(
+    ConstantThresholdHyperparameters,
+    dict(
+        strategy=ConstantThresholdStrategy,
+        lower_weak_multiplier=float,
+        lower_strong_multiplier=float,
+        upper_weak_multiplier=float,
+        upper_strong_multiplier=float,
+        hampel_window_size=float,
+        hampel_n_signma=float,
+    ),
+)
+fast_model.register(
+    ConstantThresholdThresholds,
+    dict(
+        weak_upper_threshold=float,
+        strong_upper_threshold=float,
+        weak_lower_threshold=float,
+        strong_lower_threshold=float,
+    ),
+)
+fast_model.register(
+    ConstantThresholdParams,
+    dict(type=ConstantThresholdType, thresholds=ConstantThresholdThresholds),
+)
+fast_model.register(ConstantThresholdTrainingMetaData, dict(training_interval=str))
+fast_model.register(
+    ConstantThresholdConfig,
+    dict(
+        hyperparams=ConstantThresholdHyperparameters,
+        training_meta_data=ConstantThresholdTrainingMetaData,
+        params=ConstantThresholdParams,
+    ),
+)
+
+
 class ConstantThresholdDetector(Detector):
     """Constant Threshold Detectors Builder class.
 
@@ -115,8 +150,9 @@ class ConstantThresholdDetector(Detector):
 
     def train(self, data, metric_type):
         """
+        :param data: TimeSeries, or DataFrame / Series of the metric values
         """
-        data_drop_nan = data.dropna(axis=0, how="any", inplace=False)
+        data_drop_nan = _valid_values(data)
         strategy = self.config.hyperparams.strategy
 
         threshold_type = _threshold_type(metric_type)
@@ -128,8 +164,7 @@ class ConstantThresholdDetector(Detector):
         elif strategy == ConstantThresholdStrategy.QUARTILE:
             self._train_quartile(data_drop_nan, threshold_type)
         elif strategy == ConstantThresholdStrategy.HIGHWATERMARK:
-            data_series = pd.Series(np.array(data_drop_nan.squeeze()))
-            self._train_highwatermark(data_series, threshold_type)
+            self._train_highwatermark(data_drop_nan, threshold_type)
 
     def _train_sigma(self, sample, threshold_type):
         """Performs threshold calculations using sigma (standard deviation) strategy.
@@ -219,6 +254,18 @@ class ConstantThresholdDetector(Detector):
         )
 
 
+def _valid_values(data):
+    """Returns the non missing values of the data as a float64 array, without copying a TimeSeries without gaps.
+
+        Parameters:
+            data: TimeSeries, or DataFrame / Series of the metric values
+    """
+    if isinstance(data, TimeSeries):
+        return data.astype(np.float64).valid_values()
+    values = np.asarray(data, dtype=np.float64).ravel()
+    return values[~np.isnan(values)]
+
+
 def _data_cleanup(input_series):
     """Performs data cleanup:
             Uses interquartile range to determine outliers. Any datapoint greater than 3*IQR is 
@@ -244,7 +291,6 @@ def _data_cleanup(input_series):
     return new_series
 
 
-@jit(nopython=True)
 def _hampel_filter(input_series, window_size=10, n_sigmas=3):
     """Performs outlier detection with Hampel Filter. The goal of the Hampel filter is to identify and replace outliers in a given series. 
         It uses a sliding window of configurable width to go over the data. For each window (given observation and the 2 window_size 
@@ -259,25 +305,15 @@ def _hampel_filter(input_series, window_size=10, n_sigmas=3):
 
         Returns:
             series_wo_outliers: series of data with outliers removed and replaced with MAD
-            outliers: list of detected outliers
+            outliers: array of the indices of the detected outliers
     """
     
     n = len(input_series)
     if n < 30:
         raise DetectorBuilderError("Sample must have at least thirty elements")
-    
-    series_wo_outliers = input_series.copy()
-    k = 1.4826 # scale factor for Gaussian distribution
-    outliers = []
-    
-    for i in range((window_size),(n - window_size)):
-        x0 = np.nanmedian(input_series[(i - window_size):(i + window_size)])
-        S0 = k * np.nanmedian(np.abs(input_series[(i - window_size):(i + window_size)] - x0))
-        if (np.abs(input_series[i] - x0) > n_sigmas * S0):
-            series_wo_outliers[i] = x0
-            outliers.append(i)
-    
-    return series_wo_outliers, outliers
+
+    # Converted to the kernel signature, hyperparameters are floats
+    return kernels.hampel_filter(np.asarray(input_series, dtype=np.float64), int(window_size), float(n_sigmas))
 
 
 def _threshold_type(metric_type):
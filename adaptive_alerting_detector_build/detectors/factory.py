@@ -1,4 +1,5 @@
-import related
+import json
+from adaptive_alerting_detector_build.utils import fast_model
 from . import Detector
 from .exceptions import DetectorBuilderError
 
@@ -12,7 +13,7 @@ def get_detector_class(type):
 
 
 def from_json(payload):
-    base_detector = related.from_json(payload, Detector)
+    base_detector = fast_model.to_model(Detector, json.loads(payload))
     return build_detector(
         base_detector.type,
         base_detector.config,
@@ -28,7 +29,7 @@ def build_detector(type, config, enabled=True, trusted=False,
     detector_class = get_detector_class(type)
     if not detector_class:
         raise DetectorBuilderError(f"Unknown detector type '{type}'")
-    detector_config = related.to_model(detector_class.config_class, config)
+    detector_config = fast_model.to_model(detector_class.config_class, config)
     training_interval = getattr(detector_config.training_meta_data, "training_interval", "0")
     return detector_class(
         type=type, 
@@ -0,0 +1,41 @@
+"""
+Numba kernels of the detectors.
+
+Each kernel has an explicit signature, so it is compiled once whatever the type of the
+hyperparameters, and is cached on disk. Callers convert their arguments to the signature
+types.
+"""
+import numpy as np
+
+from adaptive_alerting_detector_build.utils.jit import lazy_jit
+
+
+@lazy_jit(
+    "Tuple((float64[:], int64[:]))(float64[:], int64, float64)",
+    nopython=True,
+    cache=True,
+)
+def hampel_filter(input_series, window_size, n_sigmas):
+    """
+    :param input_series: float64 array
+    :param window_size: number of elements on each side of the sliding window
+    :param n_sigmas: number of median absolute deviations identifying an outlier
+    :return: copy of input_series with the outliers replaced by their window median, and
+             the outliers indices
+    """
+    n = len(input_series)
+    series_wo_outliers = input_series.copy()
+    k = 1.4826  # scale factor for Gaussian distribution
+    outliers = np.empty(n, dtype=np.int64)
+    n_outliers = 0
+
+    for i in range(window_size, n - window_size):
+        window = input_series[(i - window_size) : (i + window_size)]
+        x0 = np.nanmedian(window)
+        S0 = k * np.nanmedian(np.abs(window - x0))
+        if np.abs(input_series[i] - x0) > n_sigmas * S0:
+            series_wo_outliers[i] = x0
+            outliers[n_outliers] = i
+            n_outliers += 1
+
+    return series_wo_outliers, outliers[:n_outliers]
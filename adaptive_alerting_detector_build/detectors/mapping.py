@@ -1,6 +1,6 @@
 import related
 
-from adaptive_alerting_detector_build.config import MODEL_SERVICE_USER
+from adaptive_alerting_detector_build import config
 from adaptive_alerting_detector_build.detectors import DetectorUUID
 
 
@@ -56,6 +56,6 @@ def build_metric_detector_mapping(detector_uuid, metric):
             "detector": {"uuid": detector_uuid},
             "expression": {"operands": operands, "operator": "AND"},
             "fields": fields,
-            "user": {"id": MODEL_SERVICE_USER},
+            "user": {"id": config.MODEL_SERVICE_USER},
         }
     )
@@ -0,0 +1,139 @@
+"""
+Waits for newly created detectors to be readable from the model service.
+
+The model service returns the UUID of a new detector before it can be read back. Instead
+of every caller sleeping and polling its own detector, a ReadinessPoller thread checks
+all the pending UUIDs in rounds. Each UUID is checked again after a delay that starts at
+INITIAL_POLL_DELAY and doubles up to MAX_POLL_DELAY, until the detector is returned or
+POLL_TIMEOUT seconds have passed since it was created.
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .exceptions import DetectorBuilderError
+
+POLL_TIMEOUT = 60
+INITIAL_POLL_DELAY = 0.25
+MAX_POLL_DELAY = 8.0
+# Number of UUIDs checked at once in a round
+POLL_THREADS = 8
+
+
+class DetectorNotReadyError(DetectorBuilderError):
+    """Raised when a created detector can't be read back before the timeout."""
+
+
+class _Pending:
+    def __init__(self, future, now, timeout):
+        self.future = future
+        self.delay = INITIAL_POLL_DELAY
+        self.next_check = now + self.delay
+        self.give_up = now + timeout
+
+
+class ReadinessPoller:
+    def __init__(self, get_detector, timeout=POLL_TIMEOUT, clock=time.monotonic):
+        """
+        :param get_detector: function returning the detector of a UUID, e.g.
+                             DetectorClient.get_detector
+        """
+        self._get_detector = get_detector
+        self._timeout = timeout
+        self._clock = clock
+        self._pending = dict()
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def wait_for(self, detector_uuid):
+        """
+        :return: Future resolved with the detector once it can be read back, or failed
+                 with DetectorNotReadyError
+        """
+        future = Future()
+        with self._condition:
+            self._pending[detector_uuid] = _Pending(
+                future, self._clock(), self._timeout
+            )
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="detector-readiness", daemon=True
+                )
+                self._thread.start()
+            self._condition.notify()
+        return future
+
+    def _check(self, detector_uuid):
+        """
+        :return: tuple of (detector or None if it is not ready, exception raised by the
+                 check)
+        """
+        try:
+            return self._get_detector(detector_uuid), None
+        except Exception as e:
+            # Not found yet, or a transient error: checked again until the timeout
+            return None, e
+
+    def _due(self):
+        """
+        Waits until some UUIDs are due for a check.
+        :return: list of due UUIDs, None once nothing is pending and the thread should
+                 exit
+        """
+        with self._condition:
+            while True:
+                if not self._pending:
+                    self._thread = None
+                    return None
+                now = self._clock()
+                next_check = min(
+                    pending.next_check for pending in self._pending.values()
+                )
+                if next_check <= now:
+                    return [
+                        uuid
+                        for uuid, pending in self._pending.items()
+                        if pending.next_check <= now
+                    ]
+                self._condition.wait(next_check - now)
+
+    def _run(self):
+        while True:
+            due = self._due()
+            if due is None:
+                return
+            if len(due) == 1:
+                results = [self._check(due[0])]
+            else:
+                with ThreadPoolExecutor(
+                    max_workers=min(POLL_THREADS, len(due))
+                ) as executor:
+                    results = list(executor.map(self._check, due))
+            resolved = []
+            with self._condition:
+                now = self._clock()
+                for detector_uuid, (detector, error) in zip(due, results):
+                    pending = self._pending[detector_uuid]
+                    if detector:
+                        resolved.append((pending.future, detector, None))
+                    elif now >= pending.give_up:
+                        message = (
+                            f"Timeout waiting for detector uuid '{detector_uuid}' "
+                            "to be available from model service."
+                        )
+                        if error is not None:
+                            message = f"{message} Last error: {error}"
+                        resolved.append(
+                            (pending.future, None, DetectorNotReadyError(message))
+                        )
+                    else:
+                        pending.delay = min(MAX_POLL_DELAY, pending.delay * 2)
+                        pending.next_check = now + pending.delay
+                        continue
+                    del self._pending[detector_uuid]
+            # Outside of the lock, as the callbacks of the futures run in this thread
+            for future, detector, error in resolved:
+                if error is None:
+                    future.set_result(detector)
+                else:
+                    future.set_exception(error)
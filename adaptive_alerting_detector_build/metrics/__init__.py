@@ -1 +1,3 @@
-from .metric import Metric, MetricConfig
+from .metric import Metric, MetricConfig, MetricFactory
+from .config_reader import MetricConfigReader
+from .work_set import MetricWorkSet, iter_unique_metric_configs
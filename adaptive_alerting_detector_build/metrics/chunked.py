@@ -0,0 +1,140 @@
+"""
+Memory-bounded execution of a build, train or disable command over a large number of
+metrics.
+
+    - The metric configs are streamed from the config files to an NDJSON file in the
+      spill directory, de-duplicated by tag key, and read back one chunk at a time, so
+      they are never all kept in memory.
+    - The command runs on one chunk of metrics at a time. Between chunks, the objects
+      of the finished metrics are garbage collected and the freed heap is returned to
+      the system.
+    - The resident set size is checked after each chunk: the chunk size is halved
+      while it is over the budget, and doubled back while it is under half of it, so a
+      growing process is checked, and released, more often.
+
+The peak resident set size is logged at the end of the run.
+"""
+import itertools
+import json
+import logging
+import os
+import tempfile
+
+import related
+
+from adaptive_alerting_detector_build import config
+from adaptive_alerting_detector_build.utils import fast_model
+from adaptive_alerting_detector_build.utils.memory import (
+    current_rss,
+    format_size,
+    peak_rss,
+    release_memory,
+)
+
+from .metric import MetricConfig, MetricFactory
+
+LOGGER = logging.getLogger(__name__)
+
+INITIAL_CHUNK_SIZE = 100
+MAX_CHUNK_SIZE = 1000
+
+
+class SpilledMetricConfigs:
+    """
+    Metric configs written to a temporary NDJSON file, iterated in the order they were
+    written.
+    """
+
+    def __init__(self, metric_configs, spill_dir=None):
+        spill_dir = spill_dir or config.SPILL_DIR
+        os.makedirs(spill_dir, exist_ok=True)
+        spill_file = tempfile.NamedTemporaryFile(
+            "w", dir=spill_dir, prefix="metric-configs-", suffix=".ndjson", delete=False
+        )
+        self.path = spill_file.name
+        self._count = 0
+        with spill_file:
+            for metric_config in metric_configs:
+                spill_file.write(json.dumps(related.to_dict(metric_config)) + "\n")
+                self._count += 1
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        with open(self.path) as spill_file:
+            for line in spill_file:
+                yield fast_model.to_model(MetricConfig, json.loads(line))
+
+    def close(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ChunkedCommand:
+    """
+    Runs a command chunk by chunk under a resident memory budget.
+    """
+
+    def __init__(
+        self,
+        command,
+        memory_budget,
+        chunk_size=INITIAL_CHUNK_SIZE,
+        max_chunk_size=MAX_CHUNK_SIZE,
+    ):
+        """
+        :param command: e.g. train_detectors_for_metric_configs, or a JournaledCommand
+        :param memory_budget: resident set size budget, in bytes
+        """
+        self.command = command
+        self.__name__ = command.__name__
+        self.memory_budget = memory_budget
+        self.chunk_size = min(chunk_size, max_chunk_size)
+        self.max_chunk_size = max_chunk_size
+
+    def _resize(self, rss):
+        if rss > self.memory_budget:
+            LOGGER.warning(
+                f"Resident memory {format_size(rss)} is over the budget of "
+                f"{format_size(self.memory_budget)}"
+            )
+            self.chunk_size = max(1, self.chunk_size // 2)
+        elif rss < self.memory_budget / 2:
+            self.chunk_size = min(self.max_chunk_size, self.chunk_size * 2)
+
+    def __call__(self, metric_configs, metric_factory=None):
+        metric_factory = metric_factory or MetricFactory()
+        exit_code = 0
+        processed = 0
+        metric_configs = iter(metric_configs)
+        while True:
+            chunk = list(itertools.islice(metric_configs, self.chunk_size))
+            if not chunk:
+                break
+            exit_code = max(
+                exit_code, self.command(chunk, metric_factory=metric_factory)
+            )
+            processed += len(chunk)
+            del chunk
+            release_memory()
+            rss = current_rss()
+            LOGGER.debug(
+                f"{processed} metric(s) processed, resident memory "
+                f"{format_size(rss) if rss else 'unknown'}"
+            )
+            if rss is not None:
+                self._resize(rss)
+        return exit_code
+
+
+def log_peak_rss():
+    peak = peak_rss()
+    if peak is not None:
+        LOGGER.info(f"Peak resident memory: {format_size(peak)}")
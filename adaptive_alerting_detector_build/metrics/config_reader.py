@@ -0,0 +1,135 @@
+"""
+Streaming reader for metric configuration files.
+
+Configuration files are either a JSON array of metric configs or NDJSON (one metric
+config per line). Entries are parsed and validated one at a time while the file is being
+read, so processing can start with the first metric and memory does not depend on the
+size of the file.
+"""
+import json
+import logging
+import traceback
+
+from adaptive_alerting_detector_build.utils import fast_model
+
+from .metric import MetricConfig
+
+READ_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_values(json_file, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yields the elements of a JSON array, or the values of a whitespace separated stream
+    of JSON values (NDJSON), reading the file incrementally.
+    :param json_file: text file object
+    :param chunk_size: number of characters read at a time
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+
+    def read_more():
+        nonlocal buffer, position, eof
+        chunk = json_file.read(chunk_size)
+        if chunk:
+            buffer = buffer[position:] + chunk
+            position = 0
+        else:
+            eof = True
+
+    def next_char():
+        """Skips whitespace and returns the next character, None at the end."""
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if eof:
+                return None
+            read_more()
+
+    def decode():
+        nonlocal position
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                read_more()
+                continue
+            # A value ending the buffer (e.g. a number) may continue in the next chunk
+            if end == len(buffer) and not eof:
+                read_more()
+                continue
+            position = end
+            return value
+
+    first = next_char()
+    if first is None:
+        return
+    if first != "[":
+        while next_char() is not None:
+            yield decode()
+        return
+    position += 1
+    if next_char() == "]":
+        position += 1
+    else:
+        while True:
+            if next_char() is None:
+                raise ValueError("Unexpected end of file, expecting a value or ']'")
+            yield decode()
+            separator = next_char()
+            position += 1
+            if separator == "]":
+                break
+            if separator != ",":
+                raise ValueError(f"Expecting ',' or ']', found {separator!r}")
+    if next_char() is not None:
+        raise ValueError("Unexpected data after the end of the JSON array")
+
+
+class MetricConfigReader:
+    """
+    Iterates over the metric configs of a file while it is being read.
+
+    Invalid entries are logged and skipped as they are reached, and counted in
+    invalid_entries. If the file itself can not be read (missing file, malformed
+    JSON...) the error is logged, iteration stops and exit_code is set to 1.
+    """
+
+    def __init__(self, json_config_file_path):
+        self.json_config_file_path = json_config_file_path
+        self.exit_code = 0
+        self.invalid_entries = 0
+
+    def __iter__(self):
+        try:
+            logging.info(f"Reading configuration file: {self.json_config_file_path}")
+            with open(self.json_config_file_path) as json_config_file:
+                for raw_metric_config in iter_json_values(json_config_file):
+                    try:
+                        metric_config = fast_model.to_model(
+                            MetricConfig, raw_metric_config
+                        )
+                    except Exception as e:
+                        logging.exception(
+                            f"Exception {e.__class__.__name__} while reading config "
+                            f"file '{e}'! Skipping!"
+                        )
+                        self.invalid_entries += 1
+                        continue
+                    yield metric_config
+        except Exception as e:
+            logging.exception(
+                f"Exception {e.__class__.__name__} while reading config file "
+                f"'{self.json_config_file_path}'! Skipping!"
+            )
+            trace = traceback.format_exc()
+            logging.debug(f"Traceback: {trace}")
+            self.exit_code = 1
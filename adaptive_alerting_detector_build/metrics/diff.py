@@ -0,0 +1,208 @@
+"""
+Differences between two versions of a metric configuration.
+
+The previous configs are indexed by a hash of their canonical tag key, and configs with
+the same tags are compared by a hash of their content, so a diff is linear in the number
+of entries. Current configs are streamed: each one is reported as added or modified as
+soon as it is read, and the deleted ones once all of them have been read.
+"""
+from collections import namedtuple
+import hashlib
+import json
+import tempfile
+
+import related
+
+from adaptive_alerting_detector_build.utils import fast_model
+
+from .metric import MetricConfig
+
+DIFF_SECTIONS = ("added", "modified", "deleted")
+
+# Diff sections are kept in memory up to this size, then spilled to a temporary file.
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+DiffEntry = namedtuple("DiffEntry", ["section", "tag_key", "metric_config", "changes"])
+
+
+def _canonical_json(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+def _hash(value):
+    return hashlib.sha1(_canonical_json(value).encode("utf-8")).digest()
+
+
+def _index_entry(metric_config):
+    """Serializes a metric config once, returning its tag key, dict and hashes."""
+    metric_config_dict = related.to_dict(metric_config)
+    tag_key = json.dumps(metric_config_dict["tags"], sort_keys=True)
+    return (
+        tag_key,
+        metric_config_dict,
+        hashlib.sha1(tag_key.encode("utf-8")).digest(),
+        _hash(metric_config_dict),
+    )
+
+
+def field_changes(previous, current, prefix=""):
+    """
+    Lists the fields that differ between two metric config dicts. Nested dicts (tags,
+    datasource...) are compared field by field, with dotted names.
+    :return: dict of field name to {"previous": value, "current": value}, missing values
+             are None
+    """
+    changes = dict()
+    for key in sorted(set(previous) | set(current), key=str):
+        previous_value = previous.get(key)
+        current_value = current.get(key)
+        if previous_value == current_value:
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(previous_value, dict) and isinstance(current_value, dict):
+            changes.update(
+                field_changes(previous_value, current_value, prefix=f"{name}.")
+            )
+        else:
+            changes[name] = {"previous": previous_value, "current": current_value}
+    return changes
+
+
+def iter_metric_config_diff(previous_metric_configs, current_metric_configs):
+    """
+    Yields the differences between two versions of a metric configuration.
+    :param previous_metric_configs: iterable of MetricConfig, read once to build the
+                                    index
+    :param current_metric_configs: iterable of MetricConfig, streamed
+    :return: generator of DiffEntry, added and modified entries in current order, then
+             deleted entries in previous order. changes is set for modified entries, see
+             field_changes().
+    """
+    previous_index = dict()
+    for metric_config in previous_metric_configs:
+        tag_key, metric_config_dict, tag_hash, content_hash = _index_entry(
+            metric_config
+        )
+        previous_index[tag_hash] = (tag_key, metric_config_dict, content_hash)
+    seen_tag_hashes = set()
+    for metric_config in current_metric_configs:
+        tag_key, metric_config_dict, tag_hash, content_hash = _index_entry(
+            metric_config
+        )
+        seen_tag_hashes.add(tag_hash)
+        previous = previous_index.get(tag_hash)
+        if previous is None:
+            yield DiffEntry("added", tag_key, metric_config_dict, None)
+        elif previous[2] != content_hash:
+            yield DiffEntry(
+                "modified",
+                tag_key,
+                metric_config_dict,
+                field_changes(previous[1], metric_config_dict),
+            )
+    for tag_hash, (tag_key, metric_config_dict, _) in previous_index.items():
+        if tag_hash not in seen_tag_hashes:
+            yield DiffEntry("deleted", tag_key, metric_config_dict, None)
+
+
+def diff_metric_configs(previous_metric_configs, current_metric_configs):
+    """
+    :return: dict with the added, modified and deleted metric configs, and the field
+             changes of modified ones
+    """
+    diff = {section: [] for section in DIFF_SECTIONS}
+    diff["changes"] = []
+    for entry in iter_metric_config_diff(
+        previous_metric_configs, current_metric_configs
+    ):
+        diff[entry.section].append(entry.metric_config)
+        if entry.changes is not None:
+            diff["changes"].append(_changes_entry(entry))
+    return diff
+
+
+def _changes_entry(entry):
+    return {
+        "tag_key": entry.tag_key,
+        "name": entry.metric_config.get("name"),
+        "fields": entry.changes,
+    }
+
+
+class MetricConfigDiffWriter:
+    """
+    Writes a diff in the same JSON document as json.dumps(diff_metric_configs(...),
+    indent=4), without keeping the entries in memory: each section is spooled to a
+    temporary file as entries are added, and the document is assembled by write().
+    """
+
+    def __init__(self, spool_max_size=SPOOL_MAX_SIZE):
+        self._sections = {
+            section: tempfile.SpooledTemporaryFile(max_size=spool_max_size, mode="w+")
+            for section in DIFF_SECTIONS + ("changes",)
+        }
+        self.counts = {section: 0 for section in self._sections}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for section_file in self._sections.values():
+            section_file.close()
+
+    def _append(self, section, value):
+        section_file = self._sections[section]
+        if self.counts[section]:
+            section_file.write(",\n")
+        section_file.write(_indent(json.dumps(value, indent=4), "        "))
+        self.counts[section] += 1
+
+    def add(self, entry):
+        """
+        :param entry: DiffEntry
+        """
+        self._append(entry.section, entry.metric_config)
+        if entry.changes is not None:
+            self._append("changes", _changes_entry(entry))
+
+    def write(self, output):
+        """
+        :param output: text file object the JSON document is written to
+        """
+        output.write("{\n")
+        for i, (section, section_file) in enumerate(self._sections.items()):
+            output.write(f"    {json.dumps(section)}: [")
+            if self.counts[section]:
+                output.write("\n")
+                section_file.seek(0)
+                while True:
+                    chunk = section_file.read(64 * 1024)
+                    if not chunk:
+                        break
+                    output.write(chunk)
+                output.write("\n    ]")
+            else:
+                output.write("]")
+            output.write(",\n" if i < len(self._sections) - 1 else "\n")
+        output.write("}")
+
+
+def _indent(text, prefix):
+    return "\n".join(prefix + line for line in text.split("\n"))
+
+
+def read_diff_file(diff_file_path):
+    """
+    Reads a diff written by the diff command.
+    :return: list of (section, MetricConfig), in the order of the file
+    """
+    with open(diff_file_path) as diff_file:
+        diff = json.load(diff_file)
+    return [
+        (section, fast_model.to_model(MetricConfig, metric_config))
+        for section in DIFF_SECTIONS
+        for metric_config in diff.get(section, [])
+    ]
@@ -0,0 +1,407 @@
+"""
+SQLite job queue distributing metrics between worker processes, on one or several hosts.
+
+The queue is seeded with one job per metric and command. Workers claim jobs one at a
+time with a lease, renew it with a heartbeat while the job runs, and record its outcome.
+Jobs whose lease expired (worker killed, host lost...) are re-queued by the next claim,
+up to max_attempts. Each worker keeps claiming jobs until none are pending, so wall time
+follows the average cost of a metric rather than the slowest static shard.
+
+The database holds one run of each command. Hosts seeding it later, even after the run
+is complete, join that run: metrics already in the queue are not run again and the
+finished jobs still count in the exit code. A new run is explicit, seeding with
+reset=True (--reset-queue) replaces the jobs of the previous one. Reset the queue from
+one host only, before the other hosts seed it.
+
+All writes go through "BEGIN IMMEDIATE" transactions, so claims are serialized by the
+SQLite database lock. The database can be on a shared filesystem if it supports POSIX
+locks; the default rollback journal is used since WAL mode does not work over network
+filesystems. Seeding commits every SEED_BATCH_SIZE jobs so claims of other hosts are not
+blocked for the whole seed, and workers retry a claim that timed out waiting for the
+lock.
+"""
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from collections import namedtuple
+from contextlib import contextmanager
+
+import related
+
+from adaptive_alerting_detector_build.utils import fast_model
+
+from .metric import MetricConfig, MetricFactory
+
+LOGGER = logging.getLogger(__name__)
+
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+# Seconds between claims while all remaining jobs are leased by other workers
+POLL_SECONDS = 1.0
+# Number of jobs added per seed transaction
+SEED_BATCH_SIZE = 1000
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    command TEXT NOT NULL,
+    tag_key TEXT NOT NULL,
+    metric_config TEXT NOT NULL,
+    status TEXT NOT NULL,
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    exit_code INTEGER,
+    UNIQUE (command, tag_key)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (command, status);
+"""
+
+Job = namedtuple("Job", ["id", "tag_key", "metric_config", "attempts"])
+
+
+def _is_locked(e):
+    return isinstance(e, sqlite3.OperationalError) and "locked" in str(e)
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+class JobQueue:
+    """
+    Connection to a job queue database. Connections are not shared between threads or
+    processes, open one JobQueue per worker.
+    """
+
+    def __init__(
+        self,
+        path,
+        command,
+        lease_seconds=LEASE_SECONDS,
+        max_attempts=MAX_ATTEMPTS,
+        timeout=60.0,
+        clock=time.time,
+    ):
+        """
+        :param path: SQLite database file, created if missing
+        :param command: Name of the command the jobs are run for, e.g. 'train'
+        :param lease_seconds: Time a claimed job stays leased without a heartbeat
+        :param max_attempts: Number of claims after which a job whose lease expired is
+                             marked as failed
+        :param timeout: Seconds to wait for the database lock
+        :param clock: Function returning the current epoch time, shared by all hosts
+        """
+        self.path = path
+        self.command = command
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._clock = clock
+        self._connection = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+        self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @contextmanager
+    def _transaction(self):
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._connection
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
+
+    def seed(self, metric_configs, reset=False, batch_size=SEED_BATCH_SIZE):
+        """
+        Adds one pending job per metric. Metrics already in the queue are left
+        untouched, apart from the config of pending jobs, so all workers can seed the
+        queue from the same config files. Jobs are added in transactions of batch_size
+        jobs.
+        :param reset: Delete the jobs of the previous run of this command first,
+                      starting a new run
+        :return: Number of jobs added
+        """
+        if reset:
+            with self._transaction() as connection:
+                connection.execute(
+                    "DELETE FROM jobs WHERE command = ?", (self.command,)
+                )
+        added = 0
+        metric_configs = iter(metric_configs)
+        while True:
+            batch = list(itertools.islice(metric_configs, batch_size))
+            if not batch:
+                return added
+            with self._transaction() as connection:
+                for metric_config in batch:
+                    metric_config_json = json.dumps(related.to_dict(metric_config))
+                    connection.execute(
+                        "UPDATE jobs SET metric_config = ?"
+                        " WHERE command = ? AND tag_key = ? AND status = ?",
+                        (
+                            metric_config_json,
+                            self.command,
+                            metric_config.tag_key,
+                            PENDING,
+                        ),
+                    )
+                    cursor = connection.execute(
+                        "INSERT OR IGNORE INTO jobs (command, tag_key, metric_config, "
+                        "status) VALUES (?, ?, ?, ?)",
+                        (
+                            self.command,
+                            metric_config.tag_key,
+                            metric_config_json,
+                            PENDING,
+                        ),
+                    )
+                    added += cursor.rowcount
+
+    def _requeue_expired(self, connection, now):
+        connection.execute(
+            "UPDATE jobs SET status = ?, owner = NULL WHERE command = ? AND status = ? "
+            "AND lease_expires < ? AND attempts >= ?",
+            (FAILED, self.command, LEASED, now, self.max_attempts),
+        )
+        connection.execute(
+            "UPDATE jobs SET status = ?, owner = NULL WHERE command = ? AND status = ? "
+            "AND lease_expires < ?",
+            (PENDING, self.command, LEASED, now),
+        )
+
+    def claim(self, worker_id):
+        """
+        Leases the next pending job, after re-queueing the jobs whose lease expired.
+        :return: Job, or None if no job is pending
+        """
+        now = self._clock()
+        with self._transaction() as connection:
+            self._requeue_expired(connection, now)
+            row = connection.execute(
+                "SELECT id, tag_key, metric_config, attempts FROM jobs"
+                " WHERE command = ? AND status = ? ORDER BY id LIMIT 1",
+                (self.command, PENDING),
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, tag_key, metric_config, attempts = row
+            connection.execute(
+                "UPDATE jobs SET status = ?, owner = ?, lease_expires = ?, attempts = ?"
+                " WHERE id = ?",
+                (LEASED, worker_id, now + self.lease_seconds, attempts + 1, job_id),
+            )
+        return Job(
+            job_id,
+            tag_key,
+            fast_model.to_model(MetricConfig, json.loads(metric_config)),
+            attempts + 1,
+        )
+
+    def heartbeat(self, job, worker_id):
+        """
+        Renews the lease of a job.
+        :return: False if the lease was lost (expired and claimed by another worker)
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET lease_expires = ?"
+                " WHERE id = ? AND owner = ? AND status = ?",
+                (self._clock() + self.lease_seconds, job.id, worker_id, LEASED),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job, worker_id, exit_code):
+        """
+        Records the outcome of a job.
+        :return: False if the lease was lost, in which case the outcome is not recorded
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, exit_code = ?"
+                " WHERE id = ? AND owner = ? AND status = ?",
+                (DONE, exit_code, job.id, worker_id, LEASED),
+            )
+            return cursor.rowcount == 1
+
+    def counts(self):
+        """
+        :return: dict of job status to number of jobs
+        """
+        rows = self._connection.execute(
+            "SELECT status, COUNT(*) FROM jobs WHERE command = ? GROUP BY status",
+            (self.command,),
+        ).fetchall()
+        return dict(rows)
+
+    def exit_code(self):
+        """
+        :return: 1 if any job failed or completed with a non zero exit code, 0 otherwise
+        """
+        row = self._connection.execute(
+            "SELECT COUNT(*) FROM jobs"
+            " WHERE command = ? AND (status = ? OR exit_code != 0)",
+            (self.command, FAILED),
+        ).fetchone()
+        return 1 if row[0] else 0
+
+
+class Heartbeat(threading.Thread):
+    """
+    Renews the lease of a job from a background thread while it runs, with its own
+    database connection.
+    """
+
+    def __init__(self, job_queue, job, worker_id):
+        super().__init__(daemon=True)
+        self._job_queue = job_queue
+        self._job = job
+        self._worker_id = worker_id
+        self._stop_event = threading.Event()
+        self.lost = False
+
+    def run(self):
+        interval = self._job_queue.lease_seconds / 3
+        with JobQueue(
+            self._job_queue.path,
+            self._job_queue.command,
+            lease_seconds=self._job_queue.lease_seconds,
+        ) as job_queue:
+            while not self._stop_event.wait(interval):
+                try:
+                    if not job_queue.heartbeat(self._job, self._worker_id):
+                        LOGGER.warning(f"Lease lost for metric job {self._job.tag_key}")
+                        self.lost = True
+                        return
+                except sqlite3.Error as e:
+                    LOGGER.warning(
+                        f"Unable to renew lease for metric job {self._job.tag_key}, {e}"
+                    )
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop_event.set()
+        self.join()
+
+
+def run_worker(
+    path,
+    command_name,
+    command,
+    worker_id=None,
+    lease_seconds=LEASE_SECONDS,
+    poll_seconds=POLL_SECONDS,
+):
+    """
+    Claims and runs jobs until none are pending or leased.
+    :param path: Job queue database file
+    :param command_name: Name the jobs were seeded with
+    :param command: Function called with a list of one MetricConfig and a
+                     metric_factory, returning an exit code, e.g.
+                     train_detectors_for_metric_configs
+    :return: exit code, 1 if any job run by this worker failed
+    """
+    worker_id = worker_id or default_worker_id()
+    exit_code = 0
+    metric_factory = MetricFactory()
+    with JobQueue(path, command_name, lease_seconds=lease_seconds) as job_queue:
+        while True:
+            try:
+                job = job_queue.claim(worker_id)
+            except sqlite3.OperationalError as e:
+                # Another host held the lock for longer than the timeout
+                if not _is_locked(e):
+                    raise
+                LOGGER.warning(f"Job queue '{path}' is locked, retrying the claim")
+                time.sleep(poll_seconds)
+                continue
+            if job is None:
+                if not job_queue.counts().get(LEASED):
+                    return exit_code
+                time.sleep(poll_seconds)
+                continue
+            with Heartbeat(job_queue, job, worker_id):
+                try:
+                    job_exit_code = command(
+                        [job.metric_config], metric_factory=metric_factory
+                    )
+                except Exception as e:
+                    LOGGER.exception(
+                        f"Exception {e.__class__.__name__} while running job for "
+                        f"metric {job.metric_config.name}!"
+                    )
+                    LOGGER.debug(f"Traceback: {traceback.format_exc()}")
+                    job_exit_code = 1
+            try:
+                if not job_queue.complete(job, worker_id, job_exit_code):
+                    LOGGER.warning(
+                        f"Lease lost for metric '{job.metric_config.name}', outcome "
+                        "not recorded"
+                    )
+            except sqlite3.OperationalError as e:
+                if not _is_locked(e):
+                    raise
+                # The lease expires and the job is run again
+                LOGGER.warning(
+                    f"Job queue '{path}' is locked, outcome of metric "
+                    f"'{job.metric_config.name}' not recorded"
+                )
+            exit_code = max(exit_code, job_exit_code)
+
+
+def _worker_process(path, command_name, command):
+    raise SystemExit(run_worker(path, command_name, command))
+
+
+def run_job_queue(path, command, metric_configs, workers=1, reset=False):
+    """
+    Seeds the queue with the metrics, then runs workers until all the jobs are complete.
+    The same call can run on several hosts sharing the database file.
+    :param workers: Number of local worker processes, 1 runs the jobs in the calling
+                    process
+    :param reset: Start a new run, replacing the jobs of the previous run of the command
+    :return: exit code, 1 if any job of the queue failed
+    """
+    command_name = command.__name__
+    with JobQueue(path, command_name) as job_queue:
+        added = job_queue.seed(metric_configs, reset=reset)
+    LOGGER.info(f"{added} job(s) added to queue '{path}'")
+    if workers <= 1:
+        exit_code = run_worker(path, command_name, command)
+    else:
+        processes = [
+            multiprocessing.Process(
+                target=_worker_process, args=(path, command_name, command)
+            )
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        exit_code = 1 if any(process.exitcode for process in processes) else 0
+    with JobQueue(path, command_name) as job_queue:
+        LOGGER.info(f"Queue '{path}': {job_queue.counts()}")
+        return max(exit_code, job_queue.exit_code())
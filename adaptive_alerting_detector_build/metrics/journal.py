@@ -0,0 +1,194 @@
+"""
+Append-only journal of the outcome of each metric, so an interrupted build, train or
+disable run can be resumed.
+
+Each record is one JSON line with the command, the metric tag key, a hash of the metric
+config and the outcome. The file is opened with O_APPEND and each batch of records is
+written with a single write() followed by fsync(), so several threads or processes (e.g.
+job queue workers) can share one journal without interleaving records.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+import related
+
+LOGGER = logging.getLogger(__name__)
+
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+# Records are written once this many are buffered, or once the oldest is this old
+FLUSH_RECORDS = 100
+FLUSH_SECONDS = 5.0
+
+
+def config_hash(metric_config):
+    """
+    :return: hash of the metric config content, a metric is only skipped on resume if
+             its config did not change
+    """
+    content = json.dumps(
+        related.to_dict(metric_config), sort_keys=True, separators=(",", ":")
+    )
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def read_completed(journal_path, command):
+    """
+    Reads the metrics completed by previous runs of a command. The last record of each
+    metric wins, and a partial last line left by an interrupted write is ignored.
+    :return: dict of tag key to the config hash it was completed with
+    """
+    completed = dict()
+    if not os.path.exists(journal_path):
+        return completed
+    with open(journal_path, "rb") as journal_file:
+        for line in journal_file:
+            if not line.endswith(b"\n") or not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                LOGGER.warning(f"Ignoring unreadable line in journal '{journal_path}'")
+                continue
+            if record.get("command") != command:
+                continue
+            if record["outcome"] in (DONE, SKIPPED):
+                completed[record["tag_key"]] = record["config_hash"]
+            else:
+                completed.pop(record["tag_key"], None)
+    return completed
+
+
+class Journal:
+    def __init__(
+        self,
+        journal_path,
+        command,
+        flush_records=FLUSH_RECORDS,
+        flush_seconds=FLUSH_SECONDS,
+    ):
+        self.journal_path = journal_path
+        self.command = command
+        self._flush_records = flush_records
+        self._flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._buffer_start = None
+        self._fd = os.open(journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        # Terminate a partial line left by an interrupted write, so the next record
+        # starts on its own line
+        with open(journal_path, "rb") as journal_file:
+            journal_file.seek(0, os.SEEK_END)
+            if journal_file.tell():
+                journal_file.seek(-1, os.SEEK_END)
+                if journal_file.read(1) != b"\n":
+                    os.write(self._fd, b"\n")
+
+    def record(self, metric_config, outcome, metric_config_hash=None):
+        record = {
+            "time": round(time.time(), 3),
+            "command": self.command,
+            "tag_key": metric_config.tag_key,
+            "config_hash": metric_config_hash or config_hash(metric_config),
+            "outcome": outcome,
+        }
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        with self._lock:
+            if not self._buffer:
+                self._buffer_start = time.monotonic()
+            self._buffer.append(line)
+            if (
+                len(self._buffer) >= self._flush_records
+                or time.monotonic() - self._buffer_start >= self._flush_seconds
+            ):
+                self._flush()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        data = b"".join(self._buffer)
+        self._buffer = []
+        written = 0
+        while written < len(data):
+            written += os.write(self._fd, data[written:])
+        os.fsync(self._fd)
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            os.close(self._fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class JournaledCommand:
+    """
+    Wraps a build, train or disable command to run it metric by metric, recording each
+    outcome in the journal and skipping the metrics in completed. The journal is opened
+    in the process calling the command, so the wrapper can be passed to job queue worker
+    processes.
+    """
+
+    def __init__(self, command, journal_path, completed=None):
+        """
+        :param command: e.g. train_detectors_for_metric_configs
+        :param completed: dict of tag key to config hash, see read_completed()
+        """
+        self.command = command
+        self.__name__ = command.__name__
+        self.journal_path = journal_path
+        self.completed = completed or {}
+        self._journal = None
+        self._journal_pid = None
+
+    def _open_journal(self):
+        if self._journal is None or self._journal_pid != os.getpid():
+            self._journal = Journal(self.journal_path, self.__name__)
+            self._journal_pid = os.getpid()
+        return self._journal
+
+    def __call__(self, metric_configs, metric_factory=None):
+        journal = self._open_journal()
+        exit_code = 0
+        try:
+            for metric_config in metric_configs:
+                metric_config_hash = config_hash(metric_config)
+                if self.completed.get(metric_config.tag_key) == metric_config_hash:
+                    LOGGER.info(
+                        f"Metric '{metric_config.name}' already completed in journal. "
+                        "Skipping!"
+                    )
+                    journal.record(metric_config, SKIPPED, metric_config_hash)
+                    continue
+                metric_exit_code = self.command(
+                    [metric_config], metric_factory=metric_factory
+                )
+                journal.record(
+                    metric_config,
+                    DONE if metric_exit_code == 0 else FAILED,
+                    metric_config_hash,
+                )
+                exit_code = max(exit_code, metric_exit_code)
+        finally:
+            journal.flush()
+        return exit_code
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_journal"] = None
+        state["_journal_pid"] = None
+        return state
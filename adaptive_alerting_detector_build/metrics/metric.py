@@ -1,12 +1,13 @@
 import datetime
 from enum import unique, Enum
 import json
+import attr
 import related
 import requests
 from adaptive_alerting_detector_build.config import get_datasource_config
 from adaptive_alerting_detector_build.datasources import datasource
 from adaptive_alerting_detector_build.detectors import build_detector, DetectorClient
-from adaptive_alerting_detector_build.profile.metric_profiler import build_profile
+from adaptive_alerting_detector_build.utils import fast_model
 
 
 @unique
@@ -23,8 +24,9 @@ class MetricConfig:
     type = related.ChildField(MetricType)
     tags = related.ChildField(dict)
     description = related.StringField(required=False)
+    # Read from the environment when a config has no datasource, not when the module is imported
     datasource = related.ChildField(
-        dict, default=get_datasource_config(), required=False
+        dict, default=attr.Factory(get_datasource_config), required=False
     )
 
     @property
@@ -32,13 +34,28 @@ class MetricConfig:
         return json.dumps(self.tags, sort_keys=True)
 
 
+fast_model.register(
+    MetricConfig,
+    dict(name=str, type=MetricType, tags=dict, description=str, datasource=dict),
+)
+
+
 class Metric:
     def __init__(
-        self, config, datasource_config, model_service_url=None, model_service_user=None
+        self,
+        config,
+        datasource_config,
+        model_service_url=None,
+        model_service_user=None,
+        datasource_instance=None,
+        detector_client=None,
     ):
+        """
+        datasource_instance and detector_client can be passed to share them between metrics, see MetricFactory.
+        """
         self.config = config
-        self._datasource = datasource(datasource_config)
-        self._detector_client = DetectorClient(
+        self._datasource = datasource_instance or datasource(datasource_config)
+        self._detector_client = detector_client or DetectorClient(
             model_service_url=model_service_url, model_service_user=model_service_user
         )
         self._sample_data = None
@@ -47,6 +64,12 @@ class Metric:
     def query(self):
         return self._datasource.query(tags=self.config["tags"])
 
+    def query_series(self):
+        """
+        :return: TimeSeries, lighter than the DataFrame returned by query() for callers that only need the arrays
+        """
+        return self._datasource.query_series(tags=self.config["tags"])
+
     @property
     def detectors(self):
         # removed optimization due to possible consistancy issues
@@ -153,5 +176,48 @@ class Metric:
     @property
     def profile(self):
         if not self._profile:
+            # Imported on first use, the profilers pull in statsmodels and seasonal
+            from adaptive_alerting_detector_build.profile.metric_profiler import build_profile
+
             self._profile = build_profile(self.sample_data)
         return self._profile
+
+
+class MetricFactory:
+    """
+    Builds Metric objects that share one DetectorClient, and one datasource per distinct datasource config.
+    """
+
+    def __init__(self, model_service_url=None, model_service_user=None):
+        self._model_service_url = model_service_url
+        self._model_service_user = model_service_user
+        self._detector_client = None
+        self._datasources = dict()
+
+    @property
+    def detector_client(self):
+        if self._detector_client is None:
+            self._detector_client = DetectorClient(
+                model_service_url=self._model_service_url,
+                model_service_user=self._model_service_user,
+            )
+        return self._detector_client
+
+    def datasource(self, datasource_config):
+        datasource_key = json.dumps(datasource_config, sort_keys=True)
+        _datasource = self._datasources.get(datasource_key)
+        if _datasource is None:
+            _datasource = datasource(datasource_config)
+            self._datasources[datasource_key] = _datasource
+        return _datasource
+
+    def metric(self, metric_config):
+        """
+        :param metric_config: MetricConfig
+        """
+        return Metric(
+            related.to_dict(metric_config),
+            metric_config.datasource,
+            datasource_instance=self.datasource(metric_config.datasource),
+            detector_client=self.detector_client,
+        )
@@ -0,0 +1,311 @@
+"""
+Staged pipeline building or training the detectors of many metrics.
+
+Listing detectors and querying the datasource, then saving the detectors to the model
+service, are I/O bound, while training is CPU bound and holds the GIL. The pipeline
+overlaps them in three stages:
+
+    fetch threads   list the detectors of a metric, select the ones to build or train
+                    and query the series
+    process pool    trains the detectors on the series, see train_detectors()
+    publish threads create or update the trained detectors in the model service
+
+Series are passed to the pool through shared memory, see utils/shared_series.py. The
+number of metrics between the fetch and publish stages is bounded, so the memory used
+does not grow with the number of metrics: fetch threads wait for a slot before querying
+a series, and the slot is freed once its detectors are published.
+
+If the process pool breaks (e.g. a pool process killed when out of memory), the run is
+aborted: the remaining metrics are not fetched and the exit code is 1.
+"""
+import logging
+import os
+import queue
+import threading
+import traceback
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from adaptive_alerting_detector_build.detectors import build_detector
+from adaptive_alerting_detector_build.exceptions import (
+    AdaptiveAlertingDetectorBuildError,
+)
+from adaptive_alerting_detector_build.utils.shared_series import (
+    share_timeseries,
+    to_timeseries,
+)
+
+from .metric import MetricFactory
+
+LOGGER = logging.getLogger(__name__)
+
+BUILD = "build"
+TRAIN = "train"
+
+IO_THREADS = 8
+# Number of metrics fetched, training or waiting to be published, per pool process
+IN_FLIGHT_PER_PROCESS = 2
+
+_STOP = object()
+
+
+def train_detectors(detectors, metric_type, series):
+    """
+    Trains detectors on a series. Runs in a pool process.
+    :param detectors: list of Detector
+    :param series: SharedSeries or PickledSeries
+    :return: the trained detectors
+    """
+    data = to_timeseries(series)
+    for detector in detectors:
+        detector.train(data=data, metric_type=metric_type)
+    return detectors
+
+
+class _Job:
+    def __init__(self, metric_config, metric, detectors, series):
+        self.metric_config = metric_config
+        self.metric = metric
+        self.detectors = detectors
+        self.series = series
+
+
+class TrainingPipeline:
+    def __init__(
+        self,
+        command,
+        processes=None,
+        io_threads=IO_THREADS,
+        force=False,
+        metric_factory=None,
+    ):
+        """
+        :param command: BUILD to create the selected detectors that do not exist, TRAIN
+                        to re-train the detectors that need training
+        :param processes: Number of pool processes. Defaults to the number of CPUs, 0
+                          trains in the fetch threads.
+        :param force: Re-trains all the detectors of the metrics, with TRAIN
+        """
+        if command not in (BUILD, TRAIN):
+            raise ValueError(f"Unknown pipeline command '{command}'")
+        self.command = command
+        self.processes = processes
+        self.io_threads = io_threads
+        self.force = force
+        self._metric_factory = metric_factory or MetricFactory()
+        self._executor = None
+        self._in_flight = None
+        self._publish_queue = None
+        self._lock = threading.Lock()
+        self._aborted = threading.Event()
+        self.exit_code = 0
+
+    def _abort(self, e):
+        with self._lock:
+            self.exit_code = 1
+            if self._aborted.is_set():
+                return
+            self._aborted.set()
+        LOGGER.error(
+            f"Exception {e.__class__.__name__} in the training processes, aborting the "
+            f"run! {e}"
+        )
+
+    def _fail(self, metric_config, e):
+        if isinstance(e, AdaptiveAlertingDetectorBuildError):
+            # Same outcome as the sequential commands, a metric that can't be trained is
+            # skipped without failing
+            if self.command == BUILD:
+                LOGGER.warning(
+                    f"Unable to train detector for metric '{metric_config.name}',  "
+                    f"{e.msg}! Skipping!"
+                )
+            else:
+                LOGGER.error(
+                    f"Unable to train detector for metric '{metric_config.name}',  "
+                    f"{e.msg}! Skipping!"
+                )
+            return
+        action = (
+            "creating detector" if self.command == BUILD else "training detector(s)"
+        )
+        LOGGER.error(
+            f"Exception {e.__class__.__name__} while {action} for metric "
+            f"{metric_config.name}! Skipping!"
+        )
+        LOGGER.debug(
+            "Traceback: "
+            f"{''.join(traceback.format_exception(type(e), e, e.__traceback__))}"
+        )
+        with self._lock:
+            self.exit_code = 1
+
+    def _select_detectors(self, metric):
+        if self.command == BUILD:
+            existing_detector_types = [d.type for d in metric.detectors]
+            return [
+                build_detector(**selected_detector)
+                for selected_detector in metric.select_detectors()
+                if selected_detector["type"] not in existing_detector_types
+            ]
+        selected_detectors = []
+        for detector in metric.detectors:
+            if self.force or detector.needs_training:
+                selected_detectors.append(detector)
+            else:
+                LOGGER.info(
+                    f"Training not required for '{detector.type}' detector with UUID: "
+                    f"{detector.uuid}"
+                )
+        return selected_detectors
+
+    def _fetch(self, metric_config):
+        metric = self._metric_factory.metric(metric_config)
+        detectors = self._select_detectors(metric)
+        if not detectors:
+            if self.command == BUILD:
+                LOGGER.info(f"No detectors built for metric '{metric_config.name}'")
+            return
+        self._in_flight.acquire()
+        try:
+            series = share_timeseries(metric.query_series())
+        except BaseException:
+            self._in_flight.release()
+            raise
+        job = _Job(metric_config, metric, detectors, series)
+        if self._executor is None:
+            future = Future()
+            try:
+                future.set_result(
+                    train_detectors(detectors, metric.config["type"], series)
+                )
+            except Exception as e:
+                future.set_exception(e)
+            self._publish_queue.put((job, future))
+        else:
+            try:
+                future = self._executor.submit(
+                    train_detectors, detectors, metric.config["type"], series
+                )
+            except BaseException:
+                series.release()
+                self._in_flight.release()
+                raise
+            future.add_done_callback(lambda done: self._publish_queue.put((job, done)))
+
+    def _fetch_loop(self, fetch_queue):
+        while True:
+            metric_config = fetch_queue.get()
+            if metric_config is _STOP:
+                return
+            if self._aborted.is_set():
+                continue
+            try:
+                self._fetch(metric_config)
+            except BrokenProcessPool as e:
+                self._abort(e)
+            except Exception as e:
+                self._fail(metric_config, e)
+
+    def _publish(self, job, future):
+        try:
+            job.series.release()
+            trained_detectors = future.result()
+            detector_client = job.metric._detector_client
+            for detector in trained_detectors:
+                if self.command == BUILD:
+                    new_detector = detector_client.create_detector(detector)
+                    detector_client.save_metric_detector_mapping(
+                        new_detector.uuid, job.metric
+                    )
+                    LOGGER.info(
+                        f"New '{new_detector.type}' detector created with UUID: "
+                        f"{new_detector.uuid}"
+                    )
+                else:
+                    detector_client.update_detector(detector, read_after_write=False)
+                    LOGGER.info(
+                        f"Trained '{detector.type}' detector with UUID: {detector.uuid}"
+                    )
+        finally:
+            self._in_flight.release()
+
+    def _publish_loop(self):
+        while True:
+            item = self._publish_queue.get()
+            if item is _STOP:
+                return
+            job, future = item
+            try:
+                self._publish(job, future)
+            except BrokenProcessPool as e:
+                self._abort(e)
+            except Exception as e:
+                self._fail(job.metric_config, e)
+
+    def run(self, metric_configs):
+        """
+        :param metric_configs: iterable of MetricConfig, read as the fetch stage has
+                               room for more metrics
+        :return: exit code
+        """
+        processes = self.processes
+        if processes != 0:
+            processes = processes or os.cpu_count()
+            self._executor = ProcessPoolExecutor(max_workers=processes)
+        self._in_flight = threading.BoundedSemaphore(
+            max(IN_FLIGHT_PER_PROCESS * (processes or 1), self.io_threads)
+        )
+        self._publish_queue = queue.Queue()
+        fetch_queue = queue.Queue(maxsize=self.io_threads)
+        fetch_threads = [
+            threading.Thread(
+                target=self._fetch_loop,
+                args=(fetch_queue,),
+                name=f"pipeline-fetch-{i}",
+                daemon=True,
+            )
+            for i in range(self.io_threads)
+        ]
+        publish_threads = [
+            threading.Thread(
+                target=self._publish_loop, name=f"pipeline-publish-{i}", daemon=True
+            )
+            for i in range(self.io_threads)
+        ]
+        for thread in fetch_threads + publish_threads:
+            thread.start()
+        try:
+            for metric_config in metric_configs:
+                if self._aborted.is_set():
+                    break
+                fetch_queue.put(metric_config)
+        finally:
+            for _ in fetch_threads:
+                fetch_queue.put(_STOP)
+            for thread in fetch_threads:
+                thread.join()
+            if self._executor is not None:
+                # Waits for the pending trainings, their callbacks queue the results
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            for _ in publish_threads:
+                self._publish_queue.put(_STOP)
+            for thread in publish_threads:
+                thread.join()
+        return self.exit_code
+
+
+def run_pipeline(
+    command, metric_configs, processes=None, io_threads=IO_THREADS, metric_factory=None
+):
+    """
+    :param command: BUILD or TRAIN
+    :return: exit code
+    """
+    return TrainingPipeline(
+        command,
+        processes=processes,
+        io_threads=io_threads,
+        metric_factory=metric_factory,
+    ).run(metric_configs)
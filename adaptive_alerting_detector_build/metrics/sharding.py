@@ -0,0 +1,81 @@
+"""
+Deterministic assignment of metrics to shards, so one set of config files can be
+processed by several nodes in parallel without overlap.
+
+Metrics are assigned by a stable hash of their tag key: every node computes the same
+assignment without coordination. With rendezvous (highest random weight) hashing,
+changing the number of shards only moves the metrics of the added or removed shards,
+instead of most metrics.
+"""
+import hashlib
+
+from adaptive_alerting_detector_build import config
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class Shard:
+    def __init__(self, index, count, rendezvous=False):
+        """
+        :param index: 0 based shard index
+        :param count: Number of shards
+        :param rendezvous: Use rendezvous hashing instead of hash modulo count
+        """
+        if count < 1 or not 0 <= index < count:
+            raise ValueError(
+                f"Invalid shard {index}/{count}, expecting 0 <= INDEX < COUNT"
+            )
+        self.index = index
+        self.count = count
+        self.rendezvous = rendezvous
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
+
+    @classmethod
+    def parse(cls, value, rendezvous=False):
+        """
+        :param value: 'INDEX/COUNT', e.g. '0/4' for the first of 4 shards
+        """
+        try:
+            index, count = (int(part) for part in value.split("/"))
+        except ValueError:
+            raise ValueError(f"Invalid shard '{value}', expecting INDEX/COUNT")
+        return cls(index, count, rendezvous=rendezvous)
+
+    @classmethod
+    def from_settings(cls, shard=None, rendezvous=False):
+        """
+        Builds the shard from the command line value, or from the SHARD_INDEX and
+        SHARD_COUNT environment variables.
+        :return: Shard, or None when sharding is not configured
+        """
+        rendezvous = rendezvous or config.SHARD_RENDEZVOUS
+        if shard:
+            return cls.parse(shard, rendezvous=rendezvous)
+        if config.SHARD_INDEX is not None and config.SHARD_COUNT is not None:
+            return cls.parse(
+                f"{config.SHARD_INDEX}/{config.SHARD_COUNT}", rendezvous=rendezvous
+            )
+        return None
+
+    def shard_for(self, tag_key):
+        """
+        :return: index of the shard the metric is assigned to
+        """
+        if self.rendezvous:
+            return max(range(self.count), key=lambda index: _hash(f"{index}:{tag_key}"))
+        return _hash(tag_key) % self.count
+
+    def owns(self, tag_key):
+        return self.shard_for(tag_key) == self.index
+
+    def filter(self, metric_configs):
+        """
+        Yields the metric configs assigned to this shard.
+        """
+        for metric_config in metric_configs:
+            if self.owns(metric_config.tag_key):
+                yield metric_config
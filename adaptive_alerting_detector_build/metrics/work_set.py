@@ -0,0 +1,124 @@
+"""
+Merges the metric configs of several configuration files into one work set.
+
+Metrics are de-duplicated by tag key, so a metric listed in several files is only
+queried and looked up once, and are grouped by datasource config, so consecutive metrics
+share the same datasource (see MetricFactory).
+"""
+import itertools
+import json
+import logging
+
+import related
+
+LOGGER = logging.getLogger(__name__)
+
+# Number of metrics grouped by datasource at a time
+GROUP_WINDOW = 1000
+
+
+def iter_unique_metric_configs(metric_config_readers):
+    """
+    Yields the first config of each tag key of the files while they are read. Unlike
+    MetricWorkSet, only the tag keys are kept in memory.
+    """
+    seen_tag_keys = set()
+    for metric_config_reader in metric_config_readers:
+        for metric_config in metric_config_reader:
+            if metric_config.tag_key not in seen_tag_keys:
+                seen_tag_keys.add(metric_config.tag_key)
+                yield metric_config
+
+
+class MetricWorkSet:
+    """
+    Iterates over the metric configs of several files while they are read, keeping the
+    first config of each tag key.
+
+    Only a digest of the first config of each tag key and the files listing it are kept,
+    not the configs, so work starts with the first metric and memory does not grow with
+    the size of the configs. Grouping by datasource is best effort: metrics are grouped
+    within windows of group_window metrics. exit_code, len() and file_summary() cover
+    the files read so far, i.e. all of them once the work set has been iterated.
+    """
+
+    def __init__(self, metric_config_readers, group_window=GROUP_WINDOW):
+        self._metric_config_readers = list(metric_config_readers)
+        self._group_window = group_window
+        self._seen = dict()
+        self.exit_code = 0
+
+    def _iter_unique(self):
+        self._seen = dict()
+        self.exit_code = 0
+        for metric_config_reader in self._metric_config_readers:
+            path = metric_config_reader.json_config_file_path
+            for metric_config in metric_config_reader:
+                if self._add(metric_config, path):
+                    yield metric_config
+            self.exit_code = max(self.exit_code, metric_config_reader.exit_code)
+
+    def _add(self, metric_config, path):
+        """
+        :return: True if the metric is the first of its tag key
+        """
+        tag_key = metric_config.tag_key
+        digest = hash(json.dumps(related.to_dict(metric_config), sort_keys=True))
+        seen = self._seen.get(tag_key)
+        if seen is None:
+            self._seen[tag_key] = (digest, [path])
+            return True
+        first_digest, paths = seen
+        if path not in paths:
+            paths.append(path)
+        if digest != first_digest:
+            LOGGER.warning(
+                f"Metric '{metric_config.name}' in '{path}' has the same tags as a "
+                f"metric in '{paths[0]}' but a "
+                f"different config. Using the config from '{paths[0]}'."
+            )
+        return False
+
+    def __len__(self):
+        return len(self._seen)
+
+    def __iter__(self):
+        """
+        Iterates over the metric configs, grouped by datasource config within each
+        window, in the order each datasource is first seen.
+        """
+        metric_configs = self._iter_unique()
+        while True:
+            window = list(itertools.islice(metric_configs, self._group_window))
+            if not window:
+                return
+            groups = dict()
+            for metric_config in window:
+                datasource_key = json.dumps(metric_config.datasource, sort_keys=True)
+                groups.setdefault(datasource_key, []).append(metric_config)
+            for group in groups.values():
+                yield from group
+
+    def tag_keys(self):
+        return iter(self._seen)
+
+    def sources(self, tag_key):
+        """
+        :return: paths of the files listing the metric, in the order they were read
+        """
+        _, paths = self._seen.get(tag_key, (None, []))
+        return list(paths)
+
+    def file_summary(self):
+        """
+        :return: dict of file path to the number of metrics it lists and how many of
+                 them are also listed in another file
+        """
+        summary = dict()
+        for _, paths in self._seen.values():
+            for path in paths:
+                file_summary = summary.setdefault(path, {"metrics": 0, "shared": 0})
+                file_summary["metrics"] += 1
+                if len(paths) > 1:
+                    file_summary["shared"] += 1
+        return summary
@@ -1,12 +1,12 @@
-import datetime
 import logging
-from datetime import timedelta
 
 import pandas as pd
-from pandas import DatetimeIndex, DataFrame, Series
-from pandas._libs.tslibs.timedeltas import Timedelta
+from pandas import DatetimeIndex
+
+from adaptive_alerting_detector_build.timeseries import TimeSeries
+
+from .frequency import obs_per_day_for_freq, obs_per_day_for_index
 
-logging.basicConfig()
 LOGGER = logging.getLogger(__name__)
 
 
@@ -24,8 +24,9 @@ def obs_per_day(df, freq_override=None):
         if type(freq_override == str):
             result = calculate_obs_per_day_for_str_freq(freq_override)
             LOGGER.info(
-                f"Using provided freq_override '{freq_override}'. This means we expect {result} observations "
-                f"per day."
+                "Using provided freq_override '%s'. This means we expect %s observations per day.",
+                freq_override,
+                result,
             )
         else:
             raise ValueError(
@@ -41,7 +42,9 @@ def obs_per_day(df, freq_override=None):
                 f"is not DatetimeIndex"
             )
     LOGGER.info(
-        f"Data provided (with a total of {len(df)} data points) contains {result} observations per day."
+        "Data provided (with a total of %s data points) contains %s observations per day.",
+        len(df),
+        result,
     )
     return result
 
@@ -52,50 +55,28 @@ def calculate_obs_per_day_for_str_freq(freq_str):
                      See https://pandas.pydata.org/pandas-docs/stable/user_guide/timeseries.html#offset-aliases
     :return: Number of observations per day at given freq
     """
-    now = datetime.datetime.now()
-    plus1w = now + pd.DateOffset(1)
-    index = pd.date_range(now, plus1w, freq=freq_str)
-    series = pd.Series(range(len(index)), index=index)
-    return len(series) - 1
+    return obs_per_day_for_freq(freq_str)
 
 
 def obs_per_day_for_datetimeindex(df):
     index_freq = df.index.freq
     if index_freq:
-        freq_as_timedelta = pd.to_timedelta(index_freq)
         LOGGER.info(
-            f"Data provided has an index of type '{type(index_freq).__name__}' with a freq of {index_freq} "
-            f"(timedelta: {freq_as_timedelta})"
+            "Data provided has an index of type '%s' with a freq of %s",
+            type(index_freq).__name__,
+            index_freq,
         )
     else:
-        freq_as_timedelta = (
-            df.index[1] - df.index[0]
-        )  # Timedelta representing distance between first two obs
         LOGGER.info(
-            f"Data provided has no index. Using the first two data points, we've derived a frequency "
-            f"timedelta of '{freq_as_timedelta}'."
+            "Data provided has no index freq. Using the dominant distance between data points to derive a "
+            "frequency."
         )
-    if freq_as_timedelta > timedelta(days=1):
-        return 0
-    s: Series = resample_first_day(df, freq_as_timedelta)
-    return len(s) - 1
-
-
-def resample_first_day(df: DataFrame, freq_as_timedelta: Timedelta) -> Series:
-    """
-    Takes the provided DataFrame and resamples the values using the provided freq_as_timedelta.
-    This can be used to calculate number of observations per day the freq_as_timedelta gives.
-    :param df: Pandas DataFrame with index of type DatetimeIndex
-    :param freq_as_timedelta: Pandas Timedelta
-    :return: Pandas Series
-    """
-    first_two_timestamps = [df.index[0], df.index[0] + pd.DateOffset(1)]
-    dti: DatetimeIndex = pd.to_datetime(first_two_timestamps)
-    s = pd.Series(0, index=dti)
-    return s.resample(freq_as_timedelta).last()
+    return obs_per_day_for_index(df.index)
 
 
 def df_values_as_array(df):
+    if isinstance(df, TimeSeries):
+        return df.values
     return df.iloc[:, 0].values
 
 
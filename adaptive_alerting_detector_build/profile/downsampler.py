@@ -0,0 +1,162 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame, DatetimeIndex
+
+from .df_helper import obs_per_day
+
+LOGGER = logging.getLogger(__name__)
+
+# Coarsest resolution (in observations per day) at which each profiling test still sees
+# the features it looks for. Stationarity uses one day of lags and daily/weekly
+# seasonality are fully visible at 5 to 15 minutes.
+TARGET_OBS_PER_DAY = {
+    "stationarity": 288,  # 5 minutes
+    "seasonality": 96,  # 15 minutes
+}
+
+DOWNSAMPLE_METHODS = ("mean", "lttb")
+
+
+def downsample_factor(observations_per_day: int, tests=("stationarity",)) -> int:
+    """
+    Picks how many observations to merge into one, so that the series keeps at least the
+    resolution required by every test being run.
+    :param observations_per_day: Number of observations per day of the original series
+    :param tests: Names of the tests that will be run on the series (keys of
+                  TARGET_OBS_PER_DAY)
+    :return: Downsampling factor, which always divides observations_per_day. 1 means no
+             downsampling.
+    """
+    target = max(TARGET_OBS_PER_DAY[test] for test in tests)
+    if observations_per_day <= target:
+        return 1
+    factor = observations_per_day // target
+    # A divisor keeps whole observations per day, so lags and periods stay exact
+    while observations_per_day % factor:
+        factor -= 1
+    return factor
+
+
+def block_mean(values: np.ndarray, factor: int) -> np.ndarray:
+    """
+    Averages consecutive blocks of `factor` values, ignoring NaN. A trailing partial
+    block is dropped and blocks without any value are NaN.
+    :param values: numpy array
+    :param factor: block size
+    :return: numpy float64 array of len(values) // factor block means
+    """
+    n_blocks = values.size // factor
+    blocks = np.asarray(values[: n_blocks * factor], dtype=np.float64).reshape(
+        n_blocks, factor
+    )
+    valid = ~np.isnan(blocks)
+    sums = np.where(valid, blocks, 0.0).sum(axis=1)
+    counts = valid.sum(axis=1)
+    means = np.full(n_blocks, np.nan)
+    np.divide(sums, counts, out=means, where=counts > 0)
+    return means
+
+
+def lttb(values: np.ndarray, n_out: int, positions: np.ndarray = None) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling (https://skemman.is/handle/1946/15343).
+    Keeps the first and last points and, for each bucket in between, the point forming
+    the largest triangle with the previously selected point and the average of the next
+    bucket. Values must not contain NaN.
+    :param values: numpy array
+    :param n_out: number of points to keep
+    :param positions: Optional x coordinates of the values. Defaults to the array
+                      offsets.
+    :return: numpy array with the offsets of the selected points
+    """
+    n = values.size
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    y = np.asarray(values, dtype=np.float64)
+    x = (
+        np.arange(n, dtype=np.float64)
+        if positions is None
+        else np.asarray(positions, dtype=np.float64)
+    )
+    # Bucket edges for the points between the fixed first and last ones
+    edges = (np.arange(n_out - 1) * ((n - 2) / (n_out - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(n_out - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_start = end
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample_for_profile(
+    df: DataFrame, tests=("stationarity",), method: str = "mean", freq: str = None
+):
+    """
+    Reduces the resolution of a series ahead of profiling, to the coarsest resolution
+    the given tests support. Series whose frequency cannot be determined (no
+    DatetimeIndex and no freq) are returned unchanged.
+
+    :param df: Pandas DataFrame with DateTimeIndex
+    :param tests: Names of the tests that will be run on the series (keys of
+                  TARGET_OBS_PER_DAY)
+    :param method: "mean" for block means or "lttb" for Largest-Triangle-Three-Buckets
+    :param freq: Frequency string such as '1D' for 1 day, '5T' for 5 minutes, etc. See
+                 https://pandas.pydata.org/pandas-docs/stable/user_guide/timeseries.html#offset-aliases
+    :return: tuple of (downsampled DataFrame, frequency string of the downsampled data,
+             downsampling factor)
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(
+            f"Unknown downsample method '{method}'. Valid values are "
+            f"{DOWNSAMPLE_METHODS}"
+        )
+    if not freq and not isinstance(df.index, DatetimeIndex):
+        return df, freq, 1
+    if len(df) < 2:
+        return df, freq, 1
+    observations_per_day = obs_per_day(df, freq_override=freq)
+    factor = downsample_factor(observations_per_day, tests)
+    if factor <= 1:
+        return df, freq, 1
+    new_freq = pd.tseries.frequencies.to_offset(
+        pd.Timedelta(days=1) / (observations_per_day // factor)
+    ).freqstr
+    values = df.iloc[:, 0].to_numpy(dtype=np.float64)
+    if method == "mean":
+        downsampled_values = block_mean(values, factor)
+        index = df.index[::factor][: downsampled_values.size]
+    else:
+        valid_offsets = np.flatnonzero(~np.isnan(values))
+        positions = (
+            df.index.asi8[valid_offsets]
+            if isinstance(df.index, DatetimeIndex)
+            else valid_offsets
+        )
+        keep = valid_offsets[
+            lttb(values[valid_offsets], values.size // factor, positions)
+        ]
+        downsampled_values = values[keep]
+        index = df.index[keep]
+    LOGGER.debug(
+        "Downsampled %d observations by a factor of %d to %d (freq %s)",
+        len(df),
+        factor,
+        downsampled_values.size,
+        new_freq,
+    )
+    downsampled = DataFrame(downsampled_values, index=index, columns=df.columns[:1])
+    return downsampled, new_freq, factor
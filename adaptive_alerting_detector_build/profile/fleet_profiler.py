@@ -0,0 +1,247 @@
+"""
+Profiles many metrics at once.
+
+Metric data is fetched in the calling process, while the CPU bound stationarity and
+seasonality tests run in a process pool, series being passed to it through shared memory
+(see utils/shared_series.py). One NDJSON line is written per metric as soon as its
+profile is complete, and the number of series waiting for (or in) the pool is bounded,
+so memory does not grow with the number of metrics.
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from adaptive_alerting_detector_build.metrics import MetricFactory
+from adaptive_alerting_detector_build.regularize import regularize
+from adaptive_alerting_detector_build.timeseries import TimeSeries
+from adaptive_alerting_detector_build.utils.shared_series import share_timeseries
+
+LOGGER = logging.getLogger(__name__)
+
+# Number of series queued per pool worker before fetching more data.
+IN_FLIGHT_PER_WORKER = 2
+
+
+def profile_series(tag_key, name, timestamps, values, downsample=None):
+    """
+    Runs the profiling tests on a single series. Runs in a pool worker, so arguments are
+    plain numpy arrays. The annotated reports of the tests are not built, the profile
+    holds the results.
+    :param tag_key: Canonical metric key, copied to the result
+    :param name: Metric name, copied to the result
+    :param timestamps: int64 numpy array of epoch nanoseconds
+    :param values: float64 numpy array
+    :param downsample: Optional downsampling method ("mean" or "lttb"), reducing the
+                       series to the coarsest resolution each test supports before
+                       running it, see downsampler.py. The period is still a number of
+                       observations of the original series.
+    :return: dict with the profile, timings (in seconds) and errors of each test
+    """
+    from .downsampler import downsample_for_profile
+    from .metric_profiler import check_stationarity
+    from .seasonal_metric_profiler import check_seasonality
+
+    result = {
+        "tag_key": tag_key,
+        "name": name,
+        "points": int(values.size),
+        "stationary": None,
+        "seasonal": None,
+        "period": None,
+        "timings": {},
+        "errors": {},
+    }
+    # The tests expect a regular series, Graphite may return duplicate or missing
+    # timestamps and partial edge buckets
+    df = regularize(TimeSeries(timestamps, values)).to_frame()
+
+    def downsampled(test_name):
+        if not downsample:
+            return df, None, 1
+        return downsample_for_profile(df, tests=(test_name,), method=downsample)
+
+    def stationarity():
+        stationarity_df, freq, _ = downsampled("stationarity")
+        stationarity_result = check_stationarity(
+            stationarity_df.dropna(), freq=freq, report=False
+        )
+        result["stationary"] = bool(stationarity_result.is_stationary)
+
+    def seasonality():
+        seasonality_df, _, factor = downsampled("seasonality")
+        seasonality_result = check_seasonality(seasonality_df, report=False)
+        result["seasonal"] = bool(seasonality_result.is_seasonal)
+        result["period"] = seasonality_result.period
+        if seasonality_result.period:
+            result["period"] *= factor
+
+    for test_name, test in (
+        ("stationarity", stationarity),
+        ("seasonality", seasonality),
+    ):
+        start = time.perf_counter()
+        try:
+            test()
+        except Exception as e:
+            result["errors"][test_name] = f"{e.__class__.__name__}: {e}"
+        result["timings"][test_name] = round(time.perf_counter() - start, 6)
+    return result
+
+
+def profile_shared_series(tag_key, name, series, downsample=None):
+    """
+    Same as profile_series(), with the series passed as a SharedSeries or PickledSeries.
+    """
+    return profile_series(tag_key, name, *series.arrays(), downsample=downsample)
+
+
+def read_completed_tag_keys(output_file_path):
+    """
+    Reads the tag keys already profiled in a previous (possibly interrupted) run, so it
+    can be resumed. A trailing partial line, left by an interrupted write, is truncated
+    from the file.
+    :param output_file_path: NDJSON output file of the previous run
+    :return: set of tag keys
+    """
+    completed = set()
+    if not os.path.exists(output_file_path):
+        return completed
+    complete_length = 0
+    with open(output_file_path, "rb") as output_file:
+        for line in output_file:
+            if not line.endswith(b"\n"):
+                break
+            complete_length += len(line)
+            try:
+                completed.add(json.loads(line)["tag_key"])
+            except (ValueError, KeyError):
+                LOGGER.warning(f"Ignoring unreadable line in '{output_file_path}'")
+    if complete_length < os.path.getsize(output_file_path):
+        LOGGER.info(f"Truncating partial line at the end of '{output_file_path}'")
+        with open(output_file_path, "r+b") as output_file:
+            output_file.truncate(complete_length)
+    return completed
+
+
+def profile_metric_configs(
+    metric_configs, output, workers=None, completed=frozenset(), downsample=None
+):
+    """
+    Profiles the metrics and streams one NDJSON line per metric to output.
+    :param metric_configs: iterable of MetricConfig
+    :param output: text file object the NDJSON lines are written to
+    :param workers: Number of pool processes. Defaults to the number of CPUs, 0 profiles
+                    in the calling process.
+    :param completed: tag keys to skip, see read_completed_tag_keys()
+    :param downsample: Optional downsampling method, see profile_series()
+    :return: exit code, 1 if a metric could not be fetched or its worker failed. Errors
+             of the stationarity and seasonality tests (e.g. a series too short for a
+             test) are recorded in the profile of the metric and counted in a warning,
+             they do not change the exit code.
+    """
+    exit_code = 0
+    test_errors = 0
+    executor = None
+    if workers != 0:
+        workers = workers or os.cpu_count()
+        executor = ProcessPoolExecutor(max_workers=workers)
+    max_in_flight = IN_FLIGHT_PER_WORKER * (workers or 1)
+    # future -> (tag key, name, fetch time, shared series)
+    in_flight = dict()
+    metric_factory = MetricFactory()
+
+    def write(result):
+        nonlocal test_errors
+        if "stationarity" in result["errors"] or "seasonality" in result["errors"]:
+            test_errors += 1
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+
+    def drain(until):
+        nonlocal exit_code
+        while len(in_flight) > until:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                tag_key, name, fetch_time, series = in_flight.pop(future)
+                series.release()
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {
+                        "tag_key": tag_key,
+                        "name": name,
+                        "timings": {},
+                        "errors": {"worker": f"{e.__class__.__name__}: {e}"},
+                    }
+                    exit_code = 1
+                result["timings"]["fetch"] = fetch_time
+                write(result)
+
+    try:
+        for metric_config in metric_configs:
+            tag_key = metric_config.tag_key
+            if tag_key in completed:
+                LOGGER.info(
+                    f"Metric '{metric_config.name}' already profiled. Skipping!"
+                )
+                continue
+            start = time.perf_counter()
+            try:
+                timeseries = metric_factory.datasource(
+                    metric_config.datasource
+                ).query_series(tags=metric_config.tags)
+            except Exception as e:
+                LOGGER.error(
+                    f"Unable to fetch data for metric '{metric_config.name}', {e}"
+                )
+                write(
+                    {
+                        "tag_key": tag_key,
+                        "name": metric_config.name,
+                        "timings": {"fetch": round(time.perf_counter() - start, 6)},
+                        "errors": {"fetch": f"{e.__class__.__name__}: {e}"},
+                    }
+                )
+                exit_code = 1
+                continue
+            fetch_time = round(time.perf_counter() - start, 6)
+            if executor is None:
+                result = profile_series(
+                    tag_key,
+                    metric_config.name,
+                    timeseries.timestamps,
+                    timeseries.values,
+                    downsample=downsample,
+                )
+                result["timings"]["fetch"] = fetch_time
+                write(result)
+                continue
+            series = share_timeseries(timeseries)
+            del timeseries
+            try:
+                future = executor.submit(
+                    profile_shared_series,
+                    tag_key,
+                    metric_config.name,
+                    series,
+                    downsample=downsample,
+                )
+            except BaseException:
+                series.release()
+                raise
+            in_flight[future] = (tag_key, metric_config.name, fetch_time, series)
+            drain(until=max_in_flight - 1)
+        drain(until=0)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        for _, _, _, series in in_flight.values():
+            series.release()
+    if test_errors:
+        LOGGER.warning(
+            f"Profiling tests failed for {test_errors} metric(s), see the errors of "
+            "their profile"
+        )
+    return exit_code
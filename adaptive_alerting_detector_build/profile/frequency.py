@@ -0,0 +1,81 @@
+import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from pandas import DatetimeIndex
+from pandas.tseries.frequencies import to_offset
+from pandas.tseries.offsets import Tick
+
+NANOS_PER_DAY = 24 * 60 * 60 * 10 ** 9
+
+
+@lru_cache(maxsize=256)
+def obs_per_day_for_freq(freq_str: str) -> int:
+    """
+    Calculates the number of observations per day for a frequency string, without
+    building any index.
+    :param freq_str: Frequency string such as '1D' for 1 day, '5T' for 5 minutes, etc.
+                     See
+                     https://pandas.pydata.org/pandas-docs/stable/user_guide/timeseries.html#offset-aliases
+    :return: Number of observations per day at given freq, 0 if freq is longer than 1
+             day
+    """
+    offset = to_offset(freq_str)
+    if isinstance(offset, Tick):
+        return obs_per_day_for_step(offset.nanos)
+    return _obs_per_day_for_calendar_offset(offset)
+
+
+def obs_per_day_for_step(step_nanos: int) -> int:
+    """
+    :param step_nanos: Distance between two observations in nanoseconds
+    :return: Number of observations per day, 0 if step is longer than 1 day
+    """
+    if step_nanos <= 0:
+        raise ValueError(f"Step must be positive, got {step_nanos}ns")
+    return NANOS_PER_DAY // step_nanos
+
+
+def obs_per_day_for_index(index: DatetimeIndex) -> int:
+    """
+    Calculates the number of observations per day of a DatetimeIndex, from index.freq
+    when set or from the dominant step between its timestamps otherwise.
+    :param index: Pandas DatetimeIndex
+    :return: Number of observations per day, 0 if the frequency is longer than 1 day
+    """
+    if index.freq is not None:
+        if isinstance(index.freq, Tick):
+            return obs_per_day_for_step(index.freq.nanos)
+        return _obs_per_day_for_calendar_offset(index.freq)
+    return obs_per_day_for_step(infer_step(index.asi8))
+
+
+def infer_step(timestamps: np.ndarray) -> int:
+    """
+    Infers the dominant step between timestamps, i.e. the most frequent positive
+    difference between neighbours. Gaps, duplicates and a missing first point do not
+    change the result as long as most neighbours are one step apart.
+    :param timestamps: int64 numpy array, e.g. DatetimeIndex.asi8
+    :return: Dominant step in the timestamps' unit
+    """
+    if timestamps.size < 2:
+        raise ValueError("At least two timestamps are required to infer a frequency")
+    steps = np.diff(timestamps)
+    if steps[0] > 0 and (steps == steps[0]).all():
+        return int(steps[0])
+    steps = steps[steps > 0]
+    if steps.size == 0:
+        raise ValueError(
+            "Unable to infer a frequency from timestamps that do not increase"
+        )
+    unique_steps, counts = np.unique(steps, return_counts=True)
+    return int(unique_steps[np.argmax(counts)])
+
+
+def _obs_per_day_for_calendar_offset(offset) -> int:
+    # Calendar offsets (business days, weeks, months...) do not have a fixed length,
+    # so count the observations in the day starting now.
+    now = datetime.datetime.now()
+    index = pd.date_range(now, now + pd.DateOffset(1), freq=offset)
+    return max(len(index) - 1, 0)
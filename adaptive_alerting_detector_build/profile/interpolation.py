@@ -0,0 +1,45 @@
+import numpy as np
+
+
+def fill_gaps(values: np.ndarray, positions: np.ndarray = None) -> float:
+    """
+    Fills missing (NaN) values in place using linear interpolation.
+
+    Gives the same result as pandas' `interpolate(method='polynomial', order=1)`
+    followed by `replace(np.nan, 0.0)`: interior gaps are interpolated linearly with
+    respect to `positions`, while leading and trailing NaN (which pandas leaves
+    untouched) are set to 0.0.
+    :param values: float64 numpy array, modified in place
+    :param positions: Optional array of x coordinates (e.g. int64 epoch nanoseconds of a
+                      DatetimeIndex) the interpolation is weighted by. Defaults to the
+                      array offsets.
+    :return: Fraction of the values that were missing before filling (0.0 for an empty
+             array)
+    """
+    n = values.size
+    if n == 0:
+        return 0.0
+    missing = np.isnan(values)
+    n_missing = int(np.count_nonzero(missing))
+    if n_missing == 0:
+        return 0.0
+    valid_offsets = np.flatnonzero(~missing)
+    if valid_offsets.size == 0:
+        values[:] = 0.0
+        return 1.0
+    first, last = valid_offsets[0], valid_offsets[-1]
+    interior = missing[first:last]
+    if interior.any():
+        if positions is None:
+            x = np.arange(n, dtype=np.float64)
+        else:
+            # Offsetting before the float conversion keeps epoch nanoseconds precise
+            positions = np.asarray(positions)
+            x = (positions - positions[0]).astype(np.float64)
+        gap_offsets = first + np.flatnonzero(interior)
+        values[gap_offsets] = np.interp(
+            x[gap_offsets], x[valid_offsets], values[valid_offsets]
+        )
+    values[:first] = 0.0
+    values[last + 1 :] = 0.0
+    return n_missing / n
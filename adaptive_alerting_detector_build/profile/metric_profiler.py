@@ -2,16 +2,22 @@ import logging
 
 from pandas import DataFrame
 
+from adaptive_alerting_detector_build.timeseries import as_frame
+
+from .downsampler import downsample_for_profile
 from .stationarity_annotator import annotate_stationarity
 from .stationarity_checker import (
     stationarity_check,
     DEFAULT_SIGNIFICANCE,
     DEFAULT_MAX_ADF_PVALUE,
 )
-from .stationarity_display import print_stationarity_report
+from .stationarity_display import (
+    format_stationarity_report,
+    is_stationarity_report_enabled,
+    print_stationarity_report,
+)
 from .stationarity_types import StationarityResult, StationarityReport
 
-logging.basicConfig(level=logging.DEBUG)
 LOGGER = logging.getLogger(__name__)
 
 # TODO this method and file is specialised for stationarity test, consider preferred using a single point of call
@@ -27,11 +33,12 @@ def build_profile(
     max_adf_pvalue=DEFAULT_MAX_ADF_PVALUE,
     freq: int = None,
     lags: str = None,
+    downsample: str = None,
 ):
     """
     Builds a feature profile of the given time series.
 
-    :param df: Pandas DataFrame with DateTimeIndex
+    :param df: Pandas DataFrame with DateTimeIndex, or TimeSeries
     :param significance: The adfuller significance result to be used for test. Valid values are "1%", "5%" and "10%"
     :param max_adf_pvalue: Augmented Dicker-Fuller test result must be less than or equal to this number
     :param freq: Frequency string such as '1D' for 1 day, '5T' for 5 minutes, etc.
@@ -41,9 +48,18 @@ def build_profile(
     :param lags: The number of lags that should be checked for unit root (i.e. is non-stationary).
                  If None, defaults to number of observations per day (which is derived from the frequency observed in
                  timestamps in provided df)
+    :param downsample: Optional downsampling method ("mean" or "lttb") used to reduce the series to the coarsest
+                       resolution the stationarity test supports before running it. Provided lags are scaled down.
     :return: boolean indicating whether the time series is stationary, assuming the given significance level
     :return: Timeseries feature profile
     """
+    df = as_frame(df)
+    if downsample:
+        df, freq, factor = downsample_for_profile(
+            df, tests=("stationarity",), method=downsample, freq=freq
+        )
+        if lags and factor > 1:
+            lags = max(1, lags // factor)
     stationarity_result: bool = _is_stationary(
         df=df,
         significance=significance,
@@ -76,6 +92,39 @@ def _is_stationary(
                  timestamps in provided df)
     :return: boolean indicating whether the time series is stationary, assuming the given significance level
     """
+    stationarity_result: StationarityResult = check_stationarity(
+        df=df,
+        significance=significance,
+        max_adf_pvalue=max_adf_pvalue,
+        freq=freq,
+        lags=lags,
+    )
+    return stationarity_result.is_stationary
+
+
+def check_stationarity(
+    df: DataFrame,
+    significance: str = DEFAULT_SIGNIFICANCE,
+    max_adf_pvalue: float = DEFAULT_MAX_ADF_PVALUE,
+    freq: str = None,
+    lags: int = None,
+    report: bool = None,
+) -> StationarityResult:
+    """
+    Runs a stationarity test on the time series and returns the structured result.
+    The annotated report is only built when the report logger is enabled for INFO, use render_stationarity_report()
+    to build it on demand.
+
+    :param df: Pandas DataFrame with DateTimeIndex, or TimeSeries
+    :param significance: The adfuller significance result to be used for test. Valid values are "1%", "5%" and "10%"
+    :param max_adf_pvalue: Augmented Dicker-Fuller test result must be less than or equal to this number
+    :param freq: Frequency string such as '1D' for 1 day, '5T' for 5 minutes, etc.
+    :param lags: The number of lags that should be checked for unit root (i.e. is non-stationary).
+    :param report: Whether to build and log the annotated report. Defaults to whether the report logger is enabled
+                   for INFO, False skips it regardless of the logging level.
+    :return: StationarityResult
+    """
+    df = as_frame(df)
     stationarity_result: StationarityResult = _try_stationarity_check(
         df=df,
         max_adf_pvalue=max_adf_pvalue,
@@ -83,11 +132,28 @@ def _is_stationary(
         freq=freq,
         lags=lags,
     )
-    stationarity_report: StationarityReport = _build_stationarity_report(
-        stationarity_result, significance, max_adf_pvalue
+    if report is None:
+        report = is_stationarity_report_enabled()
+    if report:
+        stationarity_report: StationarityReport = _build_stationarity_report(
+            stationarity_result, significance, max_adf_pvalue
+        )
+        print_stationarity_report(stationarity_report)
+    return stationarity_result
+
+
+def render_stationarity_report(
+    stationarity_result: StationarityResult,
+    significance: str = DEFAULT_SIGNIFICANCE,
+    max_adf_pvalue: float = DEFAULT_MAX_ADF_PVALUE,
+) -> str:
+    """
+    Renders the annotated report of a stationarity result, regardless of the logging level.
+    """
+    stationarity_report: StationarityReport = annotate_stationarity(
+        stationarity_result, significance=significance, max_adf_pvalue=max_adf_pvalue
     )
-    print_stationarity_report(stationarity_report)
-    return stationarity_result.is_stationary
+    return format_stationarity_report(stationarity_report)
 
 
 def _try_stationarity_check(
@@ -110,7 +176,11 @@ def _build_stationarity_report(stationarity_result, significance, max_adf_pvalue
     p_value = stationarity_result.adf_result.pvalue
     crit_value = stationarity_result.adf_result.critvalues[significance]
     LOGGER.info(
-        f"\ncritvalue[{significance}]={crit_value}, test_stat={test_stat}, p_value={p_value}"
+        "\ncritvalue[%s]=%s, test_stat=%s, p_value=%s",
+        significance,
+        crit_value,
+        test_stat,
+        p_value,
     )
     stationarity_report: StationarityReport = annotate_stationarity(
         stationarity_result, significance=significance, max_adf_pvalue=max_adf_pvalue
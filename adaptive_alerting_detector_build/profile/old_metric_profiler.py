@@ -4,7 +4,6 @@ from .stationarity_annotator import annotate_stationarity
 from .stationarity_display import print_stationarity_report
 from .stationarity_types import AdfResultWrapper, StationarityResult, StationarityReport
 
-logging.basicConfig(level=logging.DEBUG)
 LOGGER = logging.getLogger(__name__)
 
 
@@ -2,39 +2,63 @@ import logging
 
 from pandas import DataFrame
 
+from adaptive_alerting_detector_build.timeseries import as_frame
+
+from .downsampler import downsample_for_profile
 from .seasonality_annotator import annotate_seasonality
 from .seasonality_checker import (
     seasonality_check
 )
-from .seasonality_display import print_seasonality_report
+from .seasonality_display import (
+    format_seasonality_report,
+    is_seasonality_report_enabled,
+    print_seasonality_report,
+)
 from .seasonality_types import SeasonalityResult, SeasonalityReport
 
-logging.basicConfig(level=logging.DEBUG)
 LOGGER = logging.getLogger(__name__)
 
 
 def build_seasonal_profile(
     df: DataFrame,
-    period: int = None
+    period: int = None,
+    max_gap_fraction: float = None,
+    downsample: str = None,
+    freq: str = None
 ):
     """
     Builds a seasonality profile of the given time series.
 
-    :param df: Pandas DataFrame with DateTimeIndex
+    :param df: Pandas DataFrame with DateTimeIndex, or TimeSeries
     :param period: Optional period to provide to seasonal test. It is advised to provide a period with the timeseries if
                     it is known, to reduce algorithm complexity and increase accuracy.
+    :param max_gap_fraction: Optional maximum fraction of missing values. Series with more gaps raise a ValueError
+                             rather than being tested.
+    :param downsample: Optional downsampling method ("mean" or "lttb") used to reduce the series to the coarsest
+                       resolution the seasonality test supports before running it. Provided period is scaled down.
+    :param freq: Frequency string such as '1D' for 1 day, '5T' for 5 minutes, etc. Only used for downsampling,
+                 when df.index is not a DatetimeIndex.
     :return: the result of seasonality test
     """
+    df = as_frame(df)
+    if downsample:
+        df, freq, factor = downsample_for_profile(
+            df, tests=("seasonality",), method=downsample, freq=freq
+        )
+        if period and factor > 1:
+            period = max(1, round(period / factor))
     seasonality_result: bool = _is_seasonal(
         df=df,
-        period=period
+        period=period,
+        max_gap_fraction=max_gap_fraction
     )
     return {"seasonal": seasonality_result}
 
 
 def _is_seasonal(
     df: DataFrame,
-    period: int = None
+    period: int = None,
+    max_gap_fraction: float = None
 ) -> bool:
     """
     Runs a seasonality test on a time series.
@@ -42,22 +66,63 @@ def _is_seasonal(
     :param df: Pandas DataFrame with DateTimeIndex
     :param period: Optional period to provide to seasonal test. It is advised to provide a period with the timeseries if
                    it is known, to reduce algorithm complexity and increase accuracy.
+    :param max_gap_fraction: Optional maximum fraction of missing values
     :return: boolean indicating whether the time series is seasonal
     """
-    seasonality_result: SeasonalityResult = _try_seasonality_check(
+    seasonality_result: SeasonalityResult = check_seasonality(
         df=df,
-        period=period
+        period=period,
+        max_gap_fraction=max_gap_fraction
     )
-    seasonality_report: SeasonalityReport = annotate_seasonality(seasonality_result)
-    print_seasonality_report(seasonality_report)
     return seasonality_result.is_seasonal
 
 
+def check_seasonality(
+    df: DataFrame,
+    period: int = None,
+    max_gap_fraction: float = None,
+    report: bool = None
+) -> SeasonalityResult:
+    """
+    Runs a seasonality test on a time series and returns the structured result, including the detected period.
+    The annotated report is only built when the report logger is enabled for INFO, use render_seasonality_report()
+    to build it on demand.
+
+    :param df: Pandas DataFrame with DateTimeIndex, or TimeSeries
+    :param period: Optional period to provide to seasonal test.
+    :param max_gap_fraction: Optional maximum fraction of missing values
+    :param report: Whether to build and log the annotated report. Defaults to whether the report logger is enabled
+                   for INFO, False skips it regardless of the logging level.
+    :return: SeasonalityResult
+    """
+    df = as_frame(df)
+    seasonality_result: SeasonalityResult = _try_seasonality_check(
+        df=df,
+        period=period,
+        max_gap_fraction=max_gap_fraction
+    )
+    if report is None:
+        report = is_seasonality_report_enabled()
+    if report:
+        seasonality_report: SeasonalityReport = annotate_seasonality(seasonality_result)
+        print_seasonality_report(seasonality_report)
+    return seasonality_result
+
+
+def render_seasonality_report(seasonality_result: SeasonalityResult) -> str:
+    """
+    Renders the annotated report of a seasonality result, regardless of the logging level.
+    """
+    return format_seasonality_report(annotate_seasonality(seasonality_result))
+
+
 def _try_seasonality_check(
     df: DataFrame,
-    period: int = None
+    period: int = None,
+    max_gap_fraction: float = None
 ) -> SeasonalityResult:
     return seasonality_check(
         df=df,
-        period=period
+        period=period,
+        max_gap_fraction=max_gap_fraction
     )
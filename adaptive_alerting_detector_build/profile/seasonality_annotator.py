@@ -18,9 +18,9 @@ def annotate_seasonality(
     seasonality_display = _seasonality_details(is_seasonal)
     test_seasonal_display = _test_seasonal_details(period)
     return SeasonalityReport(
-        timeseries_name + seasonality_display,
-        is_seasonal,
-        test_seasonal_display,
+        is_seasonal=is_seasonal,
+        seasonality_display=timeseries_name + seasonality_display,
+        test_seasonal_display=test_seasonal_display,
     )
 
 
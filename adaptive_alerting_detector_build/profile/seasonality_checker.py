@@ -1,12 +1,13 @@
 import logging
 
 import numpy as np
-from pandas import DataFrame
+from pandas import DataFrame, DatetimeIndex
+from pandas.api.types import is_numeric_dtype
 from seasonal import fit_seasons
 
+from .interpolation import fill_gaps
 from .seasonality_types import SeasonalityResult
 
-logging.basicConfig(level=logging.DEBUG)
 LOGGER = logging.getLogger(__name__)
 
 # minimum of two seasons is recommended, ideally 3
@@ -19,31 +20,47 @@ def _preprocess_data(df: DataFrame):
     First and last values in timeseries can still remain NaN after interpolation,
     therefore replacing them with zeroes.
     :param df: Pandas DataFrame with DateTimeIndex
-    :return: numpy data series
+    :return: tuple of numpy data series and the fraction of values that were missing
     """
-    df = df['value']
-    df_interpolated = df.interpolate(method='polynomial', order=1)
-    df_nonan = df_interpolated.replace(np.nan, 0.0)
-    series = df_nonan.to_numpy()
-    return series
+    series = df['value'].to_numpy(dtype=np.float64, copy=True)
+    gap_fraction = fill_gaps(series, positions=_interpolation_positions(df))
+    return series, gap_fraction
+
+
+def _interpolation_positions(df: DataFrame):
+    """
+    Interpolation is weighted by the index, as it is for pandas' polynomial interpolation.
+    """
+    if isinstance(df.index, DatetimeIndex):
+        return df.index.asi8
+    if is_numeric_dtype(df.index):
+        return df.index.to_numpy()
+    return None
 
 
 def seasonality_check(
     df: DataFrame,
-    period = None
+    period = None,
+    max_gap_fraction: float = None
 ) -> SeasonalityResult:
     """
     Performs seasonality check in a time series using https://pypi.org/project/seasonal/
     :param df: Pandas DataFrame with DateTimeIndex
     :param period: optional seasonality period
+    :param max_gap_fraction: optional upper bound on the fraction of missing values, mostly empty series are
+                             rejected instead of being tested
     :return: SeasonalityResult
     """
 
-    data = _preprocess_data(df)
+    data, gap_fraction = _preprocess_data(df)
 
     if data.size == 0:
         raise ValueError("Data for seasonality test is not valid. Check if length of your dataset is 0.")
 
+    if max_gap_fraction is not None and gap_fraction > max_gap_fraction:
+        raise ValueError(f"Data for seasonality test is not valid. {gap_fraction:.0%} of the values are missing, "
+                         f"maximum allowed is {max_gap_fraction:.0%}.")
+
     number_of_datapoints = data.size
     if period and number_of_datapoints < period * MINIMUM_NUMBER_OF_SEASONS:
         raise ValueError(f"Number of datapoints is less than minimum recommended number of datapoints. Make sure that the number of"
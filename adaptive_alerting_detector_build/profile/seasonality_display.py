@@ -2,11 +2,23 @@ import logging
 
 from adaptive_alerting_detector_build.profile.seasonality_types import SeasonalityReport
 
-logging.basicConfig(level=logging.DEBUG)
 LOGGER = logging.getLogger(__name__)
 
 
+def is_seasonality_report_enabled() -> bool:
+    """
+    Reports are only built and rendered when they will be logged.
+    """
+    return LOGGER.isEnabledFor(logging.INFO)
+
+
+def format_seasonality_report(seasonality_report: SeasonalityReport) -> str:
+    return "\n".join(
+        ["Annotated Results of seasonal Test:", seasonality_report.seasonality_display]
+    )
+
+
 def print_seasonality_report(seasonality_report: SeasonalityReport):
-    if seasonality_report:
+    if seasonality_report and is_seasonality_report_enabled():
         LOGGER.info("Annotated Results of seasonal Test:")
         LOGGER.info(seasonality_report.seasonality_display)
@@ -16,7 +16,6 @@ DEFAULT_MAX_ADF_PVALUE = 0.05
 # TODO: Make this configurable
 AUTO_LAG_THRESHOLD = 24
 
-logging.basicConfig(level=logging.DEBUG)
 LOGGER = logging.getLogger(__name__)
 
 
@@ -74,7 +73,9 @@ def _adf_stationarity_test(
     if lags > AUTO_LAG_THRESHOLD:
         try:
             LOGGER.info(
-                f"{lags} observations per day discovered. Using {lags} as maxlag setting for adfuller()"
+                "%s observations per day discovered. Using %s as maxlag setting for adfuller()",
+                lags,
+                lags,
             )
             (adfstat, pvalue, usedlag, nobs, critvalues) = adfuller(
                 series, maxlag=lags, autolag=None
@@ -92,8 +93,11 @@ def _adf_stationarity_test(
         # Let ADFuller determine the best 'maxlags' value to use.
         # The algo will give us the `icbest` value in return
         LOGGER.info(
-            f"Less than {AUTO_LAG_THRESHOLD} observations per day discovered. We will let adfuller() decide "
-            f"number of lags. (default 12*({len(df)}/100)^(1/4)) ~= {12 * (len(df) / 100) ** -.25}"
+            "Less than %s observations per day discovered. We will let adfuller() decide "
+            "number of lags. (default 12*(%s/100)^(1/4)) ~= %s",
+            AUTO_LAG_THRESHOLD,
+            len(df),
+            12 * (len(df) / 100) ** -.25,
         )
         try:
             (adfstat, pvalue, usedlag, nobs, critvalues, icbest) = adfuller(series)
@@ -107,7 +111,7 @@ def _adf_stationarity_test(
 
 def determine_lags_to_use(df: DataFrame, freq_override: str, lags: int):
     if lags:
-        LOGGER.info(f"Lags value of {lags} provided. Skipping timestamp analysis.")
+        LOGGER.info("Lags value of %s provided. Skipping timestamp analysis.", lags)
         return lags
     else:
         return obs_per_day(df, freq_override=freq_override)
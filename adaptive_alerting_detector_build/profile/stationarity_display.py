@@ -2,12 +2,28 @@ import logging
 
 from .stationarity_types import StationarityReport
 
-logging.basicConfig(level=logging.DEBUG)
 LOGGER = logging.getLogger(__name__)
 
 
+def is_stationarity_report_enabled() -> bool:
+    """
+    Reports are only built and rendered when they will be logged.
+    """
+    return LOGGER.isEnabledFor(logging.INFO)
+
+
+def format_stationarity_report(stationarity_report: StationarityReport) -> str:
+    return "\n".join(
+        [
+            "Annotated Results of Dickey-Fuller Test:",
+            stationarity_report.adf_result_wrapper.pprints(),
+            stationarity_report.adf_summary,
+        ]
+    )
+
+
 def print_stationarity_report(stationarity_report: StationarityReport):
-    if stationarity_report:
+    if stationarity_report and is_stationarity_report_enabled():
         LOGGER.info("Annotated Results of Dickey-Fuller Test:")
         LOGGER.info(stationarity_report.adf_result_wrapper.pprints())
         LOGGER.info(stationarity_report.adf_summary)
@@ -0,0 +1,195 @@
+"""
+Regularization of metric series onto a common time grid.
+
+Graphite series can have irregular or missing timestamps, runs of null values and
+partial buckets at their edges. The functions below snap series to a regular grid of
+`step` nanoseconds, in a few numpy passes over all the points of all the series at once:
+
+    snap    each point goes to the bucket [t, t + step) holding its timestamp, points
+            sharing a bucket are averaged
+    trim    edge buckets that the series only partly cover are dropped, see
+            grid_bounds()
+    fill    buckets without any point are filled according to one of FILL_POLICIES
+
+align() puts many series on the same grid as the rows of one dense matrix, regularize()
+does it for a single TimeSeries.
+"""
+import numpy as np
+
+from .timeseries import TimeSeries
+
+MASK = "mask"
+LINEAR = "linear"
+PREVIOUS = "previous"
+ZERO = "zero"
+
+# mask      missing buckets are left NaN (invalid points of the TimeSeries)
+# linear    missing buckets between two points are interpolated linearly, leading and
+#           trailing ones are masked
+# previous  missing buckets repeat the previous point, leading ones are masked
+# zero      missing buckets are 0.0
+FILL_POLICIES = (MASK, LINEAR, PREVIOUS, ZERO)
+
+
+def median_step(timestamps) -> int:
+    """
+    Step of the points of a series, before they are snapped to a grid.
+
+    Unlike profile.frequency.infer_step(), which returns the most frequent step of a
+    mostly regular index and raises without one, this is the median step: timestamps to
+    regularize can be irregular, with no two steps alike, and series with less than two
+    points get an empty grid rather than an error.
+    :param timestamps: sorted int64 epoch nanoseconds
+    :return: The median distance between consecutive timestamps, 0 with less than two
+             distinct timestamps
+    """
+    deltas = np.diff(np.asarray(timestamps, dtype=np.int64))
+    deltas = deltas[deltas > 0]
+    if not deltas.size:
+        return 0
+    return int(np.median(deltas))
+
+
+def grid_bounds(timestamps, step: int, source_step: int = None, trim: bool = True):
+    """
+    Start and end of the grid covering a series.
+
+    A bucket is complete if the series covers it from start to end, each point standing
+    for the `source_step` that follows it. With trim, the grid starts at the first
+    complete bucket and ends after the last one, otherwise it includes the partial
+    buckets.
+    :param timestamps: sorted int64 epoch nanoseconds, not empty
+    :param step: grid step in nanoseconds
+    :param source_step: distance between the points of the series, inferred from the
+                        timestamps if not set
+    :return: (start, end) epoch nanoseconds, multiples of step, end excluded
+    """
+    if source_step is None:
+        source_step = median_step(timestamps) or step
+    first = int(timestamps[0])
+    covered_until = int(timestamps[-1]) + source_step
+    if trim:
+        return -(-first // step) * step, covered_until // step * step
+    return first // step * step, -(-covered_until // step) * step
+
+
+def fill(matrix: np.ndarray, policy: str = MASK) -> np.ndarray:
+    """
+    Fills the missing (NaN) values of each row in place.
+    :param matrix: float numpy array of shape (series, buckets), or a single series
+    :param policy: one of FILL_POLICIES
+    :return: matrix
+    """
+    if policy not in FILL_POLICIES:
+        raise ValueError(
+            f"Unknown fill policy '{policy}'. Valid values are {FILL_POLICIES}"
+        )
+    rows = matrix if matrix.ndim == 2 else matrix.reshape(1, -1)
+    missing = np.isnan(rows)
+    if policy == MASK or not missing.any():
+        return matrix
+    if policy == ZERO:
+        rows[missing] = 0.0
+        return matrix
+    n_buckets = rows.shape[1]
+    offsets = np.arange(n_buckets)
+    # Offset of the last and next point of each bucket, -1 and n_buckets if none
+    previous = np.maximum.accumulate(np.where(missing, -1, offsets), axis=1)
+    if policy == PREVIOUS:
+        target = missing & (previous >= 0)
+        row_offsets = np.nonzero(target)[0]
+        rows[target] = rows[row_offsets, previous[target]]
+        return matrix
+    following = np.minimum.accumulate(
+        np.where(missing, n_buckets, offsets)[:, ::-1], axis=1
+    )[:, ::-1]
+    target = missing & (previous >= 0) & (following < n_buckets)
+    row_offsets, bucket_offsets = np.nonzero(target)
+    before, after = previous[target], following[target]
+    start_values = rows[row_offsets, before]
+    rows[target] = start_values + (rows[row_offsets, after] - start_values) * (
+        (bucket_offsets - before) / (after - before)
+    )
+    return matrix
+
+
+def align(
+    series,
+    step: int = None,
+    start: int = None,
+    end: int = None,
+    fill_policy: str = MASK,
+    trim: bool = True,
+):
+    """
+    Snaps many series to one grid.
+    :param series: list of TimeSeries
+    :param step: grid step in nanoseconds, defaults to the coarsest step of the series
+    :param start: first bucket, in epoch nanoseconds. Defaults to the start of the
+                  earliest series.
+    :param end: end of the grid (excluded), in epoch nanoseconds. Defaults to the end of
+                the latest series.
+    :param fill_policy: one of FILL_POLICIES
+    :param trim: Drops the edge buckets that are partly covered, when start or end are
+                 not set. See grid_bounds().
+    :return: tuple of (int64 numpy array of the bucket timestamps, float64 numpy array
+             of shape (series, buckets))
+    """
+    non_empty = [timeseries for timeseries in series if len(timeseries)]
+    steps = [median_step(timeseries.timestamps) for timeseries in non_empty]
+    if step is None:
+        step = max(steps, default=0)
+    if not non_empty or step <= 0:
+        return np.empty(0, dtype=np.int64), np.full((len(series), 0), np.nan)
+    if start is None or end is None:
+        bounds = [
+            grid_bounds(timeseries.timestamps, step, source_step or step, trim=trim)
+            for timeseries, source_step in zip(non_empty, steps)
+        ]
+        start = min(bound[0] for bound in bounds) if start is None else start
+        end = max(bound[1] for bound in bounds) if end is None else end
+    n_buckets = max(0, -(-(end - start) // step))
+    timestamps = start + step * np.arange(n_buckets, dtype=np.int64)
+
+    lengths = [len(timeseries) for timeseries in series]
+    series_offsets = np.repeat(np.arange(len(series)), lengths)
+    buckets = (
+        np.concatenate([timeseries.timestamps for timeseries in series]) - start
+    ) // step
+    values = np.concatenate(
+        [timeseries.values.astype(np.float64, copy=False) for timeseries in series]
+    )
+    keep = (buckets >= 0) & (buckets < n_buckets) & ~np.isnan(values)
+    cells = series_offsets[keep] * n_buckets + buckets[keep]
+    size = len(series) * n_buckets
+    sums = np.bincount(cells, weights=values[keep], minlength=size)
+    counts = np.bincount(cells, minlength=size)
+    matrix = np.full(size, np.nan)
+    np.divide(sums, counts, out=matrix, where=counts > 0)
+    matrix = matrix.reshape(len(series), n_buckets)
+    return timestamps, fill(matrix, fill_policy)
+
+
+def regularize(
+    timeseries: TimeSeries,
+    step: int = None,
+    fill_policy: str = MASK,
+    trim: bool = True,
+    start: int = None,
+    end: int = None,
+) -> TimeSeries:
+    """
+    Snaps a series to a regular grid, see align().
+    :param step: grid step in nanoseconds, defaults to the dominant step of the series
+    :return: TimeSeries with the dtype of the given one, masked buckets are its invalid
+             points
+    """
+    timestamps, matrix = align(
+        [timeseries],
+        step=step,
+        start=start,
+        end=end,
+        fill_policy=fill_policy,
+        trim=trim,
+    )
+    return TimeSeries(timestamps, matrix[0], dtype=timeseries.values.dtype)
@@ -0,0 +1,237 @@
+"""
+Long running scheduler re-training detectors when they are due.
+
+Instead of listing the detectors of every metric on each run to find the few that need
+training, the scheduler keeps a priority queue of metrics ordered by the next time one
+of their detectors is due (last update plus training interval), sleeps until the first
+one and only then looks the metric up and trains its due detectors. A random jitter is
+added to every due time, so detectors trained together (e.g. created by the same build)
+are not all re-trained in the same minute. Config files are reloaded when they change.
+"""
+import calendar
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+import traceback
+
+from .exceptions import AdaptiveAlertingDetectorBuildError
+from .metrics import MetricConfigReader, MetricFactory, MetricWorkSet
+
+LOGGER = logging.getLogger(__name__)
+
+# Seconds between checks of the config files modification times
+RELOAD_SECONDS = 60
+# Maximum random delay added to due times
+JITTER_SECONDS = 300
+# Delay before looking a metric up again when none of its detectors has a training
+# interval, or after an error
+RECHECK_SECONDS = 3600
+# Detector.needs_training only reports a detector a minute after its interval
+NEEDS_TRAINING_MARGIN_SECONDS = 60
+
+
+def detector_due_time(detector):
+    """
+    :return: epoch seconds at which the detector needs training, None if it is never
+             re-trained
+    """
+    training_interval_seconds = detector.training_interval.total_seconds()
+    if training_interval_seconds <= 0:
+        return None
+    if not detector.uuid or not detector.last_updated:
+        return 0.0
+    # last_updated is a naive UTC datetime
+    last_updated = calendar.timegm(detector.last_updated.timetuple())
+    return last_updated + training_interval_seconds + NEEDS_TRAINING_MARGIN_SECONDS
+
+
+class TrainingScheduler:
+    def __init__(
+        self,
+        json_config_files,
+        reload_seconds=RELOAD_SECONDS,
+        jitter_seconds=JITTER_SECONDS,
+        recheck_seconds=RECHECK_SECONDS,
+        metric_factory=None,
+        clock=time.time,
+        rng=None,
+    ):
+        """
+        :param json_config_files: metric config files, reloaded when their modification
+                                  time changes
+        :param clock: Function returning the current epoch time, can be replaced in
+                      tests
+        :param rng: random.Random used for the jitter
+        """
+        self.json_config_files = list(json_config_files)
+        self.reload_seconds = reload_seconds
+        self.jitter_seconds = jitter_seconds
+        self.recheck_seconds = recheck_seconds
+        self._metric_factory = metric_factory or MetricFactory()
+        self._clock = clock
+        self._rng = rng or random.Random()
+        # (due time, sequence, tag key), entries of removed or rescheduled metrics are
+        # skipped when popped
+        self._queue = []
+        self._sequence = itertools.count()
+        # tag key -> (metric config, due time)
+        self._metrics = dict()
+        self._mtimes = None
+        self._next_reload = None
+        self.exit_code = 0
+
+    def _jitter(self):
+        return self._rng.uniform(0, self.jitter_seconds) if self.jitter_seconds else 0.0
+
+    def _schedule(self, tag_key, metric_config, due_time):
+        self._metrics[tag_key] = (metric_config, due_time)
+        heapq.heappush(self._queue, (due_time, next(self._sequence), tag_key))
+
+    def _config_mtimes(self):
+        mtimes = dict()
+        for json_config_file in self.json_config_files:
+            try:
+                mtimes[json_config_file] = os.stat(json_config_file).st_mtime_ns
+            except OSError:
+                mtimes[json_config_file] = None
+        return mtimes
+
+    def reload(self, force=False):
+        """
+        Reads the config files if they changed since the last reload. New metrics are
+        scheduled within the jitter window, metrics removed from the config files are
+        dropped, and changed metrics keep their due time.
+        :return: True if the config files were read
+        """
+        now = self._clock()
+        self._next_reload = now + self.reload_seconds
+        mtimes = self._config_mtimes()
+        if not force and mtimes == self._mtimes:
+            return False
+        metric_work_set = MetricWorkSet(
+            MetricConfigReader(json_config_file)
+            for json_config_file in self.json_config_files
+        )
+        metric_configs = {
+            metric_config.tag_key: metric_config for metric_config in metric_work_set
+        }
+        if metric_work_set.exit_code:
+            LOGGER.error("Config files could not be read, keeping the current schedule")
+            self.exit_code = 1
+            return False
+        self._mtimes = mtimes
+        added = 0
+        for tag_key, metric_config in metric_configs.items():
+            if tag_key in self._metrics:
+                _, due_time = self._metrics[tag_key]
+                self._metrics[tag_key] = (metric_config, due_time)
+            else:
+                self._schedule(tag_key, metric_config, now + self._jitter())
+                added += 1
+        removed = [
+            tag_key for tag_key in self._metrics if tag_key not in metric_configs
+        ]
+        for tag_key in removed:
+            del self._metrics[tag_key]
+        LOGGER.info(
+            f"Scheduling {len(self._metrics)} metric(s), {added} added and "
+            f"{len(removed)} removed"
+        )
+        return True
+
+    def _pop_due(self, now):
+        while self._queue and self._queue[0][0] <= now:
+            due_time, _, tag_key = heapq.heappop(self._queue)
+            scheduled = self._metrics.get(tag_key)
+            if scheduled and scheduled[1] == due_time:
+                return tag_key, scheduled[0]
+        return None
+
+    def next_wakeup(self):
+        """
+        :return: epoch seconds of the next due metric or config reload
+        """
+        while self._queue:
+            due_time, _, tag_key = self._queue[0]
+            scheduled = self._metrics.get(tag_key)
+            if scheduled and scheduled[1] == due_time:
+                return min(due_time, self._next_reload)
+            heapq.heappop(self._queue)
+        return self._next_reload
+
+    def train_metric(self, metric_config):
+        """
+        Trains the due detectors of a metric.
+        :return: epoch seconds at which the metric is due next, without jitter
+        """
+        metric = self._metric_factory.metric(metric_config)
+        next_due_time = None
+        for detector in metric.detectors:
+            if detector.needs_training:
+                detector.train(data=metric.query(), metric_type=metric.config["type"])
+                detector = metric._detector_client.update_detector(detector)
+                LOGGER.info(
+                    f"Trained '{detector.type}' detector with UUID: {detector.uuid}"
+                )
+            due_time = detector_due_time(detector)
+            if due_time is not None and (
+                next_due_time is None or due_time < next_due_time
+            ):
+                next_due_time = due_time
+        return next_due_time
+
+    def run_pending(self, stop_event=None):
+        """
+        Reloads the config files if needed and trains every metric that is due, until
+        stop_event is set.
+        :return: Number of metrics processed
+        """
+        if self._next_reload is None or self._clock() >= self._next_reload:
+            self.reload()
+        processed = 0
+        while stop_event is None or not stop_event.is_set():
+            now = self._clock()
+            due = self._pop_due(now)
+            if due is None:
+                return processed
+            tag_key, metric_config = due
+            processed += 1
+            try:
+                next_due_time = self.train_metric(metric_config)
+            except AdaptiveAlertingDetectorBuildError as e:
+                LOGGER.error(
+                    f"Unable to train detector for metric '{metric_config.name}',  "
+                    f"{e.msg}! Skipping!"
+                )
+                next_due_time = None
+            except Exception as e:
+                LOGGER.exception(
+                    f"Exception {e.__class__.__name__} while training detector(s) for "
+                    f"metric {metric_config.name}! Skipping!"
+                )
+                LOGGER.debug(f"Traceback: {traceback.format_exc()}")
+                next_due_time = None
+            now = self._clock()
+            if next_due_time is None or next_due_time <= now:
+                next_due_time = now + self.recheck_seconds
+            if tag_key in self._metrics:
+                self._schedule(
+                    tag_key, self._metrics[tag_key][0], next_due_time + self._jitter()
+                )
+        return processed
+
+    def run(self, stop_event=None):
+        """
+        Runs until stop_event is set, sleeping until the next due metric or config
+        reload.
+        """
+        stop_event = stop_event or threading.Event()
+        self.reload(force=True)
+        while not stop_event.is_set():
+            self.run_pending(stop_event)
+            stop_event.wait(max(self.next_wakeup() - self._clock(), 0))
+        return self.exit_code
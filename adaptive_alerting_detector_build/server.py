@@ -0,0 +1,186 @@
+"""
+Warm server for the command line interface.
+
+Importing pandas, statsmodels, seasonal and numba, and compiling the numba functions,
+takes several seconds before any work starts. The serve command pays that cost once: it
+warms up, then listens on a Unix socket and forks a child for each command sent by
+adaptive-alerting-client (see client.py). Children inherit the warm interpreter, so a
+command starts in milliseconds.
+
+Protocol, one JSON object per line:
+    client -> server  {"argv": ["train", "metrics.json"], "cwd": "/path/of/the/client",
+                       "env": {"GRAPHITE_URL": ...}}
+    server -> client  {"stream": "stdout" | "stderr", "data": "..."},
+                      then {"exit_code": 0}
+
+Commands run with the settings of the client environment (e.g. MODEL_SERVICE_URL,
+GRAPHITE_URL, SHARD_INDEX, see config.CLIENT_ENVIRONMENT), applied in the forked child
+before the command starts. Settings are read from the environment when accessed, see
+config.py.
+
+The socket is only accessible to the user: its directory is created owner-only if
+missing, and the server refuses a directory or an existing socket that belongs to
+another user.
+"""
+import io
+import json
+import logging
+import os
+import signal
+import socketserver
+import sys
+import traceback
+
+from . import config
+from .client import check_owned_by_user
+
+LOGGER = logging.getLogger(__name__)
+
+SERVED_COMMANDS = ("build", "train", "disable", "diff", "apply", "profile")
+
+# Same format as logging.basicConfig()
+LOG_FORMAT = "%(levelname)s:%(name)s:%(message)s"
+
+
+def warm_up_process():
+    """
+    Imports the heavy dependencies and trains a detector on synthetic data, compiling
+    its numba functions.
+    """
+    import numpy as np
+    import pandas as pd
+    from .detectors import build_detector
+    from .profile import metric_profiler, seasonal_metric_profiler  # noqa: F401
+    from .utils.jit import compile_kernels
+
+    compile_kernels()
+
+    data = pd.DataFrame(
+        {"value": 10 + np.sin(np.arange(1440) / 60.0)},
+        index=pd.date_range("2020-01-01", periods=1440, freq="T"),
+    )
+    for strategy in ("sigma", "quartile", "highwatermark"):
+        detector = build_detector(
+            "constant-detector", {"hyperparams": {"strategy": strategy}}
+        )
+        detector.train(data=data, metric_type="REQUEST_COUNT")
+
+
+class _SocketStream(io.TextIOBase):
+    """Text stream forwarding writes to the client."""
+
+    def __init__(self, wfile, stream):
+        self._wfile = wfile
+        self._stream = stream
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if data:
+            _send(self._wfile, {"stream": self._stream, "data": data})
+        return len(data)
+
+
+def _send(wfile, message):
+    wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+    wfile.flush()
+
+
+class CommandHandler(socketserver.StreamRequestHandler):
+    """Runs one command in the forked child, forwarding stdout, stderr and logs."""
+
+    def handle(self):
+        from .cli import main
+
+        try:
+            request = json.loads(self.rfile.readline())
+            argv = [str(arg) for arg in request["argv"]]
+            env = {
+                str(name): str(value)
+                for name, value in request.get("env", {}).items()
+                if config.is_client_environment(str(name))
+            }
+            os.chdir(request.get("cwd") or "/")
+        except Exception as e:
+            _send(self.wfile, {"stream": "stderr", "data": f"Invalid request, {e}\n"})
+            _send(self.wfile, {"exit_code": 2})
+            return
+        # Only changes the environment of the forked child, settings not set by the
+        # client are not inherited
+        for name in [name for name in os.environ if config.is_client_environment(name)]:
+            del os.environ[name]
+        os.environ.update(env)
+        sys.stdout = _SocketStream(self.wfile, "stdout")
+        sys.stderr = _SocketStream(self.wfile, "stderr")
+        root_logger = logging.getLogger()
+        for handler in list(root_logger.handlers):
+            root_logger.removeHandler(handler)
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root_logger.addHandler(handler)
+        if not argv or argv[0] not in SERVED_COMMANDS:
+            sys.stderr.write(
+                f"Unsupported command, expecting one of: {', '.join(SERVED_COMMANDS)}\n"
+            )
+            exit_code = 2
+        else:
+            try:
+                exit_code = main(argv)
+            except SystemExit as e:
+                # docopt exits after printing the help, or with the usage as code for
+                # usage errors
+                if e.code is None or isinstance(e.code, int):
+                    exit_code = e.code or 0
+                else:
+                    sys.stderr.write(f"{e.code}\n")
+                    exit_code = 1
+            except Exception:
+                sys.stderr.write(traceback.format_exc())
+                exit_code = 1
+        _send(self.wfile, {"exit_code": exit_code})
+
+
+class CommandServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    pass
+
+
+def serve(socket_path=None, warm_up=True):
+    """
+    Serves commands until interrupted.
+    :return: exit code
+    """
+    socket_path = socket_path or config.SERVER_SOCKET
+    socket_directory = os.path.dirname(os.path.abspath(socket_path))
+    os.makedirs(socket_directory, mode=0o700, exist_ok=True)
+    try:
+        check_owned_by_user(socket_directory, directory=True)
+        if os.path.lexists(socket_path):
+            check_owned_by_user(socket_path)
+            os.unlink(socket_path)
+    except PermissionError as e:
+        LOGGER.error(f"Can not serve on {socket_path}, {e}")
+        return 1
+    if warm_up:
+        LOGGER.info("Warming up")
+        try:
+            warm_up_process()
+        except Exception as e:
+            LOGGER.warning(f"Warm up failed, {e.__class__.__name__}: {e}")
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    # The socket is created readable and writable by the owner only, it is never open to
+    # other users
+    previous_umask = os.umask(0o077)
+    try:
+        server = CommandServer(socket_path, CommandHandler)
+    finally:
+        os.umask(previous_umask)
+    with server:
+        LOGGER.info(f"Serving on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
+    return 0
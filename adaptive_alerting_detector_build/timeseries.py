@@ -0,0 +1,173 @@
+"""
+Compact container for a single metric series.
+
+Datasources used to return a DataFrame with a DatetimeIndex and one 'value' column, that
+detectors and profilers immediately converted back to numpy arrays (dropna, squeeze,
+np.array...). A TimeSeries holds the arrays directly:
+
+    timestamps  int64 epoch nanoseconds, the same representation as a DatetimeIndex
+                (see DatetimeIndex.asi8)
+    values      float64 values, or float32 to halve the memory of large batches.
+                Missing points are NaN.
+    validity    optional packed bitmask of the points that are not missing, None when
+                all points are valid
+
+Conversions from and to pandas reuse the arrays without copying them where pandas allows
+it.
+"""
+import numpy as np
+
+NANOSECONDS = 10 ** 9
+
+
+class TimeSeries:
+    __slots__ = ("timestamps", "values", "_validity")
+
+    def __init__(self, timestamps, values, valid=None, dtype=np.float64):
+        """
+        :param timestamps: int64 epoch nanoseconds, sorted
+        :param values: values, converted to dtype
+        :param valid: optional boolean array of the valid points, computed from the NaN
+                      values if not set
+        :param dtype: np.float64 or np.float32
+        """
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.values = np.asarray(values, dtype=dtype)
+        if self.timestamps.shape != self.values.shape or self.values.ndim != 1:
+            raise ValueError(
+                "timestamps and values must be one dimensional arrays of the same "
+                "length"
+            )
+        if valid is None:
+            valid = ~np.isnan(self.values)
+        else:
+            valid = np.asarray(valid, dtype=bool)
+            # Invalid points are NaN, so they stay missing once converted to pandas
+            if not valid.all():
+                self.values = self.values.copy()
+                self.values[~valid] = np.nan
+        self._validity = None if valid.all() else np.packbits(valid)
+
+    @classmethod
+    def from_epoch_seconds(cls, timestamps, values, dtype=np.float64):
+        return cls(
+            np.asarray(timestamps, dtype=np.int64) * NANOSECONDS, values, dtype=dtype
+        )
+
+    @classmethod
+    def from_datapoints(cls, datapoints, dtype=np.float64):
+        """
+        :param datapoints: list of [value, epoch seconds] as returned by the Graphite
+                           render API, value may be None
+        """
+        if not datapoints:
+            return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=dtype))
+        values, timestamps = zip(*datapoints)
+        # None values become NaN
+        return cls.from_epoch_seconds(
+            timestamps, np.array(values, dtype=np.float64), dtype=dtype
+        )
+
+    @classmethod
+    def from_frame(cls, df, column="value", dtype=np.float64):
+        """
+        :param df: DataFrame with a DatetimeIndex, or Series
+        """
+        values = df if df.ndim == 1 else df[column]
+        return cls(df.index.asi8, values.to_numpy(dtype=dtype), dtype=dtype)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return (
+            f"TimeSeries(points={len(self)}, valid={self.valid_count}, "
+            f"dtype={self.values.dtype})"
+        )
+
+    @property
+    def valid(self):
+        """
+        :return: boolean array of the points that are not missing
+        """
+        if self._validity is None:
+            return np.ones(len(self), dtype=bool)
+        return np.unpackbits(self._validity, count=len(self)).astype(bool)
+
+    @property
+    def valid_count(self):
+        if self._validity is None:
+            return len(self)
+        return int(np.count_nonzero(self.valid))
+
+    @property
+    def has_gaps(self):
+        return self._validity is not None
+
+    def valid_values(self):
+        """
+        :return: values of the points that are not missing, the values array itself if
+                 none is missing
+        """
+        if self._validity is None:
+            return self.values
+        return self.values[self.valid]
+
+    def dropna(self):
+        if self._validity is None:
+            return self
+        valid = self.valid
+        return TimeSeries(
+            self.timestamps[valid], self.values[valid], dtype=self.values.dtype
+        )
+
+    def astype(self, dtype):
+        if self.values.dtype == dtype:
+            return self
+        return TimeSeries(self.timestamps, self.values, valid=self.valid, dtype=dtype)
+
+    def index(self):
+        import pandas as pd
+
+        return pd.DatetimeIndex(self.timestamps)
+
+    def to_series(self):
+        import pandas as pd
+
+        return pd.Series(self.values, index=self.index(), name="value", copy=False)
+
+    def to_frame(self):
+        """
+        :return: DataFrame with a DatetimeIndex and a 'value' column, as returned by the
+                 datasources
+        """
+        import pandas as pd
+
+        return pd.DataFrame(
+            self.values.reshape(-1, 1),
+            index=self.index(),
+            columns=["value"],
+            copy=False,
+        )
+
+
+def as_timeseries(data):
+    """
+    :param data: TimeSeries, DataFrame with a DatetimeIndex and a 'value' (or single)
+                 column, or Series
+    """
+    if isinstance(data, TimeSeries):
+        return data
+    if data.ndim == 2 and "value" not in data.columns:
+        data = data.iloc[:, 0]
+    return TimeSeries.from_frame(data)
+
+
+def as_frame(data):
+    """
+    :param data: TimeSeries or DataFrame
+    :return: DataFrame, data itself if it is not a TimeSeries
+    """
+    if isinstance(data, TimeSeries):
+        return data.to_frame()
+    return data
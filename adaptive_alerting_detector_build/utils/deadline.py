@@ -0,0 +1,76 @@
+"""
+Deadline of a run, see train --deadline.
+
+While a deadline is active, request_timeout() bounds the timeout of the model service
+and datasource requests by the time left, so a request in flight when the deadline is
+reached times out instead of overrunning it.
+"""
+import re
+import time
+from contextlib import contextmanager
+
+_DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+_active_deadline = None
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of sending a request once the active deadline is reached."""
+
+
+def parse_duration(duration):
+    """
+    :param duration: seconds, or a combination of numbers followed by d, h, m or s, e.g.
+                     "45m" or "1h30m"
+    :return: number of seconds
+    """
+    duration = str(duration).strip().lower()
+    if re.fullmatch(r"\d+(\.\d+)?", duration):
+        return float(duration)
+    parts = re.findall(r"(\d+(?:\.\d+)?)([dhms])", duration)
+    if not parts or "".join(number + unit for number, unit in parts) != duration:
+        raise ValueError(
+            f"Invalid duration '{duration}', expected e.g. 3600, 45m or 1h30m"
+        )
+    return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+
+
+class Deadline:
+    def __init__(self, seconds, clock=time.monotonic):
+        self.seconds = seconds
+        self._clock = clock
+        self._end = clock() + seconds
+
+    def remaining(self):
+        return max(0.0, self._end - self._clock())
+
+    @property
+    def expired(self):
+        return self._clock() >= self._end
+
+    @contextmanager
+    def activate(self):
+        """
+        Makes this deadline bound the request timeouts of the process, see
+        request_timeout().
+        """
+        global _active_deadline
+        previous_deadline = _active_deadline
+        _active_deadline = self
+        try:
+            yield self
+        finally:
+            _active_deadline = previous_deadline
+
+
+def request_timeout(timeout):
+    """
+    :param timeout: default timeout of the request, in seconds
+    :return: timeout, or the time left before the active deadline if it is shorter
+    """
+    if _active_deadline is None:
+        return timeout
+    remaining = _active_deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceeded("Deadline reached, request not sent")
+    return min(timeout, remaining)
@@ -0,0 +1,102 @@
+"""
+Fast construction of related models from parsed JSON.
+
+related.to_model() runs every field through its attrs converter and validator, which
+dominates the time spent loading large configuration files. Models registered here get a
+builder compiled from their attrs fields, which checks the expected types in a single
+pass and sets the attributes directly. Anything a builder does not handle (unexpected
+types, missing required fields, unknown enum values...) falls back to
+related.to_model(), so results and error messages are the same as before.
+"""
+from enum import Enum
+
+import attr
+from attr import NOTHING, Factory
+import related
+
+_EXACT, _ENUM, _MODEL, _CONVERT = range(4)
+
+_BUILDERS = dict()
+
+
+class _Unhandled(Exception):
+    """Raised by a builder for values it does not handle."""
+
+
+def register(cls, field_types):
+    """
+    Compiles and registers a builder for a related model.
+    :param cls: related model class
+    :param field_types: dict of attribute name to the expected value, either: - float,
+                        values are converted with float() as related.FloatField does -
+                        any other type, values must be exactly of that type (or None for
+                        optional fields) - an Enum class, values are looked up by enum
+                        value - a registered related model class, values are built with
+                        its builder - a function converting the raw value, it is also
+                        applied to defaults
+    """
+    fields = list()
+    for attribute in attr.fields(cls):
+        key = attribute.metadata.get("key") or attribute.name
+        field_type = field_types[attribute.name]
+        if isinstance(field_type, type) and issubclass(field_type, Enum):
+            kind, arg = _ENUM, field_type._value2member_map_
+        elif isinstance(field_type, type) and field_type in _BUILDERS:
+            kind, arg = _MODEL, _BUILDERS[field_type]
+        elif isinstance(field_type, type) and field_type is not float:
+            kind, arg = _EXACT, field_type
+        else:
+            kind, arg = _CONVERT, field_type
+        fields.append((attribute.name, key, kind, arg, attribute.default))
+    _BUILDERS[cls] = _compile_builder(cls, fields)
+
+
+def _compile_builder(cls, fields):
+    def build(raw):
+        if type(raw) is not dict:
+            raise _Unhandled()
+        instance = object.__new__(cls)
+        for name, key, kind, arg, default in fields:
+            value = raw.get(key, NOTHING)
+            if value is None:
+                # Only optional fields accept None, related validates the others
+                if default is not None:
+                    raise _Unhandled()
+            elif value is NOTHING:
+                if default is NOTHING:
+                    raise _Unhandled()
+                value = default.factory() if isinstance(default, Factory) else default
+                if kind == _CONVERT and value is not None:
+                    value = arg(value)
+            elif kind == _EXACT:
+                if type(value) is not arg:
+                    raise _Unhandled()
+            elif kind == _ENUM:
+                if type(value) is not str or value not in arg:
+                    raise _Unhandled()
+                value = arg[value]
+            elif kind == _MODEL:
+                value = arg(value)
+            else:
+                try:
+                    value = arg(value)
+                except Exception:
+                    raise _Unhandled()
+            object.__setattr__(instance, name, value)
+        return instance
+
+    return build
+
+
+def to_model(cls, raw):
+    """
+    Drop-in replacement for related.to_model() that uses the compiled builder of
+    registered models.
+    """
+    builder = _BUILDERS.get(cls)
+    if builder is not None:
+        try:
+            return builder(raw)
+        except _Unhandled:
+            pass
+    return related.to_model(cls, raw)
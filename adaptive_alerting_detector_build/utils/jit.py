@@ -0,0 +1,112 @@
+"""
+Numba compilation deferred to the first call.
+
+Importing numba takes about a second, which commands that never train a detector (diff,
+disable...) should not pay. Functions decorated with lazy_jit are plain Python functions
+until they are first called, or compiled by compile_kernels(), at which point numba is
+imported and the function compiled with the given options.
+
+Kernels declared with a signature and cache=True are compiled once for that signature
+and saved in the numba cache directory (config.NUMBA_CACHE_DIR), so other processes load
+the machine code instead of compiling it again.
+"""
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+
+from adaptive_alerting_detector_build import config
+
+LOGGER = logging.getLogger(__name__)
+
+# Kernels declared with lazy_jit, in declaration order
+KERNELS = []
+
+
+def _jit():
+    """
+    Imports numba, with its cache directory set from the config if numba was not
+    imported yet.
+    """
+    cache_dir = config.NUMBA_CACHE_DIR
+    if cache_dir and "numba" not in sys.modules:
+        os.environ.setdefault("NUMBA_CACHE_DIR", cache_dir)
+    from numba import jit
+
+    return jit
+
+
+class LazyKernel:
+    def __init__(self, function, signature, jit_options):
+        functools.update_wrapper(self, function)
+        self.py_func = function
+        self.signature = signature
+        self.jit_options = jit_options
+        self._compiled = None
+        self._lock = threading.Lock()
+
+    def compile(self):
+        """
+        Compiles the kernel, or loads it from the cache, if it was not done yet.
+        :return: numba dispatcher
+        """
+        with self._lock:
+            if self._compiled is None:
+                jit = _jit()
+                if self.signature is None:
+                    self._compiled = jit(**self.jit_options)(self.py_func)
+                else:
+                    self._compiled = jit(self.signature, **self.jit_options)(
+                        self.py_func
+                    )
+            return self._compiled
+
+    def __call__(self, *args, **kwargs):
+        compiled = self._compiled or self.compile()
+        return compiled(*args, **kwargs)
+
+
+def lazy_jit(signature=None, **jit_options):
+    """
+    Same as numba.jit(signature, **jit_options), with numba imported and the function
+    compiled on the first call. With a signature, arguments are converted to it and no
+    other specialization is compiled.
+    """
+
+    def decorator(function):
+        kernel = LazyKernel(function, signature, jit_options)
+        KERNELS.append(kernel)
+        return kernel
+
+    return decorator
+
+
+def compile_kernels(kernels=None):
+    """
+    Compiles the kernels, or loads them from the cache.
+    :return: seconds spent
+    """
+    start = time.monotonic()
+    for kernel in KERNELS if kernels is None else kernels:
+        kernel.compile()
+    return time.monotonic() - start
+
+
+def warm_up_kernels(kernels=None):
+    """
+    Compiles the kernels in a background thread, so they are ready by the time the first
+    metric is trained. A kernel called before its compilation completes waits for it.
+    :return: the started thread
+    """
+
+    def warm_up():
+        try:
+            LOGGER.debug(f"Kernels compiled in {compile_kernels(kernels):.3f}s")
+        except Exception as e:
+            LOGGER.warning(f"Unable to compile kernels, {e.__class__.__name__}: {e}")
+
+    thread = threading.Thread(target=warm_up, name="kernel-warm-up", daemon=True)
+    thread.start()
+    return thread
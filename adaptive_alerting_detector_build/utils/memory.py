@@ -0,0 +1,87 @@
+"""
+Resident memory of the current process, see metrics/chunked.py.
+"""
+import ctypes
+import ctypes.util
+import gc
+import os
+import re
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+_libc = None
+
+
+def parse_size(size):
+    """
+    :param size: number of bytes, optionally followed by a K, M, G or T binary unit,
+                 e.g. "512M" or "2G"
+    :return: number of bytes
+    """
+    match = re.fullmatch(
+        r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", str(size), re.IGNORECASE
+    )
+    if not match:
+        raise ValueError(
+            f"Invalid size '{size}', expected a number of bytes optionally followed by "
+            "K, M, G or T"
+        )
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+def format_size(size):
+    unit = "B"
+    for larger_unit in ("KiB", "MiB", "GiB", "TiB"):
+        if size < 1024:
+            break
+        size /= 1024
+        unit = larger_unit
+    return f"{size:.1f} {unit}"
+
+
+def current_rss():
+    """
+    :return: Resident set size of the process in bytes, read from /proc/self/statm, or
+             None if it is not available
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def peak_rss():
+    """
+    :return: Peak resident set size of the process in bytes, or None if it is not
+             available
+    """
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def release_memory():
+    """
+    Collects garbage and, with glibc, returns the freed heap pages to the system so the
+    resident size goes down.
+    """
+    global _libc
+    gc.collect()
+    if _libc is None:
+        library = ctypes.util.find_library("c")
+        try:
+            _libc = ctypes.CDLL(library) if library else False
+        except OSError:
+            _libc = False
+    if _libc and hasattr(_libc, "malloc_trim"):
+        _libc.malloc_trim(0)
@@ -0,0 +1,250 @@
+"""
+Client-side rate limiting and concurrency control of the requests sent to each backend
+(Graphite, model service).
+
+Each endpoint (scheme, host and port) has one EndpointLimiter, shared by all the threads
+of the process, see limiter_for(). A request first waits for a token of a token bucket,
+bounding the requests per second, then for one of the concurrency slots. Both limits are
+adjusted with AIMD (additive increase, multiplicative decrease):
+
+    - a 429 or 5xx response, a connection error or timeout, or a smoothed latency
+      rising well above the lowest one seen halves the rate and the concurrency, at
+      most once per DECREASE_INTERVAL so a burst of errors caused by the same overload
+      counts once
+    - any other response increases the concurrency by 1 / concurrency and the rate by
+      1 / rate, i.e. each limit grows by about one per round of requests while the
+      backend is healthy
+
+The current limits of every endpoint are returned by limiter_stats() and logged at the
+end of a run.
+"""
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+from adaptive_alerting_detector_build import config
+
+LOGGER = logging.getLogger(__name__)
+
+INITIAL_RATE = 20.0
+MIN_RATE = 1.0
+INITIAL_CONCURRENCY = 4.0
+MIN_CONCURRENCY = 1.0
+DECREASE_FACTOR = 0.5
+DECREASE_INTERVAL = 1.0
+# Smoothed latency, relative to the lowest smoothed latency seen, above which the
+# backend is considered overloaded
+LATENCY_TOLERANCE = 2.0
+LATENCY_SMOOTHING = 0.2
+
+
+class TokenBucket:
+    def __init__(self, rate, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param rate: tokens per second, the bucket holds at most one second of tokens
+        """
+        self.rate = rate
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = 1.0
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(
+            max(1.0, self.rate), self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def acquire(self):
+        """
+        Waits for a token.
+        :return: seconds waited
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return waited
+                wait = (1.0 - self._tokens) / self.rate
+            self._sleep(wait)
+            waited += wait
+
+
+class EndpointLimiter:
+    def __init__(
+        self,
+        endpoint,
+        max_rate=None,
+        max_concurrency=None,
+        clock=time.monotonic,
+        sleep=time.sleep,
+    ):
+        self.endpoint = endpoint
+        self.max_rate = max_rate or config.RATE_LIMIT_MAX_RATE
+        self.max_concurrency = max_concurrency or config.RATE_LIMIT_MAX_CONCURRENCY
+        self._clock = clock
+        self._bucket = TokenBucket(
+            min(INITIAL_RATE, self.max_rate), clock=clock, sleep=sleep
+        )
+        self.concurrency = min(INITIAL_CONCURRENCY, self.max_concurrency)
+        self.in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.waited_seconds = 0.0
+        self._latency = None
+        self._min_latency = None
+        self._last_decrease = None
+        self._condition = threading.Condition()
+
+    @property
+    def rate(self):
+        return self._bucket.rate
+
+    def _acquire_slot(self):
+        start = self._clock()
+        with self._condition:
+            while self.in_flight >= int(self.concurrency):
+                self._condition.wait()
+            self.in_flight += 1
+        return self._clock() - start
+
+    def _release_slot(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def _decrease(self, reason):
+        now = self._clock()
+        if (
+            self._last_decrease is not None
+            and now - self._last_decrease < DECREASE_INTERVAL
+        ):
+            return
+        self._last_decrease = now
+        self.throttled += 1
+        self._bucket.rate = max(MIN_RATE, self._bucket.rate * DECREASE_FACTOR)
+        self.concurrency = max(MIN_CONCURRENCY, self.concurrency * DECREASE_FACTOR)
+        LOGGER.debug(
+            f"Backing off from {self.endpoint} ({reason}): {self.rate:.1f} requests/s, "
+            f"{int(self.concurrency)} concurrent request(s)"
+        )
+
+    def _increase(self):
+        self._bucket.rate = min(
+            self.max_rate, self._bucket.rate + 1.0 / self._bucket.rate
+        )
+        self.concurrency = min(
+            self.max_concurrency, self.concurrency + 1.0 / self.concurrency
+        )
+
+    def record(self, status_code, latency):
+        """
+        Adjusts the limits after a response.
+        :param status_code: HTTP status code, None if the request failed without a
+                            response
+        :param latency: seconds
+        """
+        with self._condition:
+            self.requests += 1
+            if status_code is None:
+                self._decrease("no response")
+                return
+            if status_code == 429 or status_code >= 500:
+                self._decrease(f"status {status_code}")
+                return
+            self._latency = (
+                latency
+                if self._latency is None
+                else (self._latency + LATENCY_SMOOTHING * (latency - self._latency))
+            )
+            if self._min_latency is None or self._latency < self._min_latency:
+                self._min_latency = self._latency
+            if self._latency > LATENCY_TOLERANCE * self._min_latency > 0:
+                self._decrease(f"latency {self._latency:.3f}s")
+                # Adapts to a lasting change of the response time, instead of
+                # backing off indefinitely
+                self._min_latency = self._latency / LATENCY_TOLERANCE
+                return
+            self._increase()
+            # Wakes up a waiting request if the concurrency went up
+            self._condition.notify()
+
+    def call(self, send):
+        """
+        Sends a request within the limits.
+        :param send: function sending the request and returning its response
+        :return: the response
+        """
+        waited = self._bucket.acquire()
+        waited += self._acquire_slot()
+        with self._condition:
+            self.waited_seconds += waited
+        start = self._clock()
+        try:
+            response = send()
+        except OSError:
+            # requests exceptions (timeouts, connection errors...) are OSError
+            self.record(None, self._clock() - start)
+            raise
+        finally:
+            self._release_slot()
+        self.record(response.status_code, self._clock() - start)
+        return response
+
+    def stats(self):
+        return {
+            "rate": round(self.rate, 3),
+            "concurrency": int(self.concurrency),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "waited_seconds": round(self.waited_seconds, 3),
+        }
+
+
+_limiters = dict()
+_limiters_lock = threading.Lock()
+
+
+def endpoint(url):
+    """
+    :return: scheme, host and port of the url, e.g. 'http://graphite:8080'
+    """
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def limiter_for(url):
+    """
+    :return: the EndpointLimiter of the url's endpoint, shared by the whole process
+    """
+    key = endpoint(url)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = EndpointLimiter(key)
+        return limiter
+
+
+def limiter_stats():
+    """
+    :return: dict of endpoint to the current limits and counters of its limiter
+    """
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.endpoint: limiter.stats() for limiter in limiters}
+
+
+def log_limiter_stats():
+    for limiter_endpoint, stats in limiter_stats().items():
+        LOGGER.info(
+            f"{limiter_endpoint}: {stats['requests']} request(s), {stats['throttled']} "
+            "back-off(s), "
+            f"{stats['waited_seconds']}s waited, limits {stats['rate']} requests/s and "
+            f"{stats['concurrency']} concurrent request(s)"
+        )
@@ -0,0 +1,134 @@
+"""
+Transfer of metric series to pool processes.
+
+A series is sent as its int64 epoch nanosecond timestamps and float64 values. On Python
+3.8+ they are copied once into a multiprocessing.shared_memory block and only the block
+name is pickled; the pool process copies the arrays out of the block. On older versions,
+the two arrays are pickled, which is still much smaller and faster than pickling a
+DataFrame.
+
+The process sharing a series releases it once the pool process is done with it.
+"""
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:  # Python < 3.8
+    shared_memory = None
+
+
+class PickledSeries:
+    def __init__(self, timestamps, values):
+        self._timestamps = timestamps
+        self._values = values
+
+    def __len__(self):
+        return len(self._values)
+
+    def arrays(self):
+        """
+        :return: (timestamps, values) numpy arrays
+        """
+        return self._timestamps, self._values
+
+    def release(self):
+        pass
+
+
+class SharedSeries:
+    """Series stored in a shared memory block, timestamps first then values."""
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self._block = None
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def create(cls, timestamps, values):
+        size = len(values)
+        block = shared_memory.SharedMemory(create=True, size=16 * size)
+        np.ndarray(size, dtype=np.int64, buffer=block.buf)[:] = timestamps
+        np.ndarray(size, dtype=np.float64, buffer=block.buf, offset=8 * size)[
+            :
+        ] = values
+        shared_series = cls(block.name, size)
+        shared_series._block = block
+        return shared_series
+
+    def __getstate__(self):
+        return {"name": self.name, "size": self.size, "_block": None}
+
+    def arrays(self):
+        """
+        Copies the series out of the shared memory block.
+        :return: (timestamps, values) numpy arrays
+        """
+        block = shared_memory.SharedMemory(name=self.name)
+        try:
+            timestamps = np.ndarray(self.size, dtype=np.int64, buffer=block.buf).copy()
+            values = np.ndarray(
+                self.size, dtype=np.float64, buffer=block.buf, offset=8 * self.size
+            ).copy()
+        finally:
+            block.close()
+        return timestamps, values
+
+    def release(self):
+        """
+        Frees the shared memory block, in the process that created it.
+        """
+        if self._block is not None:
+            self._block.close()
+            self._block.unlink()
+            self._block = None
+
+
+def share_series(timestamps, values):
+    """
+    :param timestamps: int64 numpy array of epoch nanoseconds
+    :param values: float64 numpy array
+    :return: SharedSeries, or PickledSeries if shared memory is not available or the
+             series is empty
+    """
+    if shared_memory is None or not len(values):
+        return PickledSeries(
+            np.asarray(timestamps, dtype=np.int64), np.asarray(values, dtype=np.float64)
+        )
+    return SharedSeries.create(timestamps, values)
+
+
+def share_frame(df):
+    """
+    :param df: DataFrame with a DatetimeIndex and a 'value' column, as returned by the
+               datasources
+    """
+    return share_series(df.index.asi8, df["value"].to_numpy(dtype=np.float64))
+
+
+def share_timeseries(timeseries):
+    """
+    :param timeseries: TimeSeries, missing points are transferred as NaN values
+    """
+    return share_series(timeseries.timestamps, timeseries.values)
+
+
+def to_timeseries(series):
+    """
+    Rebuilds the TimeSeries of a shared series, in the pool process.
+    """
+    from adaptive_alerting_detector_build.timeseries import TimeSeries
+
+    return TimeSeries(*series.arrays())
+
+
+def to_frame(series):
+    """
+    Rebuilds the DataFrame of a shared series, in the pool process.
+    """
+    import pandas as pd
+
+    timestamps, values = series.arrays()
+    return pd.DataFrame({"value": values}, index=pd.DatetimeIndex(timestamps))
@@ -43,7 +43,8 @@ setup(
     classifiers=["Programming Language :: Python :: 3",],
     entry_points={
         "console_scripts": [
-            "adaptive-alerting=adaptive_alerting_detector_build.cli:console_script_entrypoint"
+            "adaptive-alerting=adaptive_alerting_detector_build.cli:console_script_entrypoint",
+            "adaptive-alerting-client=adaptive_alerting_detector_build.client:console_script_entrypoint",
         ],
     },
 )
@@ -0,0 +1,71 @@
+"""
+Compares related.to_model() with the compiled builders of fast_model, for metric configs
+and detector payloads.
+
+    $ pipenv run python -m tests.benchmarks.config_parsing [number of entries]
+"""
+import json
+import sys
+import time
+
+import related
+
+from adaptive_alerting_detector_build.detectors import Detector
+from adaptive_alerting_detector_build.detectors.constant_threshold import (
+    ConstantThresholdConfig,
+)
+from adaptive_alerting_detector_build.metrics import MetricConfig
+from adaptive_alerting_detector_build.utils import fast_model
+
+
+def metric_configs(count):
+    with open("./tests/data/metric-config.json") as json_file:
+        templates = json.load(json_file)
+    for i in range(count):
+        raw_metric_config = dict(templates[i % len(templates)])
+        raw_metric_config["tags"] = dict(raw_metric_config["tags"], instance=str(i))
+        yield raw_metric_config
+
+
+def detectors(count):
+    with open("./tests/data/detectors-mock.json") as json_file:
+        templates = json.load(json_file)
+    for i in range(count):
+        yield templates[i % len(templates)]
+
+
+def build_detectors(to_model, raw_detectors):
+    for raw_detector in raw_detectors:
+        base_detector = to_model(Detector, raw_detector)
+        to_model(ConstantThresholdConfig, base_detector.config)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main(count):
+    raw_metric_configs = list(metric_configs(count))
+    raw_detectors = list(detectors(count))
+    related_time, related_results = timed(
+        lambda: [related.to_model(MetricConfig, c) for c in raw_metric_configs]
+    )
+    fast_time, fast_results = timed(
+        lambda: [fast_model.to_model(MetricConfig, c) for c in raw_metric_configs]
+    )
+    print(f"MetricConfig x {count}")
+    print(f"  related:    {related_time:8.3f}s")
+    print(f"  fast_model: {fast_time:8.3f}s ({related_time / fast_time:.1f}x)")
+    print(f"  identical:  {related_results == fast_results}")
+
+    related_time, _ = timed(lambda: build_detectors(related.to_model, raw_detectors))
+    fast_time, _ = timed(lambda: build_detectors(fast_model.to_model, raw_detectors))
+    print(f"Detector x {count} (base detector and detector config)")
+    print(f"  related:    {related_time:8.3f}s")
+    print(f"  fast_model: {fast_time:8.3f}s ({related_time / fast_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,89 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from adaptive_alerting_detector_build.profile.metric_profiler import build_profile
+from adaptive_alerting_detector_build.profile.seasonal_metric_profiler import (
+    build_seasonal_profile,
+)
+from tests.csv_helper import read_timeseries_csv
+
+REFERENCE_DATASETS = [
+    ("daily-total-female-births", "tests/data/daily-total-female-births.csv", None),
+    (
+        "international-airline-passengers",
+        "tests/data/international-airline-passengers.csv",
+        None,
+    ),
+    ("goog200", "tests/data/goog200.csv", "1d"),
+    ("diff_goog200", "tests/data/diff_goog200.csv", "1d"),
+    ("candy_production", "tests/data/candy_production.csv", None),
+]
+
+
+def synthetic_datasets(days=7, seed=42):
+    random = np.random.RandomState(seed)
+    for name, freq, per_day in [("1min", "1T", 24 * 60), ("10s", "10S", 6 * 24 * 60)]:
+        index = pd.date_range("2020-01-01", periods=days * per_day, freq=freq)
+        daily = 10 * np.sin(np.arange(len(index)) * 2 * np.pi / per_day)
+        noise = random.normal(0, 1, len(index))
+        yield f"{name} seasonal", pd.DataFrame(
+            daily + noise, index=index, columns=["value"]
+        ), None
+        yield f"{name} random walk", pd.DataFrame(
+            np.cumsum(noise), index=index, columns=["value"]
+        ), None
+
+
+def reference_datasets():
+    for name, csv_file, freq in REFERENCE_DATASETS:
+        df = read_timeseries_csv(csv_file)
+        df.columns = ["value"]
+        yield name, df, freq
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def profile(df, freq, downsample):
+    stationary, stationarity_time = timed(
+        build_profile, df, freq=freq, downsample=downsample
+    )
+    seasonal, seasonality_time = timed(
+        build_seasonal_profile, df, freq=freq, downsample=downsample
+    )
+    return {**stationary, **seasonal}, stationarity_time + seasonality_time
+
+
+def main():
+    rows = []
+    for datasets in (reference_datasets(), synthetic_datasets()):
+        for name, df, freq in datasets:
+            full, full_time = profile(df, freq, None)
+            for method in ("mean", "lttb"):
+                reduced, reduced_time = profile(df, freq, method)
+                rows.append(
+                    {
+                        "dataset": name,
+                        "points": len(df),
+                        "method": method,
+                        "full (s)": round(full_time, 3),
+                        "downsampled (s)": round(reduced_time, 3),
+                        "speedup": round(full_time / reduced_time, 1),
+                        "full profile": full,
+                        "downsampled profile": reduced,
+                        "agree": full == reduced,
+                    }
+                )
+    report = pd.DataFrame(rows)
+    with pd.option_context("display.max_columns", None, "display.width", 200):
+        print(report)
+    print(f"\nVerdicts agree for {report['agree'].sum()}/{len(report)} runs")
+
+
+if __name__ == "__main__":
+    main()
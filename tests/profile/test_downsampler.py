@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import adaptive_alerting_detector_build.profile.downsampler as subject
+from adaptive_alerting_detector_build.profile.metric_profiler import build_profile
+from adaptive_alerting_detector_build.profile.seasonal_metric_profiler import (
+    build_seasonal_profile,
+)
+from tests.csv_helper import read_timeseries_csv
+
+
+def test_downsample_factor():
+    assert 1 == subject.downsample_factor(24)
+    assert 1 == subject.downsample_factor(288)
+    assert 5 == subject.downsample_factor(60 * 24)
+    assert 30 == subject.downsample_factor(6 * 60 * 24)
+    assert 15 == subject.downsample_factor(60 * 24, tests=("seasonality",))
+    assert 5 == subject.downsample_factor(
+        60 * 24, tests=("stationarity", "seasonality")
+    )
+
+
+def test_block_mean_ignores_nan_and_drops_partial_block():
+    values = np.array([1.0, 3.0, np.nan, 5.0, np.nan, np.nan, 7.0])
+    np.testing.assert_array_equal(subject.block_mean(values, 2), [2.0, 5.0, np.nan])
+
+
+def test_lttb_keeps_edges_and_peaks():
+    values = np.zeros(100)
+    values[42] = 10.0
+    selected = subject.lttb(values, 10)
+    assert len(selected) == 10
+    assert selected[0] == 0
+    assert selected[-1] == 99
+    assert 42 in selected
+
+
+def test_downsample_for_profile_one_minute_data():
+    index = pd.date_range("2020-01-01", periods=7 * 24 * 60, freq="1T")
+    df = pd.DataFrame(
+        np.arange(len(index), dtype=np.float64), index=index, columns=["value"]
+    )
+    downsampled, freq, factor = subject.downsample_for_profile(df)
+    assert factor == 5
+    assert freq == "5T"
+    assert len(downsampled) == len(df) // 5
+    assert downsampled.index[1] - downsampled.index[0] == pd.Timedelta(minutes=5)
+    assert downsampled["value"].iloc[0] == 2.0
+    downsampled, freq, factor = subject.downsample_for_profile(df, method="lttb")
+    assert factor == 5
+    assert len(downsampled) == len(df) // 5
+
+
+def test_downsample_for_profile_keeps_low_resolution_data():
+    df = read_timeseries_csv("tests/data/daily-total-female-births.csv")
+    downsampled, freq, factor = subject.downsample_for_profile(df)
+    assert factor == 1
+    assert downsampled is df
+
+
+def test_downsampled_profile_verdicts_match_reference_datasets():
+    for csv_file, freq in [
+        ("tests/data/daily-total-female-births.csv", None),
+        ("tests/data/international-airline-passengers.csv", None),
+        ("tests/data/goog200.csv", "1d"),
+        ("tests/data/diff_goog200.csv", "1d"),
+    ]:
+        df = read_timeseries_csv(csv_file)
+        assert build_profile(df, freq=freq) == build_profile(
+            df, freq=freq, downsample="mean"
+        )
+    df = read_timeseries_csv("tests/data/candy_production.csv")
+    assert build_seasonal_profile(df) == build_seasonal_profile(df, downsample="mean")
+
+
+def _one_minute_dataset(seasonal, days=4, seed=42):
+    random = np.random.RandomState(seed)
+    index = pd.date_range("2020-01-01", periods=days * 24 * 60, freq="1T")
+    noise = random.normal(0, 1, len(index))
+    if seasonal:
+        values = 10 * np.sin(np.arange(len(index)) * 2 * np.pi / (24 * 60)) + noise
+    else:
+        values = np.cumsum(noise)
+    return pd.DataFrame(values, index=index, columns=["value"])
+
+
+# Series with more points per day are too large to profile at full resolution in a unit
+# test, see tests/benchmarks/profile_downsampling.py
+@pytest.mark.parametrize("seasonal", [True, False])
+def test_downsampled_profile_verdicts_match_one_minute_datasets(seasonal):
+    df = _one_minute_dataset(seasonal)
+    assert subject.downsample_for_profile(df)[2] == 5
+    assert subject.downsample_for_profile(df, tests=("seasonality",))[2] == 15
+    assert build_profile(df) == build_profile(df, downsample="mean")
+    downsampled_seasonal_profile = build_seasonal_profile(df, downsample="mean")
+    assert downsampled_seasonal_profile == {"seasonal": seasonal}
+    # Only compared without a season: at full resolution, a daily season of 1440 points
+    # is longer than the periods the seasonality test searches, and it is only found
+    # once downsampled
+    if not seasonal:
+        assert build_seasonal_profile(df) == downsampled_seasonal_profile
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import adaptive_alerting_detector_build.profile.frequency as subject
+
+ONE_MINUTE = 60 * 10 ** 9
+
+
+def test_obs_per_day_for_freq():
+    assert 24 == subject.obs_per_day_for_freq("1H")
+    assert 288 == subject.obs_per_day_for_freq("5T")
+    assert 205 == subject.obs_per_day_for_freq("7T")
+    assert 8640 == subject.obs_per_day_for_freq("10S")
+    assert 1 == subject.obs_per_day_for_freq("1d")
+    assert 0 == subject.obs_per_day_for_freq("25H")
+    assert 0 == subject.obs_per_day_for_freq("M")
+
+
+def test_obs_per_day_for_index_with_freq():
+    index = pd.date_range("2020-01-01", periods=10, freq="5T")
+    assert 288 == subject.obs_per_day_for_index(index)
+
+
+def test_obs_per_day_for_index_with_gaps_and_missing_first_point():
+    timestamps = pd.date_range("2020-01-01", periods=100, freq="1T").asi8
+    timestamps = np.delete(timestamps, [0, 10, 11, 12, 50, 51])
+    index = pd.DatetimeIndex(timestamps)
+    assert index.freq is None
+    assert 1440 == subject.obs_per_day_for_index(index)
+
+
+def test_infer_step():
+    assert ONE_MINUTE == subject.infer_step(np.array([0, 2, 3, 4, 5, 7]) * ONE_MINUTE)
+    assert ONE_MINUTE == subject.infer_step(np.array([0, 1, 1, 2, 3]) * ONE_MINUTE)
+    with pytest.raises(ValueError):
+        subject.infer_step(np.array([0]))
+    with pytest.raises(ValueError):
+        subject.infer_step(np.array([5, 5, 5]))
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from adaptive_alerting_detector_build.profile.interpolation import fill_gaps
+from adaptive_alerting_detector_build.profile.seasonal_metric_profiler import (
+    build_seasonal_profile,
+)
+from tests.csv_helper import read_timeseries_csv
+
+
+def _pandas_fill(df):
+    return (
+        df["value"]
+        .interpolate(method="polynomial", order=1)
+        .replace(np.nan, 0.0)
+        .to_numpy()
+    )
+
+
+def test_fill_gaps_matches_pandas_polynomial_interpolation():
+    values = [np.nan, np.nan, 1.0, np.nan, np.nan, 4.0, 5.0, np.nan, 9.0, np.nan]
+    df = pd.DataFrame(values, columns=["value"])
+    series = df["value"].to_numpy(dtype=np.float64, copy=True)
+    gap_fraction = fill_gaps(series)
+    np.testing.assert_allclose(series, _pandas_fill(df))
+    assert gap_fraction == 0.6
+
+
+def test_fill_gaps_matches_pandas_with_irregular_datetime_index():
+    df = read_timeseries_csv("tests/data/candy_production.csv")
+    df.iloc[[0, 5, 6, 7, 100, 250, len(df) - 1], 0] = np.nan
+    series = df["value"].to_numpy(dtype=np.float64, copy=True)
+    fill_gaps(series, positions=df.index.asi8)
+    np.testing.assert_allclose(series, _pandas_fill(df))
+
+
+def test_fill_gaps_without_values():
+    series = np.full(4, np.nan)
+    assert fill_gaps(series) == 1.0
+    assert not series.any()
+    assert fill_gaps(np.array([], dtype=np.float64)) == 0.0
+
+
+def test_build_seasonal_profile_rejects_mostly_empty_series():
+    series = [
+        10 * np.sin(i * 2 * np.pi / 25) if i % 4 == 0 else np.nan for i in range(100)
+    ]
+    series_df = pd.DataFrame(series, columns=["value"])
+    with pytest.raises(ValueError) as exception:
+        build_seasonal_profile(series_df, max_gap_fraction=0.5)
+    assert str(exception.value).startswith(
+        "Data for seasonality test is not valid. 75% of the values are missing"
+    )
@@ -1,4 +1,10 @@
-from adaptive_alerting_detector_build.profile.metric_profiler import build_profile
+import logging
+
+from adaptive_alerting_detector_build.profile.metric_profiler import (
+    build_profile,
+    check_stationarity,
+    render_stationarity_report,
+)
 from tests.csv_helper import read_timeseries_csv
 
 
@@ -32,3 +38,24 @@ def test_build_profile_nonstationary_goog200():
 #     df.fillna(0, inplace=True)
 #     profile = build_profile(df, significance="1%")
 #     assert not profile["stationary"]
+
+
+def test_check_stationarity_skips_report_when_logging_disabled(monkeypatch, caplog):
+    import adaptive_alerting_detector_build.profile.metric_profiler as subject
+
+    def fail(*args, **kwargs):
+        raise AssertionError("Report should not be built")
+
+    monkeypatch.setattr(subject, "annotate_stationarity", fail)
+    caplog.set_level(logging.WARNING, logger="adaptive_alerting_detector_build.profile")
+    df = read_timeseries_csv("tests/data/daily-total-female-births.csv")
+    stationarity_result = subject.check_stationarity(df)
+    assert stationarity_result.is_stationary
+
+
+def test_render_stationarity_report():
+    df = read_timeseries_csv("tests/data/daily-total-female-births.csv")
+    stationarity_result = check_stationarity(df)
+    report = render_stationarity_report(stationarity_result)
+    assert report.startswith("Annotated Results of Dickey-Fuller Test:")
+    assert "timeseries IS stationary" in report
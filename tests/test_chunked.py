@@ -0,0 +1,132 @@
+import os
+
+import pytest
+
+from adaptive_alerting_detector_build import cli
+from adaptive_alerting_detector_build.cli import run_for_config_files
+from adaptive_alerting_detector_build.metrics import MetricConfig
+from adaptive_alerting_detector_build.metrics.chunked import (
+    ChunkedCommand,
+    SpilledMetricConfigs,
+)
+from adaptive_alerting_detector_build.utils.memory import (
+    current_rss,
+    format_size,
+    parse_size,
+    peak_rss,
+)
+
+
+def _metric_configs(count):
+    return [
+        MetricConfig(
+            name=f"metric_{i}",
+            type="REQUEST_COUNT",
+            tags={"what": f"metric_{i}"},
+            datasource={"type": "mock"},
+        )
+        for i in range(count)
+    ]
+
+
+class RecordingCommand:
+    __name__ = "recording_command"
+
+    def __init__(self, exit_codes=None):
+        self.chunks = []
+        self.exit_codes = exit_codes or dict()
+
+    def __call__(self, metric_configs, metric_factory=None):
+        self.chunks.append([metric_config.name for metric_config in metric_configs])
+        return max(
+            self.exit_codes.get(metric_config.name, 0)
+            for metric_config in metric_configs
+        )
+
+
+def test_parse_size():
+    assert parse_size("1024") == 1024
+    assert parse_size("512M") == 512 * 1024 ** 2
+    assert parse_size("1.5g") == int(1.5 * 1024 ** 3)
+    assert parse_size("2GiB") == 2 * 1024 ** 3
+    assert format_size(3 * 1024 ** 2) == "3.0 MiB"
+    with pytest.raises(ValueError):
+        parse_size("two gigabytes")
+
+
+def test_memory_usage_is_reported():
+    if not os.path.exists("/proc/self/statm"):
+        pytest.skip("/proc/self/statm is not available")
+    assert current_rss() > 0
+    assert peak_rss() >= current_rss() // 2
+
+
+def test_spilled_metric_configs_round_trip(tmpdir):
+    metric_configs = _metric_configs(3)
+    with SpilledMetricConfigs(
+        metric_configs, spill_dir=str(tmpdir)
+    ) as spilled_metric_configs:
+        assert len(spilled_metric_configs) == 3
+        assert os.path.dirname(spilled_metric_configs.path) == str(tmpdir)
+        assert list(spilled_metric_configs) == metric_configs
+    assert not os.path.exists(spilled_metric_configs.path)
+
+
+def test_chunked_command_shrinks_chunks_over_budget():
+    command = RecordingCommand(exit_codes={"metric_3": 1})
+    chunked_command = ChunkedCommand(command, memory_budget=1, chunk_size=4)
+    assert chunked_command(_metric_configs(10)) == 1
+    assert [len(chunk) for chunk in command.chunks] == [4, 2, 1, 1, 1, 1]
+    assert sum(command.chunks, []) == [f"metric_{i}" for i in range(10)]
+
+
+def test_chunked_command_grows_chunks_under_budget():
+    command = RecordingCommand()
+    chunked_command = ChunkedCommand(
+        command, memory_budget=parse_size("1T"), chunk_size=2, max_chunk_size=4
+    )
+    assert chunked_command(_metric_configs(10)) == 0
+    assert [len(chunk) for chunk in command.chunks] == [2, 4, 4]
+
+
+def test_run_for_config_files_with_memory_budget(tmpdir, monkeypatch, caplog):
+    monkeypatch.setenv("ADAPTIVE_ALERTING_SPILL_DIR", str(tmpdir))
+    command = RecordingCommand()
+    exit_code = run_for_config_files(
+        command,
+        ["tests/data/metric-config-latency.json"],
+        memory_budget=parse_size("1T"),
+    )
+    assert exit_code == 0
+    assert command.chunks == [["My App Request Latency"]]
+    assert tmpdir.listdir() == []
+    assert any(
+        "Peak resident memory" in record.getMessage() for record in caplog.records
+    )
+    assert run_for_config_files(command, [], memory_budget=1, pipeline=2) == 1
+
+
+def test_run_for_config_files_with_memory_budget_streams_config_files(
+    tmpdir, monkeypatch
+):
+    monkeypatch.setenv("ADAPTIVE_ALERTING_SPILL_DIR", str(tmpdir))
+
+    def metric_work_set(*args, **kwargs):
+        raise AssertionError("The work set should not be loaded in memory")
+
+    monkeypatch.setattr(cli, "MetricWorkSet", metric_work_set)
+    command = RecordingCommand()
+    exit_code = run_for_config_files(
+        command,
+        ["tests/data/metric-config.json", "tests/data/metric-config-v2.json"],
+        memory_budget=parse_size("1T"),
+    )
+    assert exit_code == 0
+    assert sum(command.chunks, []) == [
+        "My App Request Count",
+        "My App Error Count",
+        "My App Success Rate",
+        "My App Latency",
+        "My App Request Count Fixed",
+    ]
+    assert os.listdir(str(tmpdir)) == []
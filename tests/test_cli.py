@@ -2,9 +2,20 @@ from adaptive_alerting_detector_build.cli import disable_detectors_for_metric_co
 from adaptive_alerting_detector_build.cli import read_config_file, build_detectors_for_metric_configs
 from adaptive_alerting_detector_build.cli import train_detectors_for_metric_configs
 from adaptive_alerting_detector_build.cli import diff_metric_configs
+from adaptive_alerting_detector_build.cli import apply_metric_config_diff
+from adaptive_alerting_detector_build.cli import iter_diff_metric_configs
+from adaptive_alerting_detector_build.cli import profile_metric_configs
+from adaptive_alerting_detector_build.cli import main
+from adaptive_alerting_detector_build.metrics import MetricConfigReader
+from adaptive_alerting_detector_build.metrics.diff import MetricConfigDiffWriter, iter_metric_config_diff
+from adaptive_alerting_detector_build.metrics.diff import read_diff_file
+from adaptive_alerting_detector_build.profile.fleet_profiler import profile_series
 
 from freezegun import freeze_time
+import json
 import logging
+import numpy as np
+import pytest
 import responses
 
 from tests.conftest import DETECTOR_MAPPINGS_SEARCH_MOCK_RESPONSE
@@ -236,5 +247,258 @@ def test_cli_diff_metric_configs(caplog):
     assert diff["modified"][0]["name"] == "My App Error Count"
     assert len(diff["deleted"]) == 1
     assert diff["deleted"][0]["name"] == "My App Request Count"
+    assert len(diff["changes"]) == 1
+    assert diff["changes"][0]["name"] == "My App Error Count"
+    assert set(diff["changes"][0]["fields"]) == {"description"}
+    assert diff["changes"][0]["fields"]["description"]["current"] == "Sum of errors received. Updated description."
 
 
+def test_cli_diff_writer_matches_diff(tmpdir):
+    previous, exit_code = read_config_file("./tests/data/metric-config.json")
+    current, exit_code = read_config_file("./tests/data/metric-config-v2.json")
+    output_file = tmpdir.join("diff.json")
+    with MetricConfigDiffWriter(spool_max_size=16) as diff_writer:
+        for diff_entry in iter_metric_config_diff(previous, current):
+            diff_writer.add(diff_entry)
+        with open(str(output_file), "w") as output_file_handle:
+            diff_writer.write(output_file_handle)
+    assert output_file.read() == json.dumps(diff_metric_configs(previous, current), indent=4)
+
+
+@responses.activate
+def test_cli_apply_diff_file_disables_deleted_metrics(tmpdir, caplog):
+    responses.add(responses.POST, "http://modelservice/api/detectorMappings/findMatchingByTags",
+            json=FIND_BY_MATCHING_TAGS_MOCK_RESPONSE,
+            status=200)
+    responses.add(responses.GET, "http://modelservice/api/v2/detectors/findByUuid?uuid=4fdc3395-e969-449a-a306-201db183c6d7",
+            json=MOCK_DETECTORS[0],
+            status=200)
+    responses.add(responses.GET, "http://modelservice/api/v2/detectors/findByUuid?uuid=47a0661d-aceb-4ef2-bf06-0828f28631b4",
+            json=MOCK_DETECTORS[1],
+            status=200)
+    responses.add(responses.POST, "http://modelservice/api/detectorMappings/search",
+            json=[DETECTOR_MAPPINGS_SEARCH_MOCK_RESPONSE[0]],
+            status=200)
+    responses.add(responses.POST, "http://modelservice/api/detectorMappings/search",
+            json=[DETECTOR_MAPPINGS_SEARCH_MOCK_RESPONSE[1]],
+            status=200)
+    responses.add(responses.PUT, "http://modelservice/api/detectorMappings/disable?id=5XeANXABlK1-eG-Fo78V",
+            status=200)
+    responses.add(responses.PUT, "http://modelservice/api/detectorMappings/disable?id=6XeANXABlK1-eG-Fo78V",
+            status=200)
+    responses.add(responses.POST, "http://modelservice/api/v2/detectors/toggleDetector?enabled=false&uuid=4fdc3395-e969-449a-a306-201db183c6d7",
+            status=200)
+    responses.add(responses.POST, "http://modelservice/api/v2/detectors/toggleDetector?enabled=false&uuid=47a0661d-aceb-4ef2-bf06-0828f28631b4",
+            status=200)
+    with open("./tests/data/metric-config-request-count.json") as metric_config_file:
+        deleted = json.load(metric_config_file)
+    diff_file = tmpdir.join("diff.json")
+    diff_file.write(json.dumps({"added": [], "modified": [], "deleted": deleted}))
+    apply_exit_code = apply_metric_config_diff(read_diff_file(str(diff_file)))
+    assert apply_exit_code == 0
+    assert len(caplog.records) == 2
+    assert caplog.records[0].msg == "Detector/Detector Mapping with UUID '4fdc3395-e969-449a-a306-201db183c6d7' disabled."
+    assert caplog.records[1].msg == "Detector/Detector Mapping with UUID '47a0661d-aceb-4ef2-bf06-0828f28631b4' disabled."
+
+
+@responses.activate
+def test_cli_apply_does_not_disable_metrics_of_unreadable_config(caplog):
+    metric_config_readers = (
+        MetricConfigReader("./tests/data/metric-config.json"),
+        MetricConfigReader("./tests/data/missing-metric-config.json"),
+    )
+    apply_exit_code = apply_metric_config_diff(
+        iter_diff_metric_configs(*metric_config_readers), metric_config_readers
+    )
+    assert apply_exit_code == 1
+    assert len(responses.calls) == 0
+    assert caplog.records[-1].msg == "Config files could not be read, deleted metrics are not disabled!"
+
+
+@responses.activate
+def test_cli_apply_does_not_disable_metrics_of_invalid_config_entries(tmpdir, caplog):
+    with open("./tests/data/metric-config-request-count.json") as metric_config_file:
+        previous = json.load(metric_config_file)
+    current = [dict(previous[0], type="BOGUS_TYPE")]
+    previous_file = tmpdir.join("prev.json")
+    previous_file.write(json.dumps(previous))
+    current_file = tmpdir.join("cur.json")
+    current_file.write(json.dumps(current))
+    assert main(["apply", str(previous_file), str(current_file)]) == 1
+    assert len(responses.calls) == 0
+    messages = [record.getMessage() for record in caplog.records]
+    assert "Config files have invalid entries, deleted metrics are not disabled!" in messages
+
+
+@responses.activate
+def test_cli_diff_then_apply_does_not_disable_metrics_of_invalid_config_entries(tmpdir, caplog):
+    with open("./tests/data/metric-config-request-count.json") as metric_config_file:
+        previous = json.load(metric_config_file)
+    current = [{key: value for key, value in previous[0].items() if key != "type"}]
+    previous_file = tmpdir.join("prev.json")
+    previous_file.write(json.dumps(previous))
+    current_file = tmpdir.join("cur.json")
+    current_file.write(json.dumps(current))
+    diff_file = tmpdir.join("diff.json")
+    assert main(["diff", str(previous_file), str(current_file), str(diff_file)]) == 1
+    assert not diff_file.exists()
+    assert f"Config files have invalid entries, not writing {diff_file}!" in caplog.text
+    assert main(["apply", f"--diff={diff_file}"]) == 1
+    assert len(responses.calls) == 0
+
+
+@responses.activate
+def test_cli_profile_metrics(tmpdir):
+    responses.add(
+        responses.GET,
+        "http://graphite/render?target=sumSeries(seriesByTag('app=my-web-app','what=tp90'))&from=-168hours&until=now&format=json",
+        json=GRAPHITE_MOCK_RESPONSE,
+        status=200,
+    )
+    output_file = str(tmpdir.join("profiles.ndjson"))
+    metric_configs, exit_code = read_config_file("./tests/data/metric-config-latency.json")
+    profile_exit_code = profile_metric_configs(metric_configs, output_file=output_file, workers=0)
+    assert profile_exit_code == 0
+    with open(output_file) as output_file_handle:
+        profiles = [json.loads(line) for line in output_file_handle]
+    assert len(profiles) == 1
+    assert profiles[0]["name"] == "My App Request Latency"
+    assert profiles[0]["tag_key"] == metric_configs[0].tag_key
+    assert profiles[0]["points"] == 1441
+    assert set(profiles[0]["timings"]) == {"fetch", "stationarity", "seasonality"}
+    assert "seasonal" in profiles[0]
+    assert "period" in profiles[0]
+
+
+@responses.activate
+def test_cli_profile_metrics_resume(tmpdir):
+    metric_configs, exit_code = read_config_file("./tests/data/metric-config-latency.json")
+    output_file = tmpdir.join("profiles.ndjson")
+    output_file.write(json.dumps({"tag_key": metric_configs[0].tag_key}) + "\n" + '{"tag_key": "partial')
+    profile_exit_code = profile_metric_configs(
+        metric_configs, output_file=str(output_file), workers=0, resume=True
+    )
+    assert profile_exit_code == 0
+    assert len(responses.calls) == 0
+    assert output_file.read() == json.dumps({"tag_key": metric_configs[0].tag_key}) + "\n"
+
+
+@pytest.mark.parametrize("create_concurrency", ["0", "-2", "many"])
+def test_cli_rejects_invalid_create_concurrency(create_concurrency, caplog):
+    argv = ["build", f"--create-concurrency={create_concurrency}", "./tests/data/metric-config.json"]
+    assert main(argv) == 1
+    assert caplog.records[-1].getMessage() == (
+        f"Invalid --create-concurrency '{create_concurrency}', expecting at least 1"
+    )
+
+
+@pytest.mark.parametrize(
+    "argv, message",
+    [
+        (["train", "--deadline=soon"], "--deadline: Invalid duration 'soon', expected e.g. 3600, 45m or 1h30m"),
+        (
+            ["train", "--memory-budget=lots"],
+            "--memory-budget: Invalid size 'lots', expected a number of bytes optionally followed by K, M, G or T",
+        ),
+        (["train", "--pipeline=four"], "Invalid --pipeline 'four', expecting at least 0"),
+        (["train", "--pipeline=2", "--io-threads=0"], "Invalid --io-threads '0', expecting at least 1"),
+        (["train", "--queue=jobs.db", "--workers=-1"], "Invalid --workers '-1', expecting at least 0"),
+    ],
+)
+def test_cli_rejects_invalid_option_values(argv, message, caplog):
+    assert main(argv + ["./tests/data/metric-config.json"]) == 1
+    assert caplog.records[-1].getMessage() == message
+
+
+def test_cli_rejects_invalid_shard(caplog):
+    assert main(["train", "--shard=4/4", "./tests/data/metric-config.json"]) == 1
+    assert caplog.records[-1].getMessage() == (
+        "Invalid shard 4/4, expecting 0 <= INDEX < COUNT, set with --shard or SHARD_INDEX and SHARD_COUNT"
+    )
+
+
+def test_cli_diff_ignores_shard_settings(tmpdir, monkeypatch):
+    monkeypatch.setenv("SHARD_INDEX", "first")
+    monkeypatch.setenv("SHARD_COUNT", "4")
+    output_file = str(tmpdir.join("diff.json"))
+    argv = ["diff", "./tests/data/metric-config.json", "./tests/data/metric-config-v2.json", output_file]
+    assert main(argv) == 0
+
+
+def test_cli_profile_resume_requires_output_file(caplog):
+    assert main(["profile", "--resume", "./tests/data/metric-config-latency.json"]) == 1
+    assert caplog.records[-1].getMessage() == "--resume requires an --output file"
+
+
+@responses.activate
+def test_cli_profile_test_errors_do_not_change_exit_code(tmpdir, caplog):
+    responses.add(
+        responses.GET,
+        "http://graphite/render?target=sumSeries(seriesByTag('app=my-web-app','what=tp90'))&from=-168hours&until=now&format=json",
+        json=[{"target": "tp90", "datapoints": [[1.0, 1580515200], [2.0, 1580515260], [3.0, 1580515320]]}],
+        status=200,
+    )
+    output_file = str(tmpdir.join("profiles.ndjson"))
+    metric_configs, exit_code = read_config_file("./tests/data/metric-config-latency.json")
+    assert profile_metric_configs(metric_configs, output_file=output_file, workers=0) == 0
+    with open(output_file) as output_file_handle:
+        profile = json.loads(output_file_handle.readline())
+    assert "stationarity" in profile["errors"]
+    messages = [record.getMessage() for record in caplog.records]
+    assert "Profiling tests failed for 1 metric(s), see the errors of their profile" in messages
+
+
+@responses.activate
+@pytest.mark.parametrize("downsample", [None, "mean"])
+def test_cli_profile_metrics_in_pool_resume(tmpdir, downsample):
+    responses.add(
+        responses.GET,
+        "http://graphite/render?target=sumSeries(seriesByTag('app=my-web-app','what=tp90'))&from=-168hours&until=now&format=json",
+        json=GRAPHITE_MOCK_RESPONSE,
+        status=200,
+    )
+    metric_configs, exit_code = read_config_file("./tests/data/metric-config-latency.json")
+    output_file = tmpdir.join("profiles.ndjson")
+    assert profile_metric_configs(metric_configs, output_file=str(output_file), workers=2, downsample=downsample) == 0
+    profile = json.loads(output_file.read())
+    assert profile["points"] == 1441
+    # One day of data is too short for the stationarity test, its error is recorded in the profile
+    assert "worker" not in profile["errors"]
+    assert set(profile["timings"]) == {"fetch", "stationarity", "seasonality"}
+    profile_exit_code = profile_metric_configs(
+        metric_configs, output_file=str(output_file), workers=2, resume=True, downsample=downsample
+    )
+    assert profile_exit_code == 0
+    assert len(responses.calls) == 1
+    assert output_file.read() == json.dumps(profile) + "\n"
+
+
+def test_cli_profile_rejects_invalid_downsample(caplog):
+    assert main(["profile", "--downsample=median", "./tests/data/metric-config-latency.json"]) == 1
+    assert caplog.records[-1].getMessage() == "Invalid --downsample 'median', expecting one of mean, lttb"
+
+
+def test_profile_series_does_not_log_reports(caplog):
+    caplog.set_level(logging.INFO)
+    timestamps = (1580515200 + 60 * np.arange(4 * 1440, dtype=np.int64)) * 10**9
+    values = np.random.RandomState(0).normal(10, 1, timestamps.size)
+    result = profile_series("tag_key", "name", timestamps, values)
+    assert result["errors"] == {}
+    report_records = [record for record in caplog.records if record.name.endswith("_display")]
+    assert not report_records
+
+
+@responses.activate
+def test_cli_profile_metric_listed_in_several_files_once(tmpdir):
+    responses.add(
+        responses.GET,
+        "http://graphite/render?target=sumSeries(seriesByTag('app=my-web-app','what=tp90'))&from=-168hours&until=now&format=json",
+        json=GRAPHITE_MOCK_RESPONSE,
+        status=200,
+    )
+    output_file = tmpdir.join("profiles.ndjson")
+    metric_config_file = "./tests/data/metric-config-latency.json"
+    argv = ["profile", "--workers=0", f"--output={output_file}", metric_config_file, metric_config_file]
+    assert main(argv) == 0
+    assert len(responses.calls) == 1
+    assert len(output_file.read().splitlines()) == 1
@@ -0,0 +1,38 @@
+import io
+
+from adaptive_alerting_detector_build.metrics import MetricConfig, MetricConfigReader
+from adaptive_alerting_detector_build.metrics.config_reader import iter_json_values
+
+
+def test_read_ndjson_config_file():
+    json_metric_configs = list(MetricConfigReader("./tests/data/metric-config.json"))
+    ndjson_metric_configs = list(
+        MetricConfigReader("./tests/data/metric-config.ndjson")
+    )
+    assert len(ndjson_metric_configs) == 4
+    assert all(isinstance(c, MetricConfig) for c in ndjson_metric_configs)
+    assert ndjson_metric_configs == json_metric_configs
+
+
+def test_iter_json_values_across_chunks():
+    payload = '[{"name": "a", "tags": {"x": "1,]"}}, {"name": "b"}, 12345]'
+    for chunk_size in (1, 7, 1024):
+        values = list(iter_json_values(io.StringIO(payload), chunk_size=chunk_size))
+        assert values == [{"name": "a", "tags": {"x": "1,]"}}, {"name": "b"}, 12345]
+
+
+def test_reader_yields_entries_before_malformed_tail(tmpdir, caplog):
+    config_file = tmpdir.join("metric-config.json")
+    config_file.write(
+        '[{"name": "My App Latency", "type": "LATENCY", '
+        '"tags": {"app": "my-web-app"}}, {"name": '
+    )
+    metric_config_reader = MetricConfigReader(str(config_file))
+    metric_configs = list(metric_config_reader)
+    assert len(metric_configs) == 1
+    assert metric_configs[0].name == "My App Latency"
+    assert metric_config_reader.exit_code == 1
+    assert any(
+        r.msg.startswith("Exception JSONDecodeError while reading config file")
+        for r in caplog.records
+    )
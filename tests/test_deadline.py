@@ -0,0 +1,144 @@
+import datetime
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from adaptive_alerting_detector_build.cli import train_detectors_by_staleness
+from adaptive_alerting_detector_build.detectors import build_detector
+from adaptive_alerting_detector_build.metrics import MetricConfig
+from adaptive_alerting_detector_build.utils.deadline import (
+    Deadline,
+    DeadlineExceeded,
+    parse_duration,
+    request_timeout,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeDetectorClient:
+    def __init__(self, clock, seconds_per_update):
+        self.clock = clock
+        self.seconds_per_update = seconds_per_update
+        self.updated = []
+
+    def update_detector(self, detector, read_after_write=True):
+        self.clock.now += self.seconds_per_update
+        self.updated.append(detector.uuid)
+        return detector
+
+
+class FakeMetric:
+    def __init__(self, metric_config, detectors, detector_client):
+        self.config = {"type": metric_config.type.value}
+        self.detectors = detectors
+        self._detector_client = detector_client
+
+    def query(self):
+        return pd.DataFrame(
+            {"value": 10 + np.sin(np.arange(100) / 10.0)},
+            index=pd.date_range("2020-01-01", periods=100, freq="min"),
+        )
+
+
+class FakeMetricFactory:
+    def __init__(self, detector_client, minutes_since_trained):
+        self.detector_client = detector_client
+        self.minutes_since_trained = minutes_since_trained
+
+    def metric(self, metric_config):
+        detector = build_detector(
+            "constant-detector", {"hyperparams": {"strategy": "sigma"}}
+        )
+        detector.uuid = metric_config.name
+        detector.training_interval = pd.to_timedelta("1h")
+        minutes = self.minutes_since_trained[metric_config.name]
+        detector.last_updated = datetime.datetime.utcnow() - datetime.timedelta(
+            minutes=minutes
+        )
+        return FakeMetric(metric_config, [detector], self.detector_client)
+
+
+def _metric_configs(names):
+    return [
+        MetricConfig(
+            name=name,
+            type="REQUEST_COUNT",
+            tags={"what": name},
+            datasource={"type": "mock"},
+        )
+        for name in names
+    ]
+
+
+def test_parse_duration():
+    assert parse_duration("90") == 90
+    assert parse_duration("45m") == 45 * 60
+    assert parse_duration("1h30m") == 90 * 60
+    assert parse_duration("1d") == 86400
+    with pytest.raises(ValueError):
+        parse_duration("soon")
+
+
+def test_request_timeout_is_bounded_by_active_deadline():
+    clock = FakeClock()
+    deadline = Deadline(10, clock=clock)
+    assert request_timeout(30) == 30
+    with deadline.activate():
+        assert request_timeout(30) == 10
+        assert request_timeout(5) == 5
+        clock.now = 10
+        with pytest.raises(DeadlineExceeded):
+            request_timeout(30)
+    assert request_timeout(30) == 30
+
+
+def test_overdue_ratio():
+    detector = build_detector(
+        "constant-detector", {"hyperparams": {"strategy": "sigma"}}
+    )
+    assert detector.overdue_ratio == float("inf")
+    detector.training_interval = pd.to_timedelta("0")
+    assert detector.overdue_ratio == 0.0
+    detector.training_interval = pd.to_timedelta("1h")
+    detector.uuid = "uuid"
+    assert detector.overdue_ratio == 0.0
+    detector.last_updated = datetime.datetime.utcnow() - datetime.timedelta(minutes=90)
+    assert detector.overdue_ratio == pytest.approx(1.5)
+
+
+def test_train_most_overdue_first_and_defer_after_deadline(caplog):
+    caplog.set_level(logging.INFO)
+    clock = FakeClock()
+    detector_client = FakeDetectorClient(clock, seconds_per_update=10)
+    metric_factory = FakeMetricFactory(
+        detector_client,
+        minutes_since_trained={
+            "slightly_overdue": 70,
+            "very_overdue": 300,
+            "not_due": 30,
+            "overdue": 120,
+        },
+    )
+    exit_code = train_detectors_by_staleness(
+        _metric_configs(["slightly_overdue", "very_overdue", "not_due", "overdue"]),
+        Deadline(15, clock=clock),
+        metric_factory=metric_factory,
+    )
+    assert exit_code == 0
+    assert detector_client.updated == ["very_overdue", "overdue"]
+    messages = [record.getMessage() for record in caplog.records]
+    assert (
+        "Training not required for 'constant-detector' detector with UUID: not_due"
+        in messages
+    )
+    assert "Deadline of 15 seconds reached, 1 metric(s) deferred" in messages
+    assert "Deferred metric 'slightly_overdue'" in messages
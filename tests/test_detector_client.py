@@ -1,10 +1,16 @@
 from adaptive_alerting_detector_build.metrics import Metric
 from adaptive_alerting_detector_build.config import MODEL_SERVICE_URL
-from adaptive_alerting_detector_build.detectors import Detector
-from adaptive_alerting_detector_build.detectors.client import DetectorClient
+from adaptive_alerting_detector_build.detectors import Detector, from_json
+from adaptive_alerting_detector_build.detectors.client import DetectorClient, WriteVerifier
 from adaptive_alerting_detector_build.detectors.mapping import DetectorMapping
+from adaptive_alerting_detector_build.detectors import readiness
+from adaptive_alerting_detector_build.detectors.readiness import DetectorNotReadyError, ReadinessPoller
+from adaptive_alerting_detector_build.cli import build_detectors_concurrently
+from adaptive_alerting_detector_build.metrics import MetricConfig
+from adaptive_alerting_detector_build.utils.deadline import Deadline
 import pandas as pd
 import pytest
+import threading
 import related
 import responses
 import json
@@ -44,6 +50,139 @@ def test_detector_list_detector_mappings():
     assert detector_mapping.id == "5XeANXABlK1-eG-Fo78V"
 
 
+@responses.activate
+def test_detector_client_create_detector_waits_until_ready(monkeypatch):
+    monkeypatch.setattr(readiness, "INITIAL_POLL_DELAY", 0.01)
+    detector_uuid = "4fdc3395-e969-449a-a306-201db183c6d7"
+    responses.add(responses.POST, "http://modelservice/api/v2/detectors", body=detector_uuid, status=201)
+    find_by_uuid_url = f"http://modelservice/api/v2/detectors/findByUuid?uuid={detector_uuid}"
+    responses.add(responses.GET, find_by_uuid_url, status=404)
+    responses.add(responses.GET, find_by_uuid_url, json=MOCK_DETECTORS[0], status=200)
+    detector = from_json(json.dumps(MOCK_DETECTORS[0]))
+    detector.uuid = None
+    created_detector = DetectorClient().create_detector(detector)
+    assert created_detector.uuid == detector_uuid
+    assert len([call for call in responses.calls if call.request.method == "GET"]) == 2
+
+
+def test_readiness_poller_checks_pending_detectors_together(monkeypatch):
+    monkeypatch.setattr(readiness, "INITIAL_POLL_DELAY", 0.01)
+    checks = {"a": 0, "b": 0}
+    lock = threading.Lock()
+
+    def get_detector(detector_uuid):
+        with lock:
+            checks[detector_uuid] += 1
+            if checks[detector_uuid] < 3:
+                raise IOError("404 Client Error")
+        return detector_uuid.upper()
+
+    poller = ReadinessPoller(get_detector, timeout=5)
+    futures = [poller.wait_for("a"), poller.wait_for("b")]
+    assert [future.result(timeout=5) for future in futures] == ["A", "B"]
+    assert checks == {"a": 3, "b": 3}
+
+
+def test_readiness_poller_timeout(monkeypatch):
+    monkeypatch.setattr(readiness, "INITIAL_POLL_DELAY", 0.01)
+    poller = ReadinessPoller(lambda detector_uuid: None, timeout=0.05)
+    with pytest.raises(DetectorNotReadyError) as exception:
+        poller.wait_for("a").result(timeout=5)
+    assert "Timeout waiting for detector uuid 'a'" in exception.value.msg
+
+
+class FakeBuildMetric:
+    def __init__(self, name, built, lock):
+        self.name = name
+        self.built = built
+        self.lock = lock
+
+    def build_detectors(self):
+        with self.lock:
+            self.built.append(self.name)
+        return []
+
+
+class FakeBuildMetricFactory:
+    def __init__(self):
+        self.built = []
+        self.lock = threading.Lock()
+
+    def metric(self, metric_config):
+        return FakeBuildMetric(metric_config.name, self.built, self.lock)
+
+
+def test_build_detectors_concurrently():
+    metric_factory = FakeBuildMetricFactory()
+    metric_configs = [
+        MetricConfig(name=f"metric_{i}", type="REQUEST_COUNT", tags={"what": f"metric_{i}"}, datasource={"type": "mock"})
+        for i in range(20)
+    ]
+    assert build_detectors_concurrently(metric_configs, 4, metric_factory=metric_factory) == 0
+    assert sorted(metric_factory.built) == sorted(metric_config.name for metric_config in metric_configs)
+
+
+class FailingBuildMetricFactory(FakeBuildMetricFactory):
+    def metric(self, metric_config):
+        if metric_config.name == "metric_3":
+            raise ValueError("model_service_url not found")
+        return super().metric(metric_config)
+
+
+def test_build_detectors_concurrently_reports_failures(caplog):
+    metric_factory = FailingBuildMetricFactory()
+    metric_configs = [
+        MetricConfig(name=f"metric_{i}", type="REQUEST_COUNT", tags={"what": f"metric_{i}"}, datasource={"type": "mock"})
+        for i in range(5)
+    ]
+    assert build_detectors_concurrently(metric_configs, 2, metric_factory=metric_factory) == 1
+    assert len(metric_factory.built) == 4
+    assert "Exception ValueError while creating detector for metric metric_3! Skipping!" in caplog.text
+
+
+@responses.activate
+def test_detector_client_update_detector_without_read_after_write():
+    detector = from_json(json.dumps(MOCK_DETECTORS[0]))
+    responses.add(responses.PUT, f"http://modelservice/api/v2/detectors?uuid={detector.uuid}", status=200)
+    updated_detector = DetectorClient().update_detector(detector, read_after_write=False)
+    assert updated_detector is detector
+    assert [call.request.method for call in responses.calls] == ["PUT"]
+
+
+@responses.activate
+def test_write_verifier_reports_mismatched_detectors():
+    detector_uuid = "4fdc3395-e969-449a-a306-201db183c6d7"
+    responses.add(responses.GET, f"http://modelservice/api/v2/detectors/findByUuid?uuid={detector_uuid}",
+            json=MOCK_DETECTORS[0],
+            status=200)
+    responses.add(responses.GET, "http://modelservice/api/v2/detectors/findByUuid?uuid=missing", status=404)
+    detector_client = DetectorClient()
+    write_verifier = WriteVerifier(batch_size=2)
+    matching_detector = from_json(json.dumps(MOCK_DETECTORS[0]))
+    write_verifier.add(detector_client, matching_detector)
+    disabled_detector = from_json(json.dumps(MOCK_DETECTORS[0]))
+    disabled_detector.enabled = not disabled_detector.enabled
+    # The batch is verified once full
+    write_verifier.add(detector_client, disabled_detector)
+    assert write_verifier.verified == 2
+    missing_detector = from_json(json.dumps(MOCK_DETECTORS[0]))
+    missing_detector.uuid = "missing"
+    write_verifier.add(detector_client, missing_detector)
+    write_verifier.flush()
+    assert write_verifier.verified == 3
+    assert write_verifier.mismatched == [detector_uuid, "missing"]
+
+
+def test_write_verifier_counts_detectors_not_read_back_before_deadline():
+    write_verifier = WriteVerifier(batch_size=1)
+    with Deadline(0).activate():
+        # The batch is flushed when full, within the deadline
+        write_verifier.add(DetectorClient(), from_json(json.dumps(MOCK_DETECTORS[0])))
+    assert write_verifier.verified == 0
+    assert write_verifier.mismatched == []
+    assert write_verifier.unverified == ["4fdc3395-e969-449a-a306-201db183c6d7"]
+
+
 
 
 # @responses.activate
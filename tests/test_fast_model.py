@@ -0,0 +1,99 @@
+import json
+
+import pytest
+import related
+
+from adaptive_alerting_detector_build.detectors import Detector
+from adaptive_alerting_detector_build.detectors.constant_threshold import (
+    ConstantThresholdConfig,
+)
+from adaptive_alerting_detector_build.metrics import MetricConfig
+from adaptive_alerting_detector_build.utils import fast_model
+
+
+def _read_json(path):
+    with open(path) as json_file:
+        return json.load(json_file)
+
+
+def test_metric_config_matches_related():
+    for raw_metric_config in _read_json("./tests/data/metric-config.json"):
+        assert fast_model.to_model(MetricConfig, raw_metric_config) == related.to_model(
+            MetricConfig, raw_metric_config
+        )
+
+
+def test_detector_matches_related():
+    for path in (
+        "./tests/data/detectors-mock.json",
+        "./tests/data/detectors-constant-threshold-highwatermark-mock.json",
+    ):
+        for raw_detector in _read_json(path):
+            assert fast_model.to_model(Detector, raw_detector) == related.to_model(
+                Detector, raw_detector
+            )
+            assert fast_model.to_model(
+                ConstantThresholdConfig, raw_detector["detectorConfig"]
+            ) == related.to_model(
+                ConstantThresholdConfig, raw_detector["detectorConfig"]
+            )
+
+
+def test_int_thresholds_are_converted_to_float():
+    raw_config = {
+        "hyperparams": {"strategy": "sigma", "hampel_window_size": 5},
+        "params": {"type": "RIGHT_TAILED", "thresholds": {"upperWeak": 20}},
+    }
+    config = fast_model.to_model(ConstantThresholdConfig, raw_config)
+    assert config == related.to_model(ConstantThresholdConfig, raw_config)
+    assert isinstance(config.hyperparams.hampel_window_size, float)
+    assert isinstance(config.params.thresholds.weak_upper_threshold, float)
+
+
+@pytest.mark.parametrize(
+    "raw_metric_config",
+    [
+        {
+            "name": "My App",
+            "type": "INVALID_METRIC_TYPE",
+            "tags": {"app": "my-web-app"},
+        },
+        {"name": "My App", "type": "LATENCY"},
+        {"name": "My App", "type": "LATENCY", "tags": ["app", "my-web-app"]},
+    ],
+)
+def test_invalid_metric_config_raises_related_error(raw_metric_config):
+    with pytest.raises(Exception) as related_error:
+        related.to_model(MetricConfig, raw_metric_config)
+    with pytest.raises(related_error.type) as fast_model_error:
+        fast_model.to_model(MetricConfig, raw_metric_config)
+    assert str(fast_model_error.value) == str(related_error.value)
+
+
+def test_non_str_name_falls_back_to_related():
+    raw_metric_config = {"name": 1234, "type": "LATENCY", "tags": {"app": "my-web-app"}}
+    metric_config = fast_model.to_model(MetricConfig, raw_metric_config)
+    assert metric_config.name == "1234"
+    assert metric_config == related.to_model(MetricConfig, raw_metric_config)
+
+
+@pytest.mark.parametrize("field", ["training_interval", "enabled"])
+def test_explicit_none_for_field_with_default_raises_related_error(field):
+    raw_detector = {"type": "constant-detector", "detectorConfig": {}, field: None}
+    with pytest.raises(Exception) as related_error:
+        related.to_model(Detector, raw_detector)
+    with pytest.raises(related_error.type) as fast_model_error:
+        fast_model.to_model(Detector, raw_detector)
+    assert str(fast_model_error.value) == str(related_error.value)
+
+
+def test_explicit_none_for_optional_field_matches_related():
+    raw_metric_config = {
+        "name": "My App",
+        "type": "LATENCY",
+        "tags": {"app": "my-web-app"},
+        "description": None,
+    }
+    metric_config = fast_model.to_model(MetricConfig, raw_metric_config)
+    assert metric_config.description is None
+    assert metric_config == related.to_model(MetricConfig, raw_metric_config)
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+# Modules only needed to train detectors or build profiles
+HEAVY_MODULES = ("numba", "statsmodels", "seasonal", "scipy", "matplotlib")
+
+# Cumulative import time of the command line interface, in microseconds, mostly pandas.
+CLI_IMPORT_BUDGET_US = 3000000
+
+
+def import_times(code, env=None):
+    """
+    Runs code in a new interpreter with -X importtime.
+    :return: dict of imported module name to cumulative import time in microseconds
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        env=env,
+        check=True,
+    )
+    times = dict()
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, module = line[len("import time:") :].split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+def test_diff_does_not_import_heavy_modules(tmpdir):
+    output_file = str(tmpdir.join("diff.json"))
+    times = import_times(
+        "from adaptive_alerting_detector_build.cli import main; "
+        "main(['diff', './tests/data/metric-config.json', "
+        "'./tests/data/metric-config-v2.json', "
+        f"{output_file!r}])"
+    )
+    assert "adaptive_alerting_detector_build.cli" in times
+    imported_heavy_modules = [
+        module for module in times if module.split(".")[0] in HEAVY_MODULES
+    ]
+    assert imported_heavy_modules == []
+
+
+def test_cli_import_time_budget():
+    times = import_times("import adaptive_alerting_detector_build.cli")
+    assert times["adaptive_alerting_detector_build.cli"] < CLI_IMPORT_BUDGET_US
+
+
+def test_import_does_not_read_environment():
+    env = {
+        k: v
+        for k, v in os.environ.items()
+        if not k.startswith(("GRAPHITE_", "MODEL_SERVICE_"))
+    }
+    times = import_times("import adaptive_alerting_detector_build.cli", env=env)
+    assert "adaptive_alerting_detector_build.metrics.metric" in times
@@ -0,0 +1,167 @@
+import multiprocessing
+import os
+import sqlite3
+
+from adaptive_alerting_detector_build.metrics import MetricConfig
+from adaptive_alerting_detector_build.metrics import jobqueue
+from adaptive_alerting_detector_build.metrics.jobqueue import (
+    JobQueue,
+    run_job_queue,
+    run_worker,
+)
+
+
+def _metric_configs(count, renamed=()):
+    return [
+        MetricConfig(
+            name=f"Metric {i} renamed" if i in renamed else f"Metric {i}",
+            type="REQUEST_COUNT",
+            tags={"app": "my-web-app", "what": f"metric_{i}"},
+        )
+        for i in range(count)
+    ]
+
+
+def record_metric(metric_configs, metric_factory=None):
+    """Test command, appends the metric names to the file in RECORD_FILE."""
+    with open(os.environ["RECORD_FILE"], "a") as record_file:
+        for metric_config in metric_configs:
+            record_file.write(metric_config.name + "\n")
+    return 0
+
+
+def fail_metric(metric_configs, metric_factory=None):
+    return 1
+
+
+def test_seed_is_idempotent(tmpdir):
+    with JobQueue(str(tmpdir.join("jobs.db")), "train") as job_queue:
+        assert job_queue.seed(_metric_configs(10)) == 10
+        assert job_queue.seed(_metric_configs(12)) == 2
+        assert job_queue.counts() == {jobqueue.PENDING: 12}
+    with JobQueue(str(tmpdir.join("jobs.db")), "build") as job_queue:
+        assert job_queue.seed(_metric_configs(10)) == 10
+
+
+def test_seed_commits_each_batch(tmpdir):
+    path = str(tmpdir.join("jobs.db"))
+    claims = []
+
+    def metric_configs():
+        with JobQueue(path, "train", timeout=0) as other_job_queue:
+            for i, metric_config in enumerate(_metric_configs(5)):
+                if i == 2:
+                    # The first batch is committed, the lock is not held while the next
+                    # one is read
+                    claims.append(other_job_queue.claim("worker-b"))
+                yield metric_config
+
+    with JobQueue(path, "train") as job_queue:
+        assert job_queue.seed(metric_configs(), batch_size=2) == 5
+        assert claims[0].metric_config.name == "Metric 0"
+        assert job_queue.counts() == {jobqueue.PENDING: 4, jobqueue.LEASED: 1}
+
+
+def test_each_reset_run_processes_all_jobs(tmpdir, monkeypatch):
+    record_file = tmpdir.join("records.txt")
+    monkeypatch.setenv("RECORD_FILE", str(record_file))
+    path = str(tmpdir.join("jobs.db"))
+    assert run_job_queue(path, record_metric, _metric_configs(3)) == 0
+    assert (
+        run_job_queue(path, record_metric, _metric_configs(3, renamed=[0]), reset=True)
+        == 0
+    )
+    names = record_file.read().splitlines()
+    assert sorted(names[:3]) == ["Metric 0", "Metric 1", "Metric 2"]
+    assert sorted(names[3:]) == ["Metric 0 renamed", "Metric 1", "Metric 2"]
+    with JobQueue(path, "record_metric") as job_queue:
+        assert job_queue.counts() == {jobqueue.DONE: 3}
+
+
+def test_seed_updates_config_of_pending_jobs(tmpdir):
+    with JobQueue(str(tmpdir.join("jobs.db")), "train") as job_queue:
+        job_queue.seed(_metric_configs(2))
+        assert job_queue.seed(_metric_configs(2, renamed=[1])) == 0
+        assert job_queue.claim("worker-a").metric_config.name == "Metric 0"
+        assert job_queue.claim("worker-a").metric_config.name == "Metric 1 renamed"
+
+
+def test_expired_lease_is_requeued(tmpdir):
+    now = [1000.0]
+    path = str(tmpdir.join("jobs.db"))
+    job_queue = JobQueue(
+        path, "train", lease_seconds=60, max_attempts=2, clock=lambda: now[0]
+    )
+    job_queue.seed(_metric_configs(1))
+    job = job_queue.claim("worker-a")
+    assert job.metric_config.name == "Metric 0"
+    assert job_queue.claim("worker-b") is None
+    now[0] += 30
+    assert job_queue.heartbeat(job, "worker-a")
+    now[0] += 61
+    requeued_job = job_queue.claim("worker-b")
+    assert requeued_job.id == job.id
+    assert requeued_job.attempts == 2
+    # worker-a lost its lease
+    assert not job_queue.heartbeat(job, "worker-a")
+    assert not job_queue.complete(job, "worker-a", 0)
+    now[0] += 61
+    # Lease expired after max_attempts claims
+    assert job_queue.claim("worker-c") is None
+    assert job_queue.counts() == {jobqueue.FAILED: 1}
+    assert job_queue.exit_code() == 1
+
+
+def test_workers_process_each_job_once(tmpdir, monkeypatch):
+    record_file = tmpdir.join("records.txt")
+    monkeypatch.setenv("RECORD_FILE", str(record_file))
+    path = str(tmpdir.join("jobs.db"))
+    exit_code = run_job_queue(path, record_metric, _metric_configs(50), workers=4)
+    assert exit_code == 0
+    names = record_file.read().splitlines()
+    assert sorted(names) == sorted(f"Metric {i}" for i in range(50))
+    with JobQueue(path, "record_metric") as job_queue:
+        assert job_queue.counts() == {jobqueue.DONE: 50}
+
+
+def test_worker_reports_failed_jobs(tmpdir):
+    path = str(tmpdir.join("jobs.db"))
+    with JobQueue(path, "fail_metric") as job_queue:
+        job_queue.seed(_metric_configs(3))
+    assert run_worker(path, "fail_metric", fail_metric) == 1
+    with JobQueue(path, "fail_metric") as job_queue:
+        assert job_queue.counts() == {jobqueue.DONE: 3}
+        assert job_queue.exit_code() == 1
+
+
+def test_joining_a_complete_run_does_not_run_it_again(tmpdir, monkeypatch):
+    record_file = tmpdir.join("records.txt")
+    monkeypatch.setenv("RECORD_FILE", str(record_file))
+    path = str(tmpdir.join("jobs.db"))
+    assert run_job_queue(path, fail_metric, _metric_configs(3)) == 1
+    # A late host finds the run complete, and reports its outcome
+    assert run_job_queue(path, fail_metric, _metric_configs(3)) == 1
+    assert run_job_queue(path, record_metric, _metric_configs(2)) == 0
+    assert run_job_queue(path, record_metric, _metric_configs(2)) == 0
+    assert record_file.read().splitlines() == ["Metric 0", "Metric 1"]
+
+
+def test_worker_retries_claim_when_queue_is_locked(tmpdir, monkeypatch, caplog):
+    path = str(tmpdir.join("jobs.db"))
+    with JobQueue(path, "fail_metric") as job_queue:
+        job_queue.seed(_metric_configs(1))
+    claim = JobQueue.claim
+    calls = []
+
+    def locked_claim(self, worker_id):
+        calls.append(worker_id)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return claim(self, worker_id)
+
+    monkeypatch.setattr(JobQueue, "claim", locked_claim)
+    assert run_worker(path, "fail_metric", fail_metric, poll_seconds=0) == 1
+    assert len(calls) == 3
+    assert f"Job queue '{path}' is locked, retrying the claim" in caplog.text
+    with JobQueue(path, "fail_metric") as job_queue:
+        assert job_queue.counts() == {jobqueue.DONE: 1}
@@ -0,0 +1,97 @@
+import json
+import multiprocessing
+import threading
+
+from adaptive_alerting_detector_build.metrics import MetricConfig
+from adaptive_alerting_detector_build.metrics.journal import (
+    DONE,
+    FAILED,
+    SKIPPED,
+    Journal,
+    JournaledCommand,
+    read_completed,
+)
+
+
+def _metric_config(i, description="Test metric"):
+    return MetricConfig(
+        name=f"Metric {i}",
+        type="REQUEST_COUNT",
+        description=description,
+        tags={"app": "my-web-app", "what": f"metric_{i}"},
+    )
+
+
+def _records(journal_path):
+    with open(journal_path) as journal_file:
+        return [json.loads(line) for line in journal_file if line.strip()]
+
+
+def train(metric_configs, metric_factory=None):
+    """Test command, fails for odd metrics."""
+    return max(
+        (int(m.tags["what"].split("_")[1]) % 2 for m in metric_configs), default=0
+    )
+
+
+def test_resume_skips_completed_metrics_with_same_config(tmpdir):
+    journal_path = str(tmpdir.join("train.journal"))
+    assert (
+        JournaledCommand(train, journal_path)([_metric_config(i) for i in range(4)])
+        == 1
+    )
+    assert [r["outcome"] for r in _records(journal_path)] == [
+        DONE,
+        FAILED,
+        DONE,
+        FAILED,
+    ]
+
+    completed = read_completed(journal_path, "train")
+    assert set(completed) == {_metric_config(0).tag_key, _metric_config(2).tag_key}
+    metric_configs = [
+        _metric_config(0),
+        _metric_config(1),
+        _metric_config(2, description="Changed"),
+    ]
+    JournaledCommand(train, journal_path, completed)(metric_configs)
+    assert [r["outcome"] for r in _records(journal_path)[4:]] == [SKIPPED, FAILED, DONE]
+    assert read_completed(journal_path, "build") == {}
+
+
+def test_partial_last_line_is_ignored(tmpdir):
+    journal_path = tmpdir.join("train.journal")
+    with Journal(str(journal_path), "train") as journal:
+        journal.record(_metric_config(0), DONE)
+    journal_path.write('{"command": "train", "tag_', mode="a")
+    assert len(read_completed(str(journal_path), "train")) == 1
+    with Journal(str(journal_path), "train") as journal:
+        journal.record(_metric_config(2), DONE)
+    assert len(read_completed(str(journal_path), "train")) == 2
+
+
+def _write_records(journal_path, offset):
+    with Journal(journal_path, "train", flush_records=7) as journal:
+        for i in range(offset, offset + 100):
+            journal.record(_metric_config(i), DONE)
+
+
+def test_concurrent_writers(tmpdir):
+    journal_path = str(tmpdir.join("train.journal"))
+    threads = [
+        threading.Thread(target=_write_records, args=(journal_path, i * 100))
+        for i in range(2)
+    ]
+    processes = [
+        multiprocessing.Process(
+            target=_write_records, args=(journal_path, 200 + i * 100)
+        )
+        for i in range(2)
+    ]
+    for worker in threads + processes:
+        worker.start()
+    for worker in threads + processes:
+        worker.join()
+    records = _records(journal_path)
+    assert len(records) == 400
+    assert len(read_completed(journal_path, "train")) == 400
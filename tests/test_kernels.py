@@ -0,0 +1,37 @@
+import numpy as np
+
+from adaptive_alerting_detector_build.detectors import constant_threshold as ct
+from adaptive_alerting_detector_build.detectors import kernels
+from adaptive_alerting_detector_build.utils.jit import warm_up_kernels
+
+
+def test_hampel_filter_replaces_outliers():
+    data = np.full(60, 10.0)
+    data[::2] = 11.0
+    data[30] = 100.0
+    series_wo_outliers, outliers = kernels.hampel_filter(data, 10, 3.0)
+    assert list(outliers) == [30]
+    assert series_wo_outliers[30] == 10.5
+    assert data[30] == 100.0
+
+
+def test_hampel_filter_matches_python():
+    data = np.random.RandomState(0).normal(100, 10, 500)
+    data[[50, 200, 400]] = 1000.0
+    compiled = kernels.hampel_filter(data, 10, 3.0)
+    python = kernels.hampel_filter.py_func(data, 10, 3.0)
+    assert np.array_equal(compiled[0], python[0])
+    assert np.array_equal(compiled[1], python[1])
+
+
+def test_hampel_filter_float_hyperparameters_use_one_signature():
+    data = np.random.RandomState(0).normal(100, 10, 100)
+    ct._hampel_filter(data, 10.0, 3.0)
+    ct._hampel_filter(list(data), 10, 3)
+    assert len(kernels.hampel_filter.compile().signatures) == 1
+
+
+def test_warm_up_kernels():
+    thread = warm_up_kernels([kernels.hampel_filter])
+    thread.join()
+    assert kernels.hampel_filter.compile() is kernels.hampel_filter.compile()
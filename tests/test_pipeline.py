@@ -0,0 +1,221 @@
+import threading
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from adaptive_alerting_detector_build.detectors import build_detector
+from adaptive_alerting_detector_build.metrics import MetricConfig
+from adaptive_alerting_detector_build.metrics import pipeline as pipeline_module
+from adaptive_alerting_detector_build.metrics.pipeline import (
+    BUILD,
+    TRAIN,
+    TrainingPipeline,
+)
+from adaptive_alerting_detector_build.timeseries import TimeSeries
+from adaptive_alerting_detector_build.utils.shared_series import share_series, to_frame
+
+
+def _data(points=1440):
+    return pd.DataFrame(
+        {"value": 10 + np.sin(np.arange(points) / 60.0)},
+        index=pd.date_range("2020-01-01", periods=points, freq="min"),
+    )
+
+
+class FakeDetectorClient:
+    def __init__(self):
+        self.updated = []
+        self.created = []
+        self.mappings = []
+
+    def update_detector(self, detector, read_after_write=True):
+        self.updated.append(detector)
+        return detector
+
+    def create_detector(self, detector):
+        detector.uuid = f"new-{len(self.created)}"
+        self.created.append(detector)
+        return detector
+
+    def save_metric_detector_mapping(self, detector_uuid, metric):
+        self.mappings.append(detector_uuid)
+
+
+class FakeMetric:
+    def __init__(self, metric_config, detectors, detector_client, data):
+        self.config = {"type": metric_config.type.value, "tags": metric_config.tags}
+        self.detectors = detectors
+        self._detector_client = detector_client
+        self._data = data
+
+    def query_series(self):
+        if isinstance(self._data, Exception):
+            raise self._data
+        return TimeSeries.from_frame(self._data)
+
+    def select_detectors(self):
+        return [
+            dict(
+                type="constant-detector",
+                config=dict(hyperparams=dict(strategy="sigma")),
+            )
+        ]
+
+
+class FakeMetricFactory:
+    def __init__(self, data=None, strategies=None):
+        self.detector_client = FakeDetectorClient()
+        self.data = data or dict()
+        self.strategies = strategies or dict()
+
+    def metric(self, metric_config):
+        strategy = self.strategies.get(metric_config.name, "sigma")
+        detector = build_detector(
+            "constant-detector", {"hyperparams": {"strategy": strategy}}
+        )
+        detector.uuid = metric_config.name
+        return FakeMetric(
+            metric_config,
+            [detector],
+            self.detector_client,
+            self.data.get(metric_config.name, _data()),
+        )
+
+
+def _metric_configs(count):
+    return [
+        MetricConfig(
+            name=f"metric_{i}",
+            type="REQUEST_COUNT",
+            tags={"what": f"metric_{i}"},
+            datasource={"type": "mock"},
+        )
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("processes", [0, 2])
+def test_pipeline_trains_and_publishes_detectors(processes):
+    metric_factory = FakeMetricFactory()
+    pipeline = TrainingPipeline(
+        TRAIN,
+        processes=processes,
+        io_threads=2,
+        force=True,
+        metric_factory=metric_factory,
+    )
+    assert pipeline.run(_metric_configs(10)) == 0
+    updated = metric_factory.detector_client.updated
+    assert sorted(detector.uuid for detector in updated) == sorted(
+        f"metric_{i}" for i in range(10)
+    )
+    assert all(detector.config.params is not None for detector in updated)
+
+
+def test_pipeline_builds_detectors():
+    metric_factory = FakeMetricFactory()
+    metric = metric_factory.metric
+    metric_factory.metric = lambda metric_config: _without_detectors(
+        metric(metric_config)
+    )
+    pipeline = TrainingPipeline(
+        BUILD, processes=0, io_threads=2, metric_factory=metric_factory
+    )
+    assert pipeline.run(_metric_configs(3)) == 0
+    assert len(metric_factory.detector_client.created) == 3
+    assert len(metric_factory.detector_client.mappings) == 3
+
+
+def _without_detectors(metric):
+    metric.detectors = []
+    return metric
+
+
+def test_pipeline_skips_untrainable_and_fails_on_errors(caplog):
+    metric_factory = FakeMetricFactory(
+        data={"metric_0": _data(points=10), "metric_1": IOError("graphite down")},
+        strategies={"metric_0": "highwatermark"},
+    )
+    pipeline = TrainingPipeline(
+        TRAIN, processes=0, io_threads=2, force=True, metric_factory=metric_factory
+    )
+    assert pipeline.run(_metric_configs(3)) == 1
+    assert [detector.uuid for detector in metric_factory.detector_client.updated] == [
+        "metric_2"
+    ]
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(
+        "Unable to train detector for metric 'metric_0'" in message
+        for message in messages
+    )
+    assert any(
+        "Exception OSError while training detector(s) for metric metric_1" in message
+        for message in messages
+    )
+
+
+class FailingExecutor:
+    def __init__(self, error):
+        self.error = error
+
+    def submit(self, *args, **kwargs):
+        raise self.error
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class FakeSeries:
+    released = 0
+
+    def __init__(self, timeseries):
+        pass
+
+    def release(self):
+        FakeSeries.released += 1
+
+
+@pytest.mark.parametrize(
+    "error", [RuntimeError("submit failed"), BrokenProcessPool("pool process killed")]
+)
+def test_pipeline_releases_slot_and_series_when_submit_fails(monkeypatch, error):
+    monkeypatch.setattr(
+        pipeline_module,
+        "ProcessPoolExecutor",
+        lambda max_workers: FailingExecutor(error),
+    )
+    monkeypatch.setattr(pipeline_module, "share_timeseries", FakeSeries)
+    monkeypatch.setattr(FakeSeries, "released", 0)
+    metric_factory = FakeMetricFactory()
+    pipeline = TrainingPipeline(
+        TRAIN, processes=1, io_threads=2, force=True, metric_factory=metric_factory
+    )
+    exit_codes = []
+    # More metrics than slots, a leaked slot would block the fetch threads
+    run_thread = threading.Thread(
+        target=lambda: exit_codes.append(pipeline.run(_metric_configs(10))), daemon=True
+    )
+    run_thread.start()
+    run_thread.join(10)
+    assert not run_thread.is_alive()
+    assert exit_codes == [1]
+    assert metric_factory.detector_client.updated == []
+    if isinstance(error, BrokenProcessPool):
+        # The run is aborted instead of failing metric by metric
+        assert FakeSeries.released < 10
+    else:
+        assert FakeSeries.released == 10
+
+
+def test_shared_series_round_trip():
+    data = _data(points=100)
+    series = share_series(data.index.asi8, data["value"].to_numpy())
+    try:
+        assert len(series) == 100
+        shared_data = to_frame(series)
+        assert np.array_equal(shared_data.index.asi8, data.index.asi8)
+        assert np.array_equal(shared_data["value"].to_numpy(), data["value"].to_numpy())
+    finally:
+        series.release()
@@ -0,0 +1,140 @@
+import threading
+
+import pytest
+import requests
+import responses
+
+from adaptive_alerting_detector_build.detectors import DetectorClient
+from adaptive_alerting_detector_build.utils.ratelimit import (
+    EndpointLimiter,
+    TokenBucket,
+    endpoint,
+    limiter_for,
+    limiter_stats,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+def _limiter(clock, **kwargs):
+    return EndpointLimiter("http://backend", clock=clock, sleep=clock.sleep, **kwargs)
+
+
+def test_token_bucket_paces_requests():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10.0, clock=clock, sleep=clock.sleep)
+    for _ in range(5):
+        bucket.acquire()
+    assert clock.now == pytest.approx(0.4)
+
+
+def test_limits_increase_while_healthy():
+    clock = FakeClock()
+    limiter = _limiter(clock, max_rate=100.0, max_concurrency=8)
+    for _ in range(200):
+        limiter.record(200, 0.1)
+    assert 20.0 < limiter.rate <= 100.0
+    assert limiter.concurrency == 8
+    assert limiter.throttled == 0
+
+
+@pytest.mark.parametrize("status_code", [429, 500, 503, None])
+def test_limits_decrease_on_overload(status_code):
+    clock = FakeClock()
+    limiter = _limiter(clock)
+    rate, concurrency = limiter.rate, limiter.concurrency
+    limiter.record(status_code, 0.1)
+    assert limiter.rate == rate / 2
+    assert limiter.concurrency == concurrency / 2
+    # Errors caused by the same overload only back off once
+    limiter.record(status_code, 0.1)
+    assert limiter.throttled == 1
+    clock.now += 1.0
+    limiter.record(status_code, 0.1)
+    assert limiter.throttled == 2
+
+
+def test_limits_decrease_on_rising_latency():
+    clock = FakeClock()
+    limiter = _limiter(clock)
+    for _ in range(10):
+        limiter.record(200, 0.1)
+    for _ in range(10):
+        limiter.record(200, 1.0)
+    assert limiter.throttled == 1
+
+
+def test_concurrency_is_bounded():
+    limiter = EndpointLimiter("http://backend", max_rate=1000.0, max_concurrency=2)
+    release = threading.Event()
+    lock = threading.Lock()
+    in_flight = []
+
+    def send():
+        with lock:
+            in_flight.append(limiter.in_flight)
+        release.wait(1.0)
+        return FakeResponse(200)
+
+    threads = [threading.Thread(target=limiter.call, args=(send,)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert max(in_flight) <= 2
+    assert limiter.requests == 6
+    assert limiter.in_flight == 0
+
+
+def test_failed_request_releases_slot():
+    clock = FakeClock()
+    limiter = _limiter(clock)
+
+    def send():
+        raise requests.exceptions.ConnectionError("refused")
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        limiter.call(send)
+    assert limiter.in_flight == 0
+    assert limiter.throttled == 1
+
+
+@responses.activate
+def test_clients_share_endpoint_limiter():
+    responses.add(
+        responses.DELETE,
+        "http://ratelimited-modelservice/api/v2/detectors?uuid=1",
+        status=200,
+    )
+    assert (
+        endpoint("http://ratelimited-modelservice/api/v2/detectors?uuid=1")
+        == "http://ratelimited-modelservice"
+    )
+    clients = [
+        DetectorClient(
+            model_service_url="http://ratelimited-modelservice",
+            model_service_user="user",
+        )
+        for _ in range(2)
+    ]
+    for client in clients:
+        client.delete_detector("1")
+    assert limiter_for("http://ratelimited-modelservice/other") is limiter_for(
+        "http://ratelimited-modelservice"
+    )
+    assert limiter_stats()["http://ratelimited-modelservice"]["requests"] == 2
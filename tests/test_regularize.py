@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from adaptive_alerting_detector_build.regularize import (
+    align,
+    fill,
+    grid_bounds,
+    median_step,
+    regularize,
+)
+from adaptive_alerting_detector_build.timeseries import NANOSECONDS, TimeSeries
+from tests.conftest import GRAPHITE_SPARSE_DATA_MOCK_RESPONSE
+
+MINUTE = 60 * NANOSECONDS
+
+
+def _series(seconds, values):
+    return TimeSeries.from_epoch_seconds(seconds, np.array(values, dtype=np.float64))
+
+
+def test_regularize_snaps_irregular_timestamps():
+    timeseries = _series([60, 125, 130, 240, 300], [1.0, 2.0, 4.0, 5.0, 6.0])
+    regularized = regularize(timeseries, step=MINUTE)
+    assert list(regularized.timestamps // NANOSECONDS) == [60, 120, 180, 240, 300]
+    assert np.array_equal(
+        regularized.values, [1.0, 3.0, np.nan, 5.0, 6.0], equal_nan=True
+    )
+    assert list(regularized.valid) == [True, True, False, True, True]
+
+
+def test_regularize_trims_partial_edge_buckets():
+    # One minute points from 00:01 to 00:11, the first and last five minute buckets are
+    # only partly covered
+    timeseries = _series(np.arange(60, 720, 60), np.arange(11, dtype=np.float64))
+    regularized = regularize(timeseries, step=5 * MINUTE)
+    assert list(regularized.timestamps // NANOSECONDS) == [300]
+    assert list(regularized.values) == [6.0]
+    untrimmed = regularize(timeseries, step=5 * MINUTE, trim=False)
+    assert list(untrimmed.timestamps // NANOSECONDS) == [0, 300, 600]
+    assert list(untrimmed.values) == [1.5, 6.0, 9.5]
+
+
+@pytest.mark.parametrize(
+    "policy, expected",
+    [
+        ("mask", [np.nan, 1.0, np.nan, np.nan, 4.0, np.nan]),
+        ("linear", [np.nan, 1.0, 2.0, 3.0, 4.0, np.nan]),
+        ("previous", [np.nan, 1.0, 1.0, 1.0, 4.0, 4.0]),
+        ("zero", [0.0, 1.0, 0.0, 0.0, 4.0, 0.0]),
+    ],
+)
+def test_fill_policies(policy, expected):
+    matrix = np.array(
+        [[np.nan, 1.0, np.nan, np.nan, 4.0, np.nan], [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]]
+    )
+    fill(matrix, policy)
+    assert np.array_equal(matrix[0], expected, equal_nan=True)
+    assert list(matrix[1]) == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_fill_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        fill(np.zeros(3), "spline")
+
+
+def test_align_many_series():
+    series = [
+        _series([0, 60, 120, 180], [1.0, 2.0, 3.0, 4.0]),
+        _series([120, 180, 240], [5.0, None, 7.0]),
+        _series([], []),
+    ]
+    timestamps, matrix = align(series)
+    assert list(timestamps // NANOSECONDS) == [0, 60, 120, 180, 240]
+    assert matrix.shape == (3, 5)
+    assert np.array_equal(matrix[0], [1.0, 2.0, 3.0, 4.0, np.nan], equal_nan=True)
+    assert np.array_equal(matrix[1], [np.nan, np.nan, 5.0, np.nan, 7.0], equal_nan=True)
+    assert np.isnan(matrix[2]).all()
+    timestamps, matrix = align(
+        series, start=60 * NANOSECONDS, end=240 * NANOSECONDS, fill_policy="linear"
+    )
+    assert list(timestamps // NANOSECONDS) == [60, 120, 180]
+    assert list(matrix[0]) == [2.0, 3.0, 4.0]
+    assert np.array_equal(matrix[1], [np.nan, 5.0, np.nan], equal_nan=True)
+
+
+def test_align_empty():
+    timestamps, matrix = align([_series([], [])])
+    assert timestamps.size == 0
+    assert matrix.shape == (1, 0)
+
+
+def test_regularize_sparse_graphite_series():
+    timeseries = TimeSeries.from_datapoints(
+        GRAPHITE_SPARSE_DATA_MOCK_RESPONSE[0]["datapoints"]
+    )
+    assert median_step(timeseries.timestamps) == MINUTE
+    assert grid_bounds(timeseries.timestamps, MINUTE) == (
+        timeseries.timestamps[0],
+        timeseries.timestamps[-1] + MINUTE,
+    )
+    regularized = regularize(timeseries)
+    assert np.array_equal(regularized.timestamps, timeseries.timestamps)
+    assert np.array_equal(regularized.values, timeseries.values, equal_nan=True)
+    assert regularized.valid_count == timeseries.valid_count
@@ -0,0 +1,173 @@
+import datetime
+import json
+import os
+import threading
+
+import pandas as pd
+
+from adaptive_alerting_detector_build.scheduler import (
+    TrainingScheduler,
+    detector_due_time,
+)
+
+DAY = 24 * 60 * 60
+START = 1577836800.0  # 2020-01-01 00:00:00 UTC
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = START
+
+    def __call__(self):
+        return self.now
+
+
+class FakeDetector:
+    def __init__(self, clock, uuid, last_updated, training_interval="1d"):
+        self.type = "constant-detector"
+        self.uuid = uuid
+        self.training_interval = pd.to_timedelta(training_interval)
+        self.last_updated = last_updated
+        self.trained = 0
+        self._clock = clock
+
+    @property
+    def needs_training(self):
+        return detector_due_time(self) <= self._clock()
+
+    def train(self, data, metric_type):
+        self.trained += 1
+        self.last_updated = datetime.datetime.utcfromtimestamp(self._clock())
+
+
+class FakeDetectorClient:
+    def update_detector(self, detector, read_after_write=True):
+        return detector
+
+
+class FakeMetric:
+    def __init__(self, metric_config, detectors):
+        self.config = {"type": metric_config.type}
+        self.detectors = detectors
+        self._detector_client = FakeDetectorClient()
+
+    def query(self):
+        return None
+
+
+class FakeMetricFactory:
+    def __init__(self, clock):
+        self.detectors = dict()
+        self.lookups = []
+        self._clock = clock
+
+    def metric(self, metric_config):
+        self.lookups.append(metric_config.name)
+        if metric_config.name not in self.detectors:
+            last_updated = datetime.datetime.utcfromtimestamp(self._clock() - DAY / 2)
+            self.detectors[metric_config.name] = [
+                FakeDetector(self._clock, metric_config.name, last_updated)
+            ]
+        return FakeMetric(metric_config, self.detectors[metric_config.name])
+
+
+def _write_config(config_file, names):
+    config_file.write(
+        json.dumps(
+            [
+                {
+                    "name": name,
+                    "type": "LATENCY",
+                    "tags": {"app": "my-web-app", "what": name},
+                }
+                for name in names
+            ]
+        )
+    )
+
+
+def _scheduler(config_file, clock, jitter_seconds=0):
+    return TrainingScheduler(
+        [str(config_file)],
+        reload_seconds=60,
+        jitter_seconds=jitter_seconds,
+        metric_factory=FakeMetricFactory(clock),
+        clock=clock,
+    )
+
+
+def test_detector_due_time():
+    clock = FakeClock()
+    detector = FakeDetector(clock, "a", datetime.datetime(2020, 1, 1))
+    assert detector_due_time(detector) == START + DAY + 60
+    detector.training_interval = pd.to_timedelta("0")
+    assert detector_due_time(detector) is None
+
+
+def test_scheduler_only_wakes_for_due_detectors(tmpdir):
+    clock = FakeClock()
+    config_file = tmpdir.join("metrics.json")
+    _write_config(config_file, ["a", "b"])
+    scheduler = _scheduler(config_file, clock)
+    metric_factory = scheduler._metric_factory
+
+    assert scheduler.run_pending() == 2
+    assert metric_factory.lookups == ["a", "b"]
+    # Both detectors were updated half a day ago
+    assert scheduler.next_wakeup() == START + 60
+    clock.now = START + 60
+    assert scheduler.run_pending() == 0
+    assert scheduler.next_wakeup() == START + 120
+
+    clock.now = START + DAY / 2 + 60
+    assert scheduler.run_pending() == 2
+    assert all(d.trained == 1 for ds in metric_factory.detectors.values() for d in ds)
+    clock.now += DAY / 2
+    assert scheduler.run_pending() == 0
+    assert len(metric_factory.lookups) == 4
+
+
+def test_scheduler_reloads_changed_config(tmpdir):
+    clock = FakeClock()
+    config_file = tmpdir.join("metrics.json")
+    _write_config(config_file, ["a", "b"])
+    scheduler = _scheduler(config_file, clock)
+    scheduler.run_pending()
+    _write_config(config_file, ["b", "c"])
+    os.utime(str(config_file), ns=(0, 1))
+    clock.now += 60
+    assert scheduler.run_pending() == 1
+    assert scheduler._metric_factory.lookups == ["a", "b", "c"]
+    assert sorted(
+        metric_config.name for metric_config, _ in scheduler._metrics.values()
+    ) == ["b", "c"]
+
+
+def test_run_pending_returns_once_stopped(tmpdir):
+    clock = FakeClock()
+    config_file = tmpdir.join("metrics.json")
+    _write_config(config_file, ["a", "b", "c"])
+    scheduler = _scheduler(config_file, clock)
+    metric_factory = scheduler._metric_factory
+    stop_event = threading.Event()
+    metric = metric_factory.metric
+
+    def stop_after_b(metric_config):
+        if metric_config.name == "b":
+            stop_event.set()
+        return metric(metric_config)
+
+    metric_factory.metric = stop_after_b
+    assert scheduler.run_pending(stop_event) == 2
+    assert metric_factory.lookups == ["a", "b"]
+
+
+def test_jitter_spreads_new_metrics(tmpdir):
+    clock = FakeClock()
+    config_file = tmpdir.join("metrics.json")
+    _write_config(config_file, [f"metric_{i}" for i in range(20)])
+    scheduler = _scheduler(config_file, clock, jitter_seconds=300)
+    scheduler.reload()
+    due_times = sorted(due_time for _, due_time in scheduler._metrics.values())
+    assert START <= due_times[0] and due_times[-1] <= START + 300
+    assert len(set(due_times)) == 20
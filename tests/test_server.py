@@ -0,0 +1,140 @@
+import json
+import os
+import signal
+import socket
+import stat
+import threading
+
+import pytest
+
+from adaptive_alerting_detector_build import cli, config
+from adaptive_alerting_detector_build.client import check_socket_path, run_remote
+from adaptive_alerting_detector_build.server import CommandHandler, CommandServer, serve
+
+
+@pytest.fixture
+def socket_path(tmpdir):
+    socket_path = str(tmpdir.join("server.sock"))
+    server = CommandServer(socket_path, CommandHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield socket_path
+    server.shutdown()
+    server.server_close()
+
+
+def test_server_runs_diff(socket_path, tmpdir, capsys):
+    output_file = str(tmpdir.join("diff.json"))
+    exit_code = run_remote(
+        [
+            "diff",
+            "./tests/data/metric-config.json",
+            "./tests/data/metric-config-v2.json",
+            output_file,
+        ],
+        socket_path=socket_path,
+    )
+    assert exit_code == 0
+    with open(output_file) as output_file_handle:
+        diff = json.load(output_file_handle)
+    assert len(diff["added"]) == 1
+    assert (
+        "Reading configuration file: ./tests/data/metric-config.json"
+        in capsys.readouterr().err
+    )
+
+
+def test_server_rejects_unsupported_commands(socket_path, capsys):
+    assert run_remote(["serve"], socket_path=socket_path) == 2
+    assert "Unsupported command" in capsys.readouterr().err
+
+
+def test_server_reports_usage_errors(socket_path, capsys):
+    assert run_remote(["diff", "only-one-file.json"], socket_path=socket_path) == 1
+    assert "Usage:" in capsys.readouterr().err
+
+
+def test_server_runs_commands_with_client_environment(socket_path, monkeypatch, capsys):
+    def main(argv):
+        print(f"{config.GRAPHITE_URL} {config.SHARD_INDEX}")
+        return 0
+
+    # Inherited by the forked child handling the command
+    monkeypatch.setattr(cli, "main", main)
+    monkeypatch.setenv("GRAPHITE_URL", "http://client-graphite")
+    monkeypatch.setenv("SHARD_INDEX", "3")
+    assert run_remote(["diff"], socket_path=socket_path) == 0
+    assert capsys.readouterr().out == "http://client-graphite 3\n"
+
+
+def test_server_only_receives_client_settings(socket_path, monkeypatch, capsys):
+    def main(argv):
+        print(os.environ.get("GRAPHITE_HEADER_ORG"))
+        return 0
+
+    monkeypatch.setattr(cli, "main", main)
+    monkeypatch.setenv("GRAPHITE_HEADER_ORG", "x-org-id")
+    monkeypatch.setenv("UNRELATED_SECRET", "secret")
+    requests = []
+    original_sendall = socket.socket.sendall
+
+    def sendall(self, data):
+        requests.append(json.loads(data))
+        return original_sendall(self, data)
+
+    monkeypatch.setattr(socket.socket, "sendall", sendall)
+    assert run_remote(["diff"], socket_path=socket_path) == 0
+    assert "UNRELATED_SECRET" not in requests[0]["env"]
+    assert requests[0]["env"]["GRAPHITE_HEADER_ORG"] == "x-org-id"
+    assert capsys.readouterr().out == "x-org-id\n"
+
+
+def test_client_refuses_socket_in_directory_writable_by_others(socket_path):
+    os.chmod(os.path.dirname(socket_path), 0o777)
+    with pytest.raises(PermissionError):
+        run_remote(["diff"], socket_path=socket_path)
+
+
+def test_default_socket_is_in_user_directory(tmpdir, monkeypatch):
+    monkeypatch.delenv("ADAPTIVE_ALERTING_SOCKET", raising=False)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmpdir))
+    assert config.SERVER_SOCKET == str(tmpdir.join("adaptive-alerting.sock"))
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    assert (
+        os.path.basename(os.path.dirname(config.SERVER_SOCKET))
+        == f"adaptive-alerting-{os.getuid()}"
+    )
+
+
+def test_serve_creates_socket_for_owner_only(tmpdir, monkeypatch):
+    socket_path = str(tmpdir.join("serve.sock"))
+    modes = []
+
+    def serve_forever(self):
+        modes.append(stat.S_IMODE(os.stat(socket_path).st_mode))
+
+    monkeypatch.setattr(CommandServer, "serve_forever", serve_forever)
+    monkeypatch.setattr(signal, "signal", lambda *args: None)
+    assert serve(socket_path, warm_up=False) == 0
+    # No permission for the group and other users from the start
+    assert len(modes) == 1 and modes[0] & 0o077 == 0
+    assert not os.path.exists(socket_path)
+
+
+def test_serve_creates_socket_directory_for_owner_only(tmpdir, monkeypatch):
+    socket_path = str(tmpdir.join("run", "serve.sock"))
+    monkeypatch.setattr(
+        CommandServer, "serve_forever", lambda self: check_socket_path(socket_path)
+    )
+    monkeypatch.setattr(signal, "signal", lambda *args: None)
+    assert serve(socket_path, warm_up=False) == 0
+    assert stat.S_IMODE(os.stat(str(tmpdir.join("run"))).st_mode) & 0o077 == 0
+
+
+def test_serve_refuses_directory_writable_by_others(tmpdir, caplog):
+    tmpdir.chmod(0o777)
+    existing_file = tmpdir.join("serve.sock")
+    existing_file.write("")
+    assert serve(str(existing_file), warm_up=False) == 1
+    assert existing_file.exists()
+    assert "can be written to by other users" in caplog.text
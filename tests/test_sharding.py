@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from adaptive_alerting_detector_build import config
+from adaptive_alerting_detector_build.metrics import MetricConfigReader
+from adaptive_alerting_detector_build.metrics.sharding import Shard
+
+TAG_KEYS = [
+    json.dumps({"app": "my-web-app", "what": f"metric_{i}"}, sort_keys=True)
+    for i in range(1000)
+]
+
+
+@pytest.mark.parametrize("rendezvous", [False, True])
+def test_shards_partition_metrics(rendezvous):
+    shards = [Shard(index, 4, rendezvous=rendezvous) for index in range(4)]
+    assignments = [
+        [tag_key for tag_key in TAG_KEYS if shard.owns(tag_key)] for shard in shards
+    ]
+    assert sum(len(assignment) for assignment in assignments) == len(TAG_KEYS)
+    assert set().union(*assignments) == set(TAG_KEYS)
+    assert all(150 < len(assignment) < 350 for assignment in assignments)
+    # Stable across runs
+    assert [
+        Shard(0, 4, rendezvous=rendezvous).owns(tag_key) for tag_key in TAG_KEYS
+    ] == [tag_key in assignments[0] for tag_key in TAG_KEYS]
+
+
+def test_rendezvous_moves_few_metrics_when_count_changes():
+    before = Shard(0, 4, rendezvous=True)
+    after = Shard(0, 5, rendezvous=True)
+    moved = [t for t in TAG_KEYS if before.shard_for(t) != after.shard_for(t)]
+    # Only the metrics assigned to the new shard move
+    assert all(after.shard_for(t) == 4 for t in moved)
+    assert len(moved) < len(TAG_KEYS) / 3
+
+
+def test_shard_filter():
+    metric_configs = list(MetricConfigReader("./tests/data/metric-config.json"))
+    filtered = [list(Shard(index, 2).filter(metric_configs)) for index in range(2)]
+    assert len(filtered[0]) + len(filtered[1]) == len(metric_configs)
+
+
+def test_parse_shard():
+    shard = Shard.parse("1/3")
+    assert (shard.index, shard.count, shard.rendezvous) == (1, 3, False)
+    for value in ("3/3", "-1/3", "1", "a/b", "0/0"):
+        with pytest.raises(ValueError):
+            Shard.parse(value)
+
+
+def test_shard_from_environment(monkeypatch):
+    assert Shard.from_settings() is None
+    monkeypatch.setattr(config, "SHARD_INDEX", "2")
+    monkeypatch.setattr(config, "SHARD_COUNT", "4")
+    shard = Shard.from_settings()
+    assert str(shard) == "2/4"
+    assert str(Shard.from_settings("0/2")) == "0/2"
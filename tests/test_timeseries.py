@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import responses
+
+from adaptive_alerting_detector_build.datasources import graphite
+from adaptive_alerting_detector_build.detectors import build_detector
+from adaptive_alerting_detector_build.profile.df_helper import df_values_as_array
+from adaptive_alerting_detector_build.timeseries import TimeSeries
+from tests.conftest import GRAPHITE_SPARSE_DATA_MOCK_RESPONSE
+
+
+def test_timeseries_from_datapoints():
+    timeseries = TimeSeries.from_datapoints([[1.0, 60], [None, 120], [3.0, 180]])
+    assert len(timeseries) == 3
+    assert timeseries.has_gaps
+    assert timeseries.valid_count == 2
+    assert list(timeseries.valid) == [True, False, True]
+    assert list(timeseries.valid_values()) == [1.0, 3.0]
+    assert list(timeseries.timestamps) == [60 * 10 ** 9, 120 * 10 ** 9, 180 * 10 ** 9]
+    dropped = timeseries.dropna()
+    assert not dropped.has_gaps
+    assert list(dropped.timestamps) == [60 * 10 ** 9, 180 * 10 ** 9]
+
+
+def test_timeseries_pandas_conversions_share_arrays():
+    timeseries = TimeSeries.from_epoch_seconds([60, 120, 180], [1.0, 2.0, 3.0])
+    df = timeseries.to_frame()
+    assert list(df.columns) == ["value"]
+    assert isinstance(df.index, pd.DatetimeIndex)
+    assert df.index[0] == pd.Timestamp("1970-01-01 00:01:00")
+    assert np.shares_memory(df["value"].to_numpy(), timeseries.values)
+    round_trip = TimeSeries.from_frame(df)
+    assert np.shares_memory(round_trip.values, timeseries.values)
+    assert np.array_equal(round_trip.timestamps, timeseries.timestamps)
+
+
+def test_timeseries_float32():
+    timeseries = TimeSeries.from_datapoints([[1.5, 60], [None, 120]]).astype(np.float32)
+    assert timeseries.values.dtype == np.float32
+    assert timeseries.valid_count == 1
+
+
+@responses.activate
+def test_graphite_query_series():
+    responses.add(
+        responses.GET,
+        "http://graphite/render",
+        json=GRAPHITE_SPARSE_DATA_MOCK_RESPONSE,
+        status=200,
+    )
+    graphite_datasource = graphite(url="http://graphite")
+    timeseries = graphite_datasource.query_series(
+        tags={"role": "my-web-app", "what": "elb_2xx"}
+    )
+    datapoints = GRAPHITE_SPARSE_DATA_MOCK_RESPONSE[0]["datapoints"]
+    assert len(timeseries) == len(datapoints)
+    assert timeseries.valid_count == sum(
+        1 for value, _ in datapoints if value is not None
+    )
+    df = graphite_datasource.query(tags={"role": "my-web-app", "what": "elb_2xx"})
+    assert np.array_equal(
+        df_values_as_array(df), df_values_as_array(timeseries), equal_nan=True
+    )
+
+
+def test_detector_trains_on_timeseries():
+    values = [5, 4, 7, 9, 15, None, 1, 0]
+    timeseries = TimeSeries.from_datapoints(
+        [[value, i * 60] for i, value in enumerate(values)]
+    )
+    detectors = [
+        build_detector("constant-detector", {"hyperparams": {"strategy": "sigma"}})
+        for _ in range(2)
+    ]
+    detectors[0].train(timeseries, "REQUEST_COUNT")
+    detectors[1].train(timeseries.to_frame(), "REQUEST_COUNT")
+    assert detectors[0].config.params == detectors[1].config.params
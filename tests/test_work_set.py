@@ -0,0 +1,95 @@
+import logging
+
+from adaptive_alerting_detector_build.metrics import (
+    MetricConfig,
+    MetricConfigReader,
+    MetricFactory,
+    MetricWorkSet,
+)
+
+
+def test_work_set_merges_config_files(caplog):
+    metric_work_set = MetricWorkSet(
+        [
+            MetricConfigReader("./tests/data/metric-config.json"),
+            MetricConfigReader("./tests/data/metric-config-v2.json"),
+        ]
+    )
+    metric_configs = list(metric_work_set)
+    names = [metric_config.name for metric_config in metric_configs]
+    assert metric_work_set.exit_code == 0
+    assert len(metric_work_set) == 5
+    assert names == [
+        "My App Request Count",
+        "My App Error Count",
+        "My App Success Rate",
+        "My App Latency",
+        "My App Request Count Fixed",
+    ]
+    error_count = [c for c in metric_configs if c.name == "My App Error Count"][0]
+    assert metric_work_set.sources(error_count.tag_key) == [
+        "./tests/data/metric-config.json",
+        "./tests/data/metric-config-v2.json",
+    ]
+    assert metric_work_set.file_summary() == {
+        "./tests/data/metric-config.json": {"metrics": 4, "shared": 3},
+        "./tests/data/metric-config-v2.json": {"metrics": 4, "shared": 3},
+    }
+    warnings = [r for r in caplog.records if r.levelno == logging.WARNING]
+    assert len(warnings) == 1
+    assert "My App Error Count" in warnings[0].msg
+
+
+def test_work_set_exit_code_of_missing_file():
+    metric_work_set = MetricWorkSet(
+        [
+            MetricConfigReader("./tests/data/metric-config.json"),
+            MetricConfigReader("./tests/data/missing-metric-config.json"),
+        ]
+    )
+    assert len(list(metric_work_set)) == 4
+    assert metric_work_set.exit_code == 1
+
+
+def test_metric_factory_shares_datasource_and_client():
+    metric_configs = list(MetricConfigReader("./tests/data/metric-config.json"))
+    metric_factory = MetricFactory()
+    metrics = [metric_factory.metric(metric_config) for metric_config in metric_configs]
+    assert len({id(metric._datasource) for metric in metrics}) == 1
+    assert len({id(metric._detector_client) for metric in metrics}) == 1
+    assert metrics[0].config["tags"] == metric_configs[0].tags
+
+
+def test_work_set_is_read_lazily_and_groups_by_datasource_within_windows():
+    class Reader:
+        json_config_file_path = "metrics.json"
+        exit_code = 0
+
+        def __init__(self):
+            self.read = 0
+
+        def __iter__(self):
+            for i in range(6):
+                self.read += 1
+                yield MetricConfig(
+                    name=f"metric_{i}",
+                    type="REQUEST_COUNT",
+                    tags={"what": f"metric_{i}"},
+                    datasource={"type": "mock", "url": f"http://datasource-{i % 2}"},
+                )
+
+    reader = Reader()
+    metric_work_set = MetricWorkSet([reader], group_window=4)
+    metric_configs = iter(metric_work_set)
+    assert reader.read == 0
+    assert next(metric_configs).name == "metric_0"
+    assert reader.read == 4
+    names = ["metric_0"] + [metric_config.name for metric_config in metric_configs]
+    assert names == [
+        "metric_0",
+        "metric_2",
+        "metric_1",
+        "metric_3",
+        "metric_4",
+        "metric_5",
+    ]